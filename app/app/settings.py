@@ -37,6 +37,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'core',
@@ -46,12 +47,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.executors.OverloadedMiddleware',
 ]
 
 ROOT_URLCONF = 'app.urls'
@@ -88,10 +91,55 @@ DATABASES = {
     }
 }
 
+# The token and generation caches must be shared by every process, so
+# the default cache is memcached when MEMCACHED_LOCATION is set and a
+# directory shared by the processes of a single host otherwise
+
+if os.environ.get('MEMCACHED_LOCATION'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': os.environ['MEMCACHED_LOCATION'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_DIR', '/tmp/app-cache'),
+            'OPTIONS': {
+                'MAX_ENTRIES': 100000,
+            },
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
+# Passwords are hashed with Argon2, still verifying the older PBKDF2
+# hashes and rehashing them on login. Changing the costs below rehashes
+# the passwords as their users log in.
+PASSWORD_HASHERS = [
+    'core.hashers.TunedArgon2PasswordHasher',
+    'core.hashers.TunedPBKDF2PasswordHasher',
+]
+
+PASSWORD_HASHING = {
+    'ARGON2_TIME_COST': 2,
+    'ARGON2_MEMORY_COST': 19456,
+    'ARGON2_PARALLELISM': 1,
+    'PBKDF2_ITERATIONS': 150000,
+}
+
+# Passwords are hashed by MAX_WORKERS threads so login bursts can't take
+# every CPU, answering 503 with Retry-After once MAX_QUEUE calls wait
+PASSWORD_EXECUTOR = {
+    'MAX_WORKERS': 2,
+    'MAX_QUEUE': 64,
+    'RETRY_AFTER': 1,
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -131,3 +179,83 @@ MEDIA_ROOT = '/vol/web/media'
 STATIC_ROOT = '/vol/web/static'
 
 AUTH_USER_MODEL = 'core.User'
+
+# Media files are sent by Django unless SENDFILE_HEADER is set to
+# X-Accel-Redirect, with nginx aliasing INTERNAL_URL to MEDIA_ROOT in an
+# internal location, or X-Sendfile for Apache and lighttpd
+MEDIA_SERVING = {
+    'SENDFILE_HEADER': os.environ.get('MEDIA_SENDFILE_HEADER') or None,
+    'INTERNAL_URL': '/protected-media/',
+    'MAX_AGE': 24 * 60 * 60,
+}
+
+# Uploaded recipe images are replaced by renditions scaled down to SIZES
+# in each of FORMATS, made by the IMAGE_EXECUTOR threads
+IMAGE_RENDITIONS = {
+    'SIZES': {
+        'full': 2048,
+        'medium': 800,
+        'thumb': 200,
+    },
+    'FORMATS': ('jpeg', 'webp'),
+    'JPEG_QUALITY': 85,
+    'WEBP_QUALITY': 80,
+}
+
+# Image uploads are streamed to temporary files and rejected as soon as
+# they exceed MAX_BYTES or their header shows more than MAX_PIXELS
+IMAGE_UPLOADS = {
+    'MAX_BYTES': 25 * 2 ** 20,
+    'MAX_PIXELS': 50000000,
+}
+
+IMAGE_EXECUTOR = {
+    'MAX_WORKERS': 2,
+    'MAX_QUEUE': 32,
+    'RETRY_AFTER': 5,
+}
+
+# Per-user cache of serialized API responses. The generation counters
+# invalidating it must live in a cache shared by every process, which
+# the core.E002 check enforces.
+RESPONSE_CACHE = {
+    'BACKEND': 'core.cache.LRUCacheBackend',
+    'GENERATION_CACHE_ALIAS': 'default',
+    'OPTIONS': {
+        'MAX_ENTRIES': 1024,
+        'TTL': 60,
+    },
+}
+
+# Users authenticated by each token are cached for TTL seconds in the
+# CACHE_ALIAS cache, which must be shared by all the processes, fronted
+# by a per-process LRU whose entries may outlive an invalidation in
+# another process by LOCAL_TTL seconds
+TOKEN_CACHE = {
+    'CACHE_ALIAS': 'default',
+    'TTL': 300,
+    'LOCAL_MAX_ENTRIES': 10000,
+    'LOCAL_TTL': 10,
+}
+
+# Responses are compressed with brotli, when installed, or gzip as
+# accepted by the client once they reach MIN_SIZE bytes
+COMPRESSION = {
+    'MIN_SIZE': 1024,
+    'GZIP_LEVEL': 6,
+    'BROTLI_QUALITY': 5,
+}
+
+# JSON is encoded and decoded with orjson when it is installed, falling
+# back to the standard library otherwise
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'core.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+}
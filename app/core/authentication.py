@@ -0,0 +1,125 @@
+import hashlib
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from core.cache import LRUCacheBackend
+
+
+DEFAULT_TOKEN_CACHE = {
+    'CACHE_ALIAS': 'default',
+    'TTL': 300,
+    'LOCAL_MAX_ENTRIES': 10000,
+    'LOCAL_TTL': 10,
+}
+
+
+class TokenCache:
+    """
+    Cache of the user authenticated by each token key, in a bounded
+    in-process LRU in front of one of the CACHES
+
+    Only the pk and is_active flag of the user are cached; every request
+    gets its own user and token instances, whose other fields are loaded
+    from the database when used. The cache must be shared by all the
+    processes: invalidating an entry clears it along with the LRU of the
+    current process, while the others keep serving their local copy for
+    LOCAL_TTL seconds at most.
+    """
+
+    def __init__(self, cache, ttl=300, local_max_entries=10000,
+                 local_ttl=10):
+        self.cache = cache
+        self.ttl = ttl
+        self.local = LRUCacheBackend(local_max_entries, local_ttl)
+
+    @staticmethod
+    def make_key(key):
+        """Return the cache key of a token, which doesn't reveal it"""
+        return 'auth-token:' + hashlib.sha256(key.encode()).hexdigest()
+
+    def get(self, key):
+        """Return the cached user and token of a token key, if any"""
+        cache_key = self.make_key(key)
+        entry = self.local.get(cache_key)
+        if entry is None:
+            entry = self.cache.get(cache_key)
+            if entry is None:
+                return None
+            self.local.set(cache_key, entry)
+        user_pk, is_active = entry
+        user_model = get_user_model()
+        user = user_model.from_db(
+            router.db_for_read(user_model),
+            ['id', 'is_active'],
+            [user_pk, is_active]
+        )
+        token = Token.from_db(
+            router.db_for_read(Token),
+            ['key', 'user_id'],
+            [key, user_pk]
+        )
+        token.user = user
+        return user, token
+
+    def set(self, key, user):
+        """Cache the user of a token key"""
+        cache_key = self.make_key(key)
+        entry = (user.pk, user.is_active)
+        self.local.set(cache_key, entry)
+        self.cache.set(cache_key, entry, self.ttl)
+
+    def delete(self, key):
+        """Forget the user and token of a token key"""
+        cache_key = self.make_key(key)
+        self.local.delete(cache_key)
+        self.cache.delete(cache_key)
+
+
+_token_cache = None
+
+
+def get_token_cache():
+    """Return the token cache configured by TOKEN_CACHE"""
+    global _token_cache
+    if _token_cache is None:
+        config = dict(
+            DEFAULT_TOKEN_CACHE,
+            **getattr(settings, 'TOKEN_CACHE', {})
+        )
+        _token_cache = TokenCache(
+            caches[config['CACHE_ALIAS']],
+            ttl=config['TTL'],
+            local_max_entries=config['LOCAL_MAX_ENTRIES'],
+            local_ttl=config['LOCAL_TTL']
+        )
+    return _token_cache
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication looking tokens up in the token cache before the
+    database
+
+    Only valid tokens of active users are cached; the entries are dropped
+    when the token is deleted or its user saved, which covers
+    deactivations and password changes.
+    """
+
+    def authenticate_credentials(self, key):
+        cache = get_token_cache()
+        cached = cache.get(key)
+        if cached is not None:
+            user, token = cached
+            if not user.is_active:
+                raise exceptions.AuthenticationFailed(
+                    _('User inactive or deleted.')
+                )
+            return cached
+        user, token = super().authenticate_credentials(key)
+        cache.set(key, user)
+        return user, token
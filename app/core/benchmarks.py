@@ -0,0 +1,124 @@
+import math
+import random
+import time
+from django.contrib.auth import get_user_model
+from core.models import Tag, Ingredient, Recipe
+
+
+BENCH_USER_EMAIL = 'bench@bench.local'
+TITLE_ADJECTIVES = (
+    'Spicy', 'Creamy', 'Roasted', 'Grilled', 'Crispy', 'Smoky', 'Sweet',
+    'Tangy', 'Garlic', 'Lemon', 'Herbed', 'Baked', 'Braised', 'Stuffed',
+    'Fried', 'Glazed', 'Honey', 'Chilli', 'Peppered', 'Ginger',
+)
+INGREDIENT_WORDS = (
+    'chicken', 'beef', 'pork', 'lamb', 'salmon', 'tuna', 'prawn', 'tofu',
+    'mushroom', 'aubergine', 'pumpkin', 'spinach', 'lentil', 'chickpea',
+    'potato', 'carrot', 'cauliflower', 'broccoli', 'tomato', 'pepper',
+    'courgette', 'squash', 'duck', 'cod', 'halloumi', 'paneer', 'bean',
+    'noodle', 'rice', 'quinoa',
+)
+TITLE_DISHES = (
+    'curry', 'stew', 'soup', 'salad', 'pie', 'risotto', 'pasta', 'tacos',
+    'burger', 'bake', 'stir fry', 'tart', 'casserole', 'skewers', 'wrap',
+    'bowl', 'traybake', 'hash', 'gratin', 'pilaf',
+)
+
+
+def percentile(samples, pct):
+    """Return the pct percentile of the samples using the nearest rank"""
+    ordered = sorted(samples)
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def time_calls(func, iterations, warmup=3):
+    """Call func repeatedly and return the duration of each call in ms"""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def summarize(samples):
+    """Return a one line summary of the samples in ms"""
+    return 'p50={:.2f}ms p95={:.2f}ms max={:.2f}ms'.format(
+        percentile(samples, 50),
+        percentile(samples, 95),
+        max(samples)
+    )
+
+
+def get_bench_user(email=BENCH_USER_EMAIL):
+    """Return the user owning the benchmark data"""
+    user, _ = get_user_model().objects.get_or_create(email=email)
+    return user
+
+
+def random_title(rng):
+    """Return a recipe title made of random words"""
+    return ' '.join((
+        rng.choice(TITLE_ADJECTIVES),
+        rng.choice(INGREDIENT_WORDS),
+        rng.choice(TITLE_DISHES)
+    ))
+
+
+def ingredient_name(index):
+    """Return the unique name of the index-th ingredient"""
+    name = INGREDIENT_WORDS[index % len(INGREDIENT_WORDS)].capitalize()
+    if index < len(INGREDIENT_WORDS):
+        return name
+    return f'{name} {index // len(INGREDIENT_WORDS)}'
+
+
+def seed_recipes(user, recipes, tags=100, ingredients=500,
+                 tags_per_recipe=5, ingredients_per_recipe=5,
+                 batch_size=10000, seed=0):
+    """
+    Create recipes for the user linked to random tags and ingredients
+
+    Uses bulk inserts so millions of through rows can be created in
+    reasonable time; signals aren't sent for the created rows, so the
+    search vectors are computed at the end.
+    """
+    rng = random.Random(seed)
+    tag_ids = [tag.id for tag in Tag.objects.bulk_create(
+        (Tag(user=user, name=f'Tag {i}') for i in range(tags)),
+        batch_size=batch_size
+    )]
+    ingredient_ids = [ingredient.id for ingredient in (
+        Ingredient.objects.bulk_create(
+            (Ingredient(user=user, name=ingredient_name(i))
+             for i in range(ingredients)),
+            batch_size=batch_size
+        )
+    )]
+    recipe_tags = Recipe.tags.through
+    recipe_ingredients = Recipe.ingredients.through
+    for offset in range(0, recipes, batch_size):
+        batch = Recipe.objects.bulk_create(
+            Recipe(
+                user=user,
+                title=random_title(rng),
+                time_minutes=rng.randint(5, 240),
+                price=rng.randint(100, 99999) / 100
+            )
+            for _ in range(offset, min(offset + batch_size, recipes))
+        )
+        recipe_tags.objects.bulk_create(
+            recipe_tags(recipe_id=recipe.id, tag_id=tag_id)
+            for recipe in batch
+            for tag_id in rng.sample(tag_ids, tags_per_recipe)
+        )
+        recipe_ingredients.objects.bulk_create(
+            recipe_ingredients(recipe_id=recipe.id, ingredient_id=ingr_id)
+            for recipe in batch
+            for ingr_id in rng.sample(ingredient_ids, ingredients_per_recipe)
+        )
+    Recipe.objects.filter(user=user).update_search_vectors()
+    return tag_ids, ingredient_ids
@@ -0,0 +1,212 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+
+DEFAULT_RESPONSE_CACHE = {
+    'BACKEND': 'core.cache.LRUCacheBackend',
+    'GENERATION_CACHE_ALIAS': 'default',
+    'OPTIONS': {},
+}
+
+
+class CacheStats:
+    """Thread safe hit, miss and eviction counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def incr(self, counter, delta=1):
+        with self._lock:
+            self._counters[counter] += delta
+
+    def as_dict(self):
+        with self._lock:
+            return dict(self._counters)
+
+
+class LRUCacheBackend:
+    """In-process cache bounded in size, evicting least recently used"""
+
+    def __init__(self, max_entries=1024, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        """Return the cached value or None when missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        self.stats.incr('misses' if entry is None else 'hits')
+        return None if entry is None else entry[0]
+
+    def set(self, key, value):
+        """Cache the value, evicting the oldest entries beyond the bound"""
+        evicted = 0
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+        if evicted:
+            self.stats.incr('evictions', evicted)
+
+    def delete(self, key):
+        """Remove the cached value, if any"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DjangoCacheBackend:
+    """
+    Cache stored in one of the CACHES, shared between processes when the
+    cache is; the size bound is the MAX_ENTRIES option of that cache
+    """
+
+    def __init__(self, alias='default', ttl=60):
+        self.cache = caches[alias]
+        self.ttl = ttl
+        self.stats = CacheStats()
+
+    def get(self, key):
+        """Return the cached value or None when missing or expired"""
+        value = self.cache.get(key)
+        self.stats.incr('misses' if value is None else 'hits')
+        return value
+
+    def set(self, key, value):
+        self.cache.set(key, value, self.ttl)
+
+    def delete(self, key):
+        """Remove the cached value, if any"""
+        self.cache.delete(key)
+
+    def clear(self):
+        self.cache.clear()
+
+
+class ResponseCache:
+    """
+    Cache of serialized responses keyed by user, endpoint and query
+
+    Keys embed a per-user generation counter; bumping it whenever the
+    user's data changes makes every previous entry unreachable.
+    """
+
+    def __init__(self, backend, generation_cache):
+        self.backend = backend
+        self.generation_cache = generation_cache
+
+    def get_generation(self, user_id):
+        """Return the current generation of the user's data"""
+        key = f'response-generation:{user_id}'
+        generation = self.generation_cache.get(key)
+        if generation is None:
+            # Start from the clock so a counter lost by the cache never
+            # restarts at a generation that was already used
+            self.generation_cache.add(key, int(time.time() * 1000), None)
+            generation = self.generation_cache.get(key)
+        return generation
+
+    def get_last_modified(self, user_id):
+        """Return the timestamp of the last change to the user's data"""
+        key = f'response-modified:{user_id}'
+        modified = self.generation_cache.get(key)
+        if modified is None:
+            # Unknown once lost by the cache: assuming the data just
+            # changed is always safe for conditional requests
+            self.generation_cache.add(key, int(time.time()), None)
+            modified = self.generation_cache.get(key)
+        return modified
+
+    def bump_generation(self, user_id):
+        """Invalidate all the cached responses of the user"""
+        key = f'response-generation:{user_id}'
+        try:
+            self.generation_cache.incr(key)
+        except ValueError:
+            self.generation_cache.set(key, int(time.time() * 1000), None)
+        # Moved past the previous second even when changes come faster, so
+        # a client holding a Last-Modified of that second isn't told its
+        # copy is current; it can run a few seconds ahead of the clock
+        key = f'response-modified:{user_id}'
+        now = int(time.time())
+        try:
+            modified = self.generation_cache.incr(key)
+        except ValueError:
+            modified = None
+        if modified is None or modified < now:
+            self.generation_cache.set(key, now, None)
+
+    def invalidate(self, user_id):
+        """
+        Invalidate the cached responses of the user now and again once
+        the current transaction commits, as concurrent requests may cache
+        the data it replaces under the generation bumped before
+        """
+        self.bump_generation(user_id)
+        transaction.on_commit(lambda: self.bump_generation(user_id))
+
+    def make_key(self, user_id, path, query_params, media_type=''):
+        """Return the cache key of a request rendered as the media type"""
+        params = sorted(
+            (param, value)
+            for param in query_params
+            for value in query_params.getlist(param)
+        )
+        digest = hashlib.md5(
+            json.dumps([path, params, media_type]).encode()
+        ).hexdigest()
+        generation = self.get_generation(user_id)
+        return f'response:{user_id}:{generation}:{digest}'
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def set(self, key, value):
+        self.backend.set(key, value)
+
+    def stats(self):
+        """Return the hit, miss and eviction counters of the backend"""
+        return self.backend.stats.as_dict()
+
+
+_response_cache = None
+
+
+def get_response_cache():
+    """Return the response cache configured by RESPONSE_CACHE"""
+    global _response_cache
+    if _response_cache is None:
+        config = dict(
+            DEFAULT_RESPONSE_CACHE,
+            **getattr(settings, 'RESPONSE_CACHE', {})
+        )
+        options = {
+            option.lower(): value
+            for option, value in config['OPTIONS'].items()
+        }
+        _response_cache = ResponseCache(
+            import_string(config['BACKEND'])(**options),
+            caches[config['GENERATION_CACHE_ALIAS']]
+        )
+    return _response_cache
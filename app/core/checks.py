@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+from core.authentication import DEFAULT_TOKEN_CACHE
+from core.cache import DEFAULT_RESPONSE_CACHE
+
+
+# Backends keeping their entries in the memory of each process, which
+# can't be used to share invalidations
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def check_shared_cache(setting, alias, id):
+    """Return an error if the cache alias isn't shared by processes"""
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    if backend is None:
+        return [Error(
+            f"{setting} uses the '{alias}' cache, which isn't defined in "
+            f"CACHES.",
+            id=id,
+        )]
+    if backend in PROCESS_LOCAL_CACHES:
+        return [Error(
+            f"{setting} uses the '{alias}' cache, whose {backend} backend "
+            f"isn't shared by the processes serving the API.",
+            hint="Use memcached, redis or the database cache.",
+            id=id,
+        )]
+    return []
+
+
+@register(Tags.caches)
+def check_token_cache(app_configs, **kwargs):
+    """Check the token cache invalidations reach every process"""
+    config = dict(DEFAULT_TOKEN_CACHE, **getattr(settings, 'TOKEN_CACHE', {}))
+    return check_shared_cache(
+        'TOKEN_CACHE', config['CACHE_ALIAS'], 'core.E001'
+    )
+
+
+@register(Tags.caches)
+def check_response_cache(app_configs, **kwargs):
+    """Check the response generations are shared by every process"""
+    config = dict(
+        DEFAULT_RESPONSE_CACHE,
+        **getattr(settings, 'RESPONSE_CACHE', {})
+    )
+    return check_shared_cache(
+        'RESPONSE_CACHE', config['GENERATION_CACHE_ALIAS'], 'core.E002'
+    )
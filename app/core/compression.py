@@ -0,0 +1,126 @@
+import re
+import zlib
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+DEFAULT_COMPRESSION = {
+    'MIN_SIZE': 1024,
+    'GZIP_LEVEL': 6,
+    'BROTLI_QUALITY': 5,
+    'CONTENT_TYPES': (
+        'application/json',
+        'application/x-ndjson',
+        'text/',
+    ),
+}
+ACCEPT_ENCODING_RE = re.compile(
+    r'^\s*([^\s;,]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*$'
+)
+
+
+def get_compression_settings():
+    """Return the COMPRESSION settings with the defaults"""
+    return dict(DEFAULT_COMPRESSION, **getattr(settings, 'COMPRESSION', {}))
+
+
+def supported_encodings():
+    """Return the supported encodings, most efficient first"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def accepted_encoding(request):
+    """Return the best supported encoding accepted by the client, if any"""
+    accepted = {}
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        match = ACCEPT_ENCODING_RE.match(item)
+        if match is None:
+            continue
+        try:
+            quality = float(match.group(2) or 1)
+        except ValueError:
+            continue
+        accepted[match.group(1).lower()] = quality
+    for encoding in supported_encodings():
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+def is_compressible(content_type):
+    """Return whether responses of the content type are compressed"""
+    return content_type.startswith(
+        tuple(get_compression_settings()['CONTENT_TYPES'])
+    )
+
+
+def _compressor(encoding):
+    """Return an incremental compressor for the encoding"""
+    config = get_compression_settings()
+    if encoding == 'br':
+        return brotli.Compressor(quality=config['BROTLI_QUALITY'])
+    # 31 selects the gzip container
+    return zlib.compressobj(config['GZIP_LEVEL'], zlib.DEFLATED, 31)
+
+
+def compress(content, encoding):
+    """Return the content compressed with the encoding"""
+    compressor = _compressor(encoding)
+    if encoding == 'br':
+        return compressor.process(content) + compressor.finish()
+    return compressor.compress(content) + compressor.flush()
+
+
+def compress_stream(chunks, encoding):
+    """Compress the chunks of a streaming response as they are produced"""
+    compressor = _compressor(encoding)
+    if encoding == 'br':
+        process, finish = compressor.process, compressor.finish
+    else:
+        process, finish = compressor.compress, compressor.flush
+    for chunk in chunks:
+        data = process(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compress responses with brotli or gzip as negotiated with the client,
+    leaving alone responses smaller than the MIN_SIZE setting and those
+    already encoded, like the ones served by the response cache
+    """
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding') or \
+                not is_compressible(response.get('Content-Type', '')):
+            return response
+        if not response.streaming and \
+                len(response.content) < get_compression_settings()['MIN_SIZE']:
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = accepted_encoding(request)
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compress_stream(
+                response.streaming_content, encoding
+            )
+            del response['Content-Length']
+        else:
+            response.content = compress(response.content, encoding)
+            response['Content-Length'] = str(len(response.content))
+        # The compressed body is a different representation
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = f'W/{etag}'
+        response['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,118 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+DEFAULT_EXECUTORS = {
+    'PASSWORD_EXECUTOR': {
+        'MAX_WORKERS': 2,
+        'MAX_QUEUE': 64,
+        'RETRY_AFTER': 1,
+    },
+    'IMAGE_EXECUTOR': {
+        'MAX_WORKERS': 2,
+        'MAX_QUEUE': 32,
+        'RETRY_AFTER': 5,
+    },
+}
+
+
+class Overloaded(APIException):
+    """Raised when there is no room left to queue more work"""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('Too many requests are being processed, '
+                       'try again later.')
+    default_code = 'overloaded'
+
+    def __init__(self, detail=None, code=None, wait=None):
+        super().__init__(detail, code)
+        # Sent as the Retry-After header by the exception handler
+        self.wait = wait
+
+
+class OverloadedMiddleware(MiddlewareMixin):
+    """
+    Answer 503 with Retry-After when Overloaded escapes a view outside
+    REST framework, like the password checks of the admin login
+    """
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, Overloaded):
+            return None
+        response = HttpResponse(
+            str(exception.detail),
+            content_type='text/plain; charset=utf-8',
+            status=exception.status_code
+        )
+        if exception.wait is not None:
+            response['Retry-After'] = '%d' % exception.wait
+        return response
+
+
+class BoundedExecutor:
+    """
+    Thread pool running at most max_workers calls at a time and queueing
+    at most max_queue more, rejecting the calls beyond that
+    """
+
+    def __init__(self, max_workers, max_queue, retry_after=1):
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(max_workers)
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+
+    def check_capacity(self):
+        """Raise Overloaded unless a call could be queued right now"""
+        if not self._slots.acquire(blocking=False):
+            raise Overloaded(wait=self.retry_after)
+        self._slots.release()
+
+    def submit(self, fn, *args, **kwargs):
+        """Schedule the call and return its future, or raise Overloaded"""
+        if not self._slots.acquire(blocking=False):
+            raise Overloaded(wait=self.retry_after)
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda future: self._slots.release())
+        return future
+
+    def run(self, fn, *args, **kwargs):
+        """Run the call on the pool and return its result"""
+        return self.submit(fn, *args, **kwargs).result()
+
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(name):
+    """Return the executor configured by the setting of the name"""
+    with _executors_lock:
+        if name not in _executors:
+            config = dict(
+                DEFAULT_EXECUTORS[name],
+                **getattr(settings, name, {})
+            )
+            _executors[name] = BoundedExecutor(
+                config['MAX_WORKERS'],
+                config['MAX_QUEUE'],
+                retry_after=config['RETRY_AFTER']
+            )
+    return _executors[name]
+
+
+def get_password_executor():
+    """Return the executor hashing passwords"""
+    return get_executor('PASSWORD_EXECUTOR')
+
+
+def get_image_executor():
+    """Return the executor processing uploaded images"""
+    return get_executor('IMAGE_EXECUTOR')
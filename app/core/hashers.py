@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, \
+    PBKDF2PasswordHasher, check_password, make_password
+
+
+DEFAULT_PASSWORD_HASHING = {
+    'ARGON2_TIME_COST': 2,
+    'ARGON2_MEMORY_COST': 19456,
+    'ARGON2_PARALLELISM': 1,
+    'PBKDF2_ITERATIONS': 150000,
+}
+
+
+def get_password_hashing_settings():
+    """Return the PASSWORD_HASHING settings with the defaults"""
+    return dict(
+        DEFAULT_PASSWORD_HASHING,
+        **getattr(settings, 'PASSWORD_HASHING', {})
+    )
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2 hasher with its costs taken from the settings"""
+
+    @property
+    def time_cost(self):
+        return get_password_hashing_settings()['ARGON2_TIME_COST']
+
+    @property
+    def memory_cost(self):
+        return get_password_hashing_settings()['ARGON2_MEMORY_COST']
+
+    @property
+    def parallelism(self):
+        return get_password_hashing_settings()['ARGON2_PARALLELISM']
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2 hasher with its iterations taken from the settings"""
+
+    @property
+    def iterations(self):
+        return get_password_hashing_settings()['PBKDF2_ITERATIONS']
+
+
+def verify_password(raw_password, encoded):
+    """
+    Return whether the password matches the encoded one, and its new
+    encoding when it was hashed with outdated parameters
+    """
+    rehashed = []
+    valid = check_password(
+        raw_password,
+        encoded,
+        lambda raw_password: rehashed.append(make_password(raw_password))
+    )
+    return valid, rehashed[0] if rehashed else None
@@ -0,0 +1,193 @@
+import io
+import logging
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+from core.executors import Overloaded, get_image_executor
+from core.models import Recipe
+from core.uploads import check_image_pixels
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_IMAGE_RENDITIONS = {
+    # Longest side of each rendition, in pixels
+    'SIZES': {
+        'full': 2048,
+        'medium': 800,
+        'thumb': 200,
+    },
+    'FORMATS': ('jpeg', 'webp'),
+    'JPEG_QUALITY': 85,
+    'WEBP_QUALITY': 80,
+}
+EXTENSIONS = {
+    'jpeg': 'jpg',
+    'webp': 'webp',
+}
+
+
+def get_rendition_settings():
+    """Return the IMAGE_RENDITIONS settings with the defaults"""
+    return dict(
+        DEFAULT_IMAGE_RENDITIONS,
+        **getattr(settings, 'IMAGE_RENDITIONS', {})
+    )
+
+
+def encode(image, image_format):
+    """Return the image encoded in the format, without any metadata"""
+    config = get_rendition_settings()
+    content = io.BytesIO()
+    if image_format == 'jpeg':
+        image.save(content, 'JPEG', quality=config['JPEG_QUALITY'],
+                   optimize=True, progressive=True)
+    else:
+        image.save(content, 'WEBP', quality=config['WEBP_QUALITY'])
+    return content.getvalue()
+
+
+def make_renditions(field_file):
+    """
+    Decode the image of the field file once and store its renditions
+    named like uploads of the field, returning them as {rendition:
+    {width, height, format: name}}
+    """
+    config = get_rendition_settings()
+    sizes = sorted(config['SIZES'].items(), key=lambda item: -item[1])
+    storage = field_file.storage
+    with storage.open(field_file.name, 'rb') as content:
+        image = Image.open(content)
+        # Uploads are checked already, this guards files saved otherwise
+        check_image_pixels(image.size)
+        # Let JPEG decoding scale down to the largest rendition already
+        image.draft('RGB', (sizes[0][1], sizes[0][1]))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGB')
+
+    renditions = {}
+    try:
+        for rendition, size in sizes:
+            # Each rendition is scaled down from the previous larger one
+            image.thumbnail((size, size), Image.LANCZOS)
+            renditions[rendition] = {
+                'width': image.width,
+                'height': image.height,
+            }
+            for image_format in config['FORMATS']:
+                renditions[rendition][image_format] = storage.save(
+                    field_file.field.generate_filename(
+                        field_file.instance,
+                        f'{rendition}.{EXTENSIONS[image_format]}'
+                    ),
+                    ContentFile(encode(image, image_format))
+                )
+    except Exception:
+        # Release the renditions saved before the failure
+        for name in rendition_names(renditions):
+            storage.delete(name)
+        raise
+    return renditions
+
+
+def rendition_names(renditions):
+    """Return the names of the files of the renditions"""
+    return [
+        name
+        for rendition in renditions.values()
+        for key, name in rendition.items()
+        if key in EXTENSIONS
+    ]
+
+
+def lock_recipe_image(recipe_id):
+    """
+    Return the recipe with its image locked until the end of the
+    transaction, so its references are released once
+    """
+    return Recipe.objects.select_for_update().only(
+        'id', 'user_id', 'image', 'image_status', 'image_renditions'
+    ).get(pk=recipe_id)
+
+
+def recipe_image_names(recipe):
+    """
+    Return the names of the files of the recipe image and renditions,
+    once per reference held by the recipe
+    """
+    names = rendition_names(recipe.image_renditions)
+    # Processed images are one of the renditions
+    if recipe.image and recipe.image.name not in names:
+        names.append(recipe.image.name)
+    return names
+
+
+def process_recipe_image(recipe_id):
+    """
+    Make the renditions of the pending image of a recipe and record them
+    in place of the upload, unless it was replaced in the meantime
+    """
+    recipe = Recipe.objects.filter(
+        pk=recipe_id,
+        image_status=Recipe.IMAGE_PENDING
+    ).only('id', 'image').first()
+    if recipe is None or not recipe.image:
+        return
+    storage = recipe.image.storage
+    name = recipe.image.name
+    try:
+        renditions = make_renditions(recipe.image)
+    except Exception:
+        logger.exception('Processing the image of recipe %s failed',
+                         recipe_id)
+        Recipe.objects.filter(
+            pk=recipe_id,
+            image=name,
+            image_status=Recipe.IMAGE_PENDING
+        ).update(image_status=Recipe.IMAGE_FAILED)
+        return
+
+    # The upload is replaced by the largest rendition in the first format,
+    # unless it was replaced or processed by another worker meanwhile
+    config = get_rendition_settings()
+    largest = max(config['SIZES'], key=config['SIZES'].get)
+    updated = Recipe.objects.filter(
+        pk=recipe_id,
+        image=name,
+        image_status=Recipe.IMAGE_PENDING
+    ).update(
+        image=renditions[largest][config['FORMATS'][0]],
+        image_status=Recipe.IMAGE_READY,
+        image_renditions=renditions
+    )
+    for unused in [name] if updated else rendition_names(renditions):
+        storage.delete(unused)
+
+
+def _run_process_recipe_image(recipe_id):
+    """Process the image on an executor thread, closing its connection"""
+    try:
+        process_recipe_image(recipe_id)
+    finally:
+        close_old_connections()
+
+
+def submit_recipe_image(recipe_id):
+    """
+    Queue the image on the image executor, leaving it pending for the
+    process_pending_images command when the executor is overloaded
+    """
+    try:
+        get_image_executor().submit(_run_process_recipe_image, recipe_id)
+    except Overloaded:
+        logger.warning('The image of recipe %s is left pending, the image '
+                       'executor is overloaded', recipe_id)
+
+
+def schedule_recipe_image(recipe_id):
+    """
+    Process the image of the recipe on the image executor once the
+    current transaction is committed
+    """
+    transaction.on_commit(lambda: submit_recipe_image(recipe_id))
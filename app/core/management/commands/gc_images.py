@@ -0,0 +1,85 @@
+import datetime
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+from core.models import ImageBlob
+from core.storage import image_storage
+
+
+class Command(BaseCommand):
+    """
+    Django command to remove the image files left without references and
+    report the space saved by storing identical images once
+    """
+    help = 'Remove unreferenced image files and report the disk savings'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace',
+            type=int,
+            default=3600,
+            help='Seconds a file stays without references before removal'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report the files which would be removed'
+        )
+
+    def handle(self, *args, **options):
+        unreferenced = ImageBlob.objects.unreferenced(
+            timezone.now() - datetime.timedelta(seconds=options['grace'])
+        )
+        if options['dry_run']:
+            removed = unreferenced.aggregate(
+                count=Count('id'),
+                size=Sum('size')
+            )
+        else:
+            removed = self.collect(unreferenced, options['batch_size'])
+        self.stdout.write(
+            f'{"Would remove" if options["dry_run"] else "Removed"} '
+            f'{removed["count"]} files, {self.megabytes(removed["size"])}'
+        )
+
+        stats = ImageBlob.objects.filter(refcount__gt=0).aggregate(
+            files=Count('id'),
+            references=Sum('refcount'),
+            stored=Sum('size'),
+            referenced=Sum(F('size') * F('refcount'))
+        )
+        saved = (stats['referenced'] or 0) - (stats['stored'] or 0)
+        self.stdout.write(
+            f'{stats["files"]} files with {stats["references"] or 0} '
+            f'references: {self.megabytes(stats["stored"])} stored for '
+            f'{self.megabytes(stats["referenced"])} referenced, '
+            f'{self.megabytes(saved)} saved'
+        )
+
+    def collect(self, unreferenced, batch_size):
+        """
+        Remove the unreferenced files by batches, each deleting their rows
+        once the files are gone so saving them again waits and rewrites
+        them
+        """
+        removed = {'count': 0, 'size': 0}
+        while True:
+            with transaction.atomic():
+                batch = list(unreferenced.select_for_update(
+                    skip_locked=True
+                ).values_list('id', 'name', 'size')[:batch_size])
+                for pk, name, size in batch:
+                    image_storage.remove(name)
+                    removed['count'] += 1
+                    removed['size'] += size
+                ImageBlob.objects.filter(
+                    id__in=[pk for pk, name, size in batch]
+                ).delete()
+            if len(batch) < batch_size:
+                return removed
+
+    @staticmethod
+    def megabytes(size):
+        return f'{(size or 0) / 1024 / 1024:.1f}MB'
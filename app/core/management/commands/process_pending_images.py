@@ -0,0 +1,34 @@
+import datetime
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from core.images import process_recipe_image
+from core.models import Recipe
+
+
+class Command(BaseCommand):
+    """
+    Django command to process the recipe images left pending, when the
+    image executor was overloaded or its process stopped
+    """
+    help = 'Process the recipe images pending for too long'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than',
+            type=int,
+            default=300,
+            help='Seconds an image stays pending before being processed'
+        )
+
+    def handle(self, *args, **options):
+        pending = Recipe.objects.filter(
+            image_status=Recipe.IMAGE_PENDING,
+            updated_at__lt=timezone.now() - datetime.timedelta(
+                seconds=options['older_than']
+            )
+        ).order_by('id').values_list('id', flat=True)
+        count = 0
+        for recipe_id in pending.iterator():
+            process_recipe_image(recipe_id)
+            count += 1
+        self.stdout.write(f'Processed {count} pending images')
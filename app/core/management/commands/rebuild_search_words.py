@@ -0,0 +1,32 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from core.models import SearchWord
+
+
+class Command(BaseCommand):
+    """
+    Django command to rebuild the search vocabularies from the recipes,
+    dropping the words of renamed and deleted recipes, tags and
+    ingredients
+    """
+    help = 'Rebuild the vocabularies used to correct search typos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            help='ID of a user to rebuild the vocabulary of (default: all)'
+        )
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.order_by('id')
+        if options['user']:
+            users = users.filter(id__in=options['user'])
+        before = SearchWord.objects.count()
+        for user in users.only('id').iterator():
+            SearchWord.objects.rebuild(user)
+        self.stdout.write(
+            f'Rebuilt {users.count()} vocabularies: {before} words before, '
+            f'{SearchWord.objects.count()} after'
+        )
@@ -0,0 +1,225 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+from django.conf import settings
+from django.db.models import Q
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, \
+    patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from django.views.decorators.http import require_safe
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from core.authentication import CachedTokenAuthentication
+from core.images import get_rendition_settings
+from core.models import ImageBlob, Recipe
+
+
+DEFAULT_MEDIA_SERVING = {
+    # X-Accel-Redirect (nginx) or X-Sendfile (Apache, lighttpd) to let the
+    # front proxy send the files, None to send them from Django
+    'SENDFILE_HEADER': None,
+    # Prefix of the internal nginx location aliasing MEDIA_ROOT
+    'INTERNAL_URL': '/protected-media/',
+    'MAX_AGE': 24 * 60 * 60,
+}
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def get_media_serving_settings():
+    """Return the MEDIA_SERVING settings with the defaults"""
+    return dict(
+        DEFAULT_MEDIA_SERVING,
+        **getattr(settings, 'MEDIA_SERVING', {})
+    )
+
+
+class MediaFileResponse(FileResponse):
+    """File response reading larger blocks when not sent with sendfile"""
+    block_size = 64 * 2 ** 10
+
+
+class FileRange:
+    """
+    File object reading a byte range of a file, keeping its descriptor so
+    WSGI servers can still send the range with sendfile, bounded by the
+    Content-Length
+    """
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def recipes_referencing(name):
+    """Return the recipes whose image or one of its renditions is a file"""
+    config = get_rendition_settings()
+    references = Q(image=name)
+    for rendition in config['SIZES']:
+        for image_format in config['FORMATS']:
+            references |= Q(image_renditions__contains={
+                rendition: {image_format: name}
+            })
+    return Recipe.objects.filter(references)
+
+
+def authorize_media(request, path):
+    """
+    Raise Http404 unless the request is authenticated as a user who can
+    see a recipe referencing the file: its owner, or staff
+    """
+    request = Request(request, authenticators=(
+        SessionAuthentication(),
+        CachedTokenAuthentication(),
+    ))
+    try:
+        user = request.user
+    except APIException:
+        raise Http404
+    if not user.is_authenticated:
+        raise Http404
+    recipes = recipes_referencing(path)
+    if not user.is_staff:
+        recipes = recipes.filter(user=user)
+    # Counted as exists() adds a LIMIT, with which the planner, unable to
+    # estimate the containments, prefers scanning the table for an early
+    # match over the indexes
+    if not recipes.count():
+        raise Http404
+
+
+def media_path(path):
+    """
+    Return the absolute path of a media file which can be served, raising
+    Http404 for paths out of MEDIA_ROOT, files being written and files
+    released by their last reference
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    name = os.path.basename(full_path)
+    if name.startswith('.') or name.endswith('.tmp') or \
+            not os.path.isfile(full_path) or \
+            ImageBlob.objects.filter(name=path, refcount__lte=0).exists():
+        raise Http404
+    return full_path
+
+
+def parse_range(header, size):
+    """
+    Return the start and length of a single byte range, None when the
+    whole file should be sent, or raise ValueError when unsatisfiable
+    """
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = min(int(last), size)
+        if length == 0:
+            raise ValueError(header)
+        return size - length, length
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError(header)
+    return start, end - start + 1
+
+
+def if_range_matches(request, etag, last_modified):
+    """Return whether a range request applies to the file version"""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serve a media file to the users who can see it, answering conditional
+    and range requests, or let the front proxy send it with the
+    SENDFILE_HEADER
+    """
+    authorize_media(request, path)
+    full_path = media_path(path)
+    stat = os.stat(full_path)
+    last_modified = int(stat.st_mtime)
+    etag = quote_etag(f'{last_modified:x}-{stat.st_size:x}')
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        response = send_file(request, path, full_path, stat.st_size, etag,
+                             last_modified)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(
+        response,
+        private=True,
+        max_age=get_media_serving_settings()['MAX_AGE']
+    )
+    return response
+
+
+def send_file(request, path, full_path, size, etag, last_modified):
+    """Return the response sending the file or the requested range"""
+    config = get_media_serving_settings()
+    content_type = mimetypes.guess_type(path)[0] or \
+        'application/octet-stream'
+    header = config['SENDFILE_HEADER']
+    if header:
+        response = HttpResponse(content_type=content_type)
+        if header.lower() == 'x-accel-redirect':
+            response[header] = quote(config['INTERNAL_URL'] + path)
+        else:
+            response[header] = full_path
+        return response
+
+    byte_range = None
+    if request.method == 'GET' and \
+            if_range_matches(request, etag, last_modified):
+        try:
+            byte_range = parse_range(request.META.get('HTTP_RANGE', ''),
+                                     size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    file = open(full_path, 'rb')
+    if byte_range is None:
+        response = MediaFileResponse(file, content_type=content_type)
+        response['Content-Length'] = str(size)
+    else:
+        start, length = byte_range
+        response = MediaFileResponse(FileRange(file, start, length),
+                                     status=206, content_type=content_type)
+        response['Content-Length'] = str(length)
+        response['Content-Range'] = \
+            f'bytes {start}-{start + length - 1}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.28 on 2026-10-17 04:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_recipe_image'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'id'], name='core_recipe_user_id_idx'),
+        ),
+    ]
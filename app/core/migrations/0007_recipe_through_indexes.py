@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_recipe_user_id_index'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX core_recipe_tags_tag_recipe_idx '
+            'ON core_recipe_tags (tag_id, recipe_id);',
+            'DROP INDEX core_recipe_tags_tag_recipe_idx;'
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX core_recipe_ingredients_ingredient_recipe_idx '
+            'ON core_recipe_ingredients (ingredient_id, recipe_id);',
+            'DROP INDEX core_recipe_ingredients_ingredient_recipe_idx;'
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 2.2.28 on 2026-10-17 04:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_recipe_through_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', '-name', '-id'], name='core_ingredient_user_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', '-name', '-id'], name='core_tag_user_name_idx'),
+        ),
+    ]
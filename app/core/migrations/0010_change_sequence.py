@@ -0,0 +1,68 @@
+# Generated by Django 2.2.28 on 2026-10-17 04:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeSequence',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=32)),
+                ('object_id', models.IntegerField()),
+                ('change_seq', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='change_seq',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='change_seq',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='change_seq',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', 'change_seq'], name='core_ingredient_user_seq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'change_seq'], name='core_recipe_user_seq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', 'change_seq'], name='core_tag_user_seq_idx'),
+        ),
+        migrations.AddField(
+            model_name='tombstone',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['user', 'change_seq'], name='core_tombstone_user_seq_idx'),
+        ),
+    ]
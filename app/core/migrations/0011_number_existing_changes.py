@@ -0,0 +1,39 @@
+from django.db import migrations
+
+
+NUMBER_EXISTING_CHANGES = '''
+WITH numbered AS (
+    SELECT kind, id, user_id, row_number() OVER (
+        PARTITION BY user_id ORDER BY kind, id
+    ) AS seq
+    FROM (
+        SELECT 'ingredient' AS kind, id, user_id FROM core_ingredient
+        UNION ALL
+        SELECT 'recipe', id, user_id FROM core_recipe
+        UNION ALL
+        SELECT 'tag', id, user_id FROM core_tag
+    ) AS objects
+), ingredients AS (
+    UPDATE core_ingredient SET change_seq = numbered.seq FROM numbered
+    WHERE numbered.kind = 'ingredient' AND core_ingredient.id = numbered.id
+), recipes AS (
+    UPDATE core_recipe SET change_seq = numbered.seq FROM numbered
+    WHERE numbered.kind = 'recipe' AND core_recipe.id = numbered.id
+), tags AS (
+    UPDATE core_tag SET change_seq = numbered.seq FROM numbered
+    WHERE numbered.kind = 'tag' AND core_tag.id = numbered.id
+)
+INSERT INTO core_changesequence (user_id, value)
+SELECT user_id, max(seq) FROM numbered GROUP BY user_id;
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_change_sequence'),
+    ]
+
+    operations = [
+        migrations.RunSQL(NUMBER_EXISTING_CHANGES, migrations.RunSQL.noop),
+    ]
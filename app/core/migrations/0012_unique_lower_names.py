@@ -0,0 +1,89 @@
+from django.db import migrations
+
+
+# Merge the tags or ingredients of a user whose names differ only in case
+# into the oldest one, leaving tombstones for the removed objects and
+# numbering the relinked recipes as changed. Foreign keys are checked
+# right away so the unique indexes can be created in the same transaction
+MERGE_DUPLICATE_NAMES = '''
+SET CONSTRAINTS ALL IMMEDIATE;
+WITH duplicates AS (
+    SELECT id, user_id, keep FROM (
+        SELECT id, user_id, min(id) OVER (
+            PARTITION BY user_id, lower(name)
+        ) AS keep
+        FROM core_{model}
+    ) AS named
+    WHERE id <> keep
+), links AS (
+    SELECT DISTINCT link.recipe_id, duplicates.keep, duplicates.user_id
+    FROM core_recipe_{relation} AS link
+    JOIN duplicates ON duplicates.id = link.{model}_id
+), numbered AS (
+    SELECT kind, changes.id, changes.user_id,
+        coalesce(sequence.value, 0) + row_number() OVER (
+            PARTITION BY changes.user_id ORDER BY kind, changes.id
+        ) AS seq
+    FROM (
+        SELECT '{model}' AS kind, id, user_id FROM duplicates
+        UNION
+        SELECT 'recipe', recipe_id, user_id FROM links
+    ) AS changes
+    LEFT JOIN core_changesequence AS sequence
+        ON sequence.user_id = changes.user_id
+), relinked AS (
+    INSERT INTO core_recipe_{relation} (recipe_id, {model}_id)
+    SELECT recipe_id, keep FROM links
+    ON CONFLICT DO NOTHING
+), unlinked AS (
+    DELETE FROM core_recipe_{relation} USING duplicates
+    WHERE core_recipe_{relation}.{model}_id = duplicates.id
+), deleted AS (
+    DELETE FROM core_{model} USING duplicates
+    WHERE core_{model}.id = duplicates.id
+), tombstones AS (
+    INSERT INTO core_tombstone (
+        user_id, kind, object_id, change_seq, deleted_at
+    )
+    SELECT user_id, kind, id, seq, now() FROM numbered
+    WHERE kind = '{model}'
+), touched AS (
+    UPDATE core_recipe SET change_seq = numbered.seq, updated_at = now()
+    FROM numbered
+    WHERE numbered.kind = 'recipe' AND core_recipe.id = numbered.id
+)
+INSERT INTO core_changesequence (user_id, value)
+SELECT user_id, max(seq) FROM numbered GROUP BY user_id
+ON CONFLICT (user_id) DO UPDATE SET value = EXCLUDED.value;
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_number_existing_changes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            MERGE_DUPLICATE_NAMES.format(model='tag', relation='tags'),
+            migrations.RunSQL.noop
+        ),
+        migrations.RunSQL(
+            MERGE_DUPLICATE_NAMES.format(
+                model='ingredient',
+                relation='ingredients'
+            ),
+            migrations.RunSQL.noop
+        ),
+        migrations.RunSQL(
+            'CREATE UNIQUE INDEX core_tag_user_lower_name_uniq '
+            'ON core_tag (user_id, lower(name));',
+            'DROP INDEX core_tag_user_lower_name_uniq;'
+        ),
+        migrations.RunSQL(
+            'CREATE UNIQUE INDEX core_ingredient_user_lower_name_uniq '
+            'ON core_ingredient (user_id, lower(name));',
+            'DROP INDEX core_ingredient_user_lower_name_uniq;'
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 2.2.28 on 2026-10-17 05:02
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.operations
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Same vector as RecipeQuerySet.search_vector
+UPDATE_SEARCH_VECTORS = '''
+UPDATE core_recipe SET search_vector =
+    setweight(to_tsvector('english'::regconfig, title), 'A') ||
+    setweight(to_tsvector('english'::regconfig,
+        coalesce((
+            SELECT string_agg(core_tag.name, ' ')
+            FROM core_recipe_tags
+            JOIN core_tag ON core_tag.id = core_recipe_tags.tag_id
+            WHERE core_recipe_tags.recipe_id = core_recipe.id
+        ), '') || ' ' || coalesce((
+            SELECT string_agg(core_ingredient.name, ' ')
+            FROM core_recipe_ingredients
+            JOIN core_ingredient
+                ON core_ingredient.id = core_recipe_ingredients.ingredient_id
+            WHERE core_recipe_ingredients.recipe_id = core_recipe.id
+        ), '')
+    ), 'B');
+'''
+
+# Same words as SearchWordQuerySet.add_words, into the new empty table
+# whose unique constraint is only created at the end of the migration
+ADD_SEARCH_WORDS = '''
+INSERT INTO core_searchword (user_id, word)
+SELECT DISTINCT user_id, unnest(tsvector_to_array(search_vector))
+FROM core_recipe;
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0012_unique_lower_names'),
+    ]
+
+    operations = [
+        django.contrib.postgres.operations.TrigramExtension(),
+        django.contrib.postgres.operations.BtreeGinExtension(),
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='SearchWord',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('word', models.TextField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'word')},
+            },
+        ),
+        migrations.RunSQL(UPDATE_SEARCH_VECTORS, migrations.RunSQL.noop),
+        migrations.RunSQL(ADD_SEARCH_WORDS, migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='core_recipe_search_idx'),
+        ),
+        # Scanned in windows of SEARCH_WINDOW IDs by searches for common words
+        migrations.RunSQL(
+            'CREATE INDEX core_recipe_search_window_idx '
+            'ON core_recipe (user_id, (id / 8192));',
+            'DROP INDEX core_recipe_search_window_idx;'
+        ),
+        migrations.AddIndex(
+            model_name='searchword',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['user', 'word'], name='core_searchword_trgm_idx', opclasses=('int4_ops', 'gin_trgm_ops')),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 2.2.28 on 2026-10-17 05:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_recipe_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'price', 'id'], name='core_recipe_user_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'time_minutes', 'id'], name='core_recipe_user_time_idx'),
+        ),
+    ]
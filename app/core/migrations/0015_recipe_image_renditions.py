@@ -0,0 +1,33 @@
+# Generated by Django 2.2.28 on 2026-10-17 05:51
+
+import django.contrib.postgres.fields.jsonb
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_recipe_price_time_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_renditions',
+            field=django.contrib.postgres.fields.jsonb.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_status',
+            field=models.CharField(blank=True, choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['image'], name='core_recipe_image_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['image_renditions'], name='core_recipe_renditions_idx', opclasses=('jsonb_path_ops',)),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 2.2.28 on 2026-10-17 05:57
+
+import core.models
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_recipe_image_renditions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('size', models.BigIntegerField()),
+                ('refcount', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(null=True, storage=core.storage.ContentAddressedStorage(), upload_to=core.models.recipe_image_file_path),
+        ),
+        migrations.AddIndex(
+            model_name='imageblob',
+            index=models.Index(condition=models.Q(refcount__lte=0), fields=['updated_at'], name='core_imageblob_unref_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='imageblob',
+            constraint=models.CheckConstraint(check=models.Q(refcount__gte=0), name='core_imageblob_refcount_check'),
+        ),
+    ]
@@ -0,0 +1,127 @@
+import hashlib
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, parse_etags, \
+    patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+from core.cache import get_response_cache
+from core.compression import accepted_encoding, compress, \
+    get_compression_settings
+
+
+class CachedResponseMixin:
+    """
+    Serve responses from the per-user response cache, answering
+    conditional requests from the user's data generation and the time it
+    last changed
+
+    The cache holds the rendered body along with its compressed versions,
+    so hits skip both serialization and compression. Only responses
+    rendered as JSON are cached.
+    """
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        """
+        Return 304 when the client's copy is current, otherwise the
+        cached response or the one of the handler, which gets cached
+
+        ETags are only sent with successful responses, so a matching
+        If-None-Match is answered before the handler runs. Other
+        conditions, which any client can send, are only answered with
+        304 once a successful response is cached or returned, so invalid
+        parameters and missing objects fail as they would without them.
+        """
+        if request.accepted_renderer.format != 'json':
+            return handler(request, *args, **kwargs)
+        cache = get_response_cache()
+        key = cache.make_key(
+            request.user.pk,
+            request.build_absolute_uri(request.path),
+            request.query_params,
+            request.accepted_media_type
+        )
+        encoding = accepted_encoding(request)
+        # Each encoding is a different representation of the response
+        etag = quote_etag(
+            hashlib.md5(f'{key}:{encoding}'.encode()).hexdigest()
+        )
+        last_modified = cache.get_last_modified(request.user.pk)
+        if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        if if_none_match and '*' not in if_none_match:
+            response = get_conditional_response(
+                request,
+                etag=etag,
+                last_modified=last_modified
+            )
+            if response is not None:
+                return self._add_validators(response, etag, last_modified)
+
+        entry = cache.get(key)
+        hit = entry is not None
+        if hit:
+            response = HttpResponse(content_type=entry['content_type'])
+        else:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                response['X-Cache'] = 'MISS'
+                return response
+            content = self._render(request, response)
+            entry = {
+                'content_type': response['Content-Type'],
+                'identity': content,
+            }
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
+
+        if encoding is not None and len(entry['identity']) < \
+                get_compression_settings()['MIN_SIZE']:
+            encoding = None
+        body = encoding or 'identity'
+        if body not in entry or not hit:
+            if body not in entry:
+                entry = dict(entry, **{
+                    body: compress(entry['identity'], encoding)
+                })
+            cache.set(key, entry)
+        not_modified = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=last_modified
+        )
+        if not_modified is not None:
+            return self._add_validators(not_modified, etag, last_modified)
+        # Rendered responses aren't rendered again
+        response.content = entry[body]
+        if encoding is not None:
+            response['Content-Encoding'] = encoding
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return self._add_validators(response, etag, last_modified)
+
+    def _render(self, request, response):
+        """Return the body of a response as finalize_response renders it"""
+        response.accepted_renderer = request.accepted_renderer
+        response.accepted_media_type = request.accepted_media_type
+        response.renderer_context = self.get_renderer_context()
+        return response.rendered_content
+
+    @staticmethod
+    def _add_validators(response, etag, last_modified):
+        """Set the ETag and Last-Modified headers of the response"""
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
+
+
+class CachedListModelMixin(CachedResponseMixin):
+    """List a queryset through the response cache"""
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+
+class CachedRetrieveModelMixin(CachedResponseMixin):
+    """Retrieve a model instance through the response cache"""
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
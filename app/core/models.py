@@ -1,12 +1,27 @@
 import os
 import uuid
-from django.db import models
+from django.contrib.postgres.aggregates import ArrayAgg, StringAgg, \
+    JSONBAgg
+from django.contrib.postgres.aggregates.mixins import OrderableAggMixin
+from django.contrib.postgres.fields import ArrayField, JSONField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField, \
+    SearchQuery, SearchRank
+from django.db import models, transaction, connections, router
+from django.db.models import Exists, ExpressionWrapper, OuterRef, \
+    Subquery, F, Func, Q, Value
+from django.db.models.functions import Cast, Coalesce, Greatest, Lower
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
     PermissionsMixin
 )
 from django.conf import settings
+from django.utils import timezone
+from django.contrib.auth.hashers import make_password
+from core.executors import get_password_executor
+from core.hashers import verify_password
+from core.storage import image_storage
 
 
 def recipe_image_file_path(instance, filename):
@@ -59,8 +74,172 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     USERNAME_FIELD = 'email'
 
+    def set_password(self, raw_password):
+        """Hash the password on the password executor"""
+        self.password = get_password_executor().run(
+            make_password, raw_password
+        )
+        self._password = raw_password
 
-class Tag(models.Model):
+    def check_password(self, raw_password):
+        """
+        Check the password on the password executor, saving it hashed
+        again when the hasher or its parameters changed
+        """
+        valid, rehashed = get_password_executor().run(
+            verify_password, raw_password, self.password
+        )
+        if rehashed is not None:
+            self.password = rehashed
+            self._password = None
+            self.save(update_fields=('password',))
+        return valid
+
+
+class ChangeSequence(models.Model):
+    """Counter numbering the changes made to the data of a user"""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True
+    )
+    value = models.BigIntegerField(default=0)
+
+    @classmethod
+    def next_value(cls, user_id, count=1, using=None):
+        """
+        Reserve count values of the user's sequence and return the last
+
+        The row stays locked until the end of the transaction, so the
+        changes of a user are committed in sequence order.
+        """
+        using = using or router.db_for_write(cls)
+        table = connections[using].ops.quote_name(cls._meta.db_table)
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (user_id, value) VALUES (%s, %s) '
+                f'ON CONFLICT (user_id) DO UPDATE '
+                f'SET value = {table}.value + EXCLUDED.value '
+                f'RETURNING value',
+                (user_id, count)
+            )
+            return cursor.fetchone()[0]
+
+
+class Tombstone(models.Model):
+    """Record of a deleted object for clients syncing changes"""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    kind = models.CharField(max_length=32)
+    object_id = models.IntegerField()
+    change_seq = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('user', 'change_seq'),
+                name='core_tombstone_user_seq_idx'
+            ),
+        )
+
+
+class ChangeTrackedModel(models.Model):
+    """
+    Model recording when and in which order the objects of a user change
+    """
+    updated_at = models.DateTimeField(auto_now=True)
+    change_seq = models.BigIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        """Save the object taking the next value of the user's sequence"""
+        using = kwargs.get('using') or router.db_for_write(type(self))
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {
+                'change_seq', 'updated_at'
+            }
+        with transaction.atomic(using=using):
+            self.change_seq = ChangeSequence.next_value(
+                self.user_id, using=using
+            )
+            super().save(*args, **kwargs)
+
+
+class RecipeAttrQuerySet(models.QuerySet):
+    """QuerySet for the user owned objects attached to recipes"""
+
+    def _recipe_links(self):
+        """Return the through rows linking recipes to the outer object"""
+        relation = self.model._meta.get_field('recipe')
+        column = relation.field.m2m_reverse_field_name()
+        return relation.through.objects.filter(**{column: OuterRef('pk')})
+
+    def assigned(self):
+        """Filter objects attached to at least one recipe"""
+        return self.annotate(
+            assigned=Exists(self._recipe_links())
+        ).filter(assigned=True)
+
+    def with_recipe_count(self):
+        """Annotate the number of recipes each object is attached to"""
+        relation = self.model._meta.get_field('recipe')
+        counts = self._recipe_links().order_by().values(
+            relation.field.m2m_reverse_field_name()
+        ).annotate(count=models.Count('*')).values('count')
+        return self.annotate(recipe_count=Coalesce(
+            Subquery(counts, output_field=models.IntegerField()),
+            0
+        ))
+
+    def named(self, names):
+        """Filter objects by name ignoring case, using the unique index"""
+        return self.annotate(lower_name=Lower('name')).filter(
+            lower_name__in=[name.lower() for name in names]
+        )
+
+    def get_or_create_names(self, user, names):
+        """
+        Return the user's objects with the names, in order and ignoring
+        case, creating the missing ones with a single insert
+
+        Objects created concurrently are skipped by the insert and picked
+        up by the final lookup. Signals aren't sent for created objects.
+        """
+        wanted = {}
+        for name in names:
+            wanted.setdefault(name.lower(), name)
+        objects = {
+            obj.lower_name: obj
+            for obj in self.filter(user=user).named(wanted.values())
+        }
+        missing = [
+            name for key, name in wanted.items() if key not in objects
+        ]
+        if missing:
+            with transaction.atomic(using=self.db):
+                first_seq = ChangeSequence.next_value(
+                    user.pk, len(missing), using=self.db
+                ) - len(missing) + 1
+                self.bulk_create(
+                    (
+                        self.model(user=user, name=name, change_seq=seq)
+                        for seq, name in enumerate(missing, first_seq)
+                    ),
+                    ignore_conflicts=True
+                )
+            objects.update(
+                (obj.lower_name, obj)
+                for obj in self.filter(user=user).named(missing)
+            )
+        return [objects[key] for key in wanted if key in objects]
+
+
+class Tag(ChangeTrackedModel):
     """Tag to be used on recipes"""
     name = models.CharField(max_length=255)
     user = models.ForeignKey(
@@ -68,11 +247,25 @@ class Tag(models.Model):
         on_delete=models.CASCADE
     )
 
+    objects = RecipeAttrQuerySet.as_manager()
+
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('user', '-name', '-id'),
+                name='core_tag_user_name_idx'
+            ),
+            models.Index(
+                fields=('user', 'change_seq'),
+                name='core_tag_user_seq_idx'
+            ),
+        )
+
     def __str__(self):
         return self.name
 
 
-class Ingredient(models.Model):
+class Ingredient(ChangeTrackedModel):
     """Ingredient to be used in the recipes"""
     name = models.CharField(max_length=255)
     user = models.ForeignKey(
@@ -80,12 +273,384 @@ class Ingredient(models.Model):
         on_delete=models.CASCADE
     )
 
+    objects = RecipeAttrQuerySet.as_manager()
+
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('user', '-name', '-id'),
+                name='core_ingredient_user_name_idx'
+            ),
+            models.Index(
+                fields=('user', 'change_seq'),
+                name='core_ingredient_user_seq_idx'
+            ),
+        )
+
     def __str__(self):
         return self.name
 
 
-class Recipe(models.Model):
+# Text search configuration of the recipe search vectors and queries
+SEARCH_CONFIG = 'english'
+# Number of consecutive recipe IDs whose matches are ranked together, the
+# divisor of the core_recipe_search_window_idx expression
+SEARCH_WINDOW = 8192
+# Search results by window of IDs, newest first, then by rank
+SEARCH_ORDERING = ('-search_window', '-rank', '-id')
+
+
+class SearchWordQuerySet(models.QuerySet):
+    """QuerySet for the vocabularies of the recipe search vectors"""
+
+    def add_words(self, recipes):
+        """Record the words of the search vectors of the recipes"""
+        connection = connections[self.db]
+        quote = connection.ops.quote_name
+        ids, params = recipes.values('id').query.sql_with_params()
+        with connection.cursor() as cursor:
+            # Sorted so concurrent inserts of the same words lock them in
+            # the same order
+            cursor.execute(
+                f'INSERT INTO {quote(self.model._meta.db_table)} '
+                f'(user_id, word) '
+                f'SELECT DISTINCT user_id, '
+                f'unnest(tsvector_to_array(search_vector)) '
+                f'FROM {quote(Recipe._meta.db_table)} WHERE id IN ({ids}) '
+                f'ORDER BY 1, 2 ON CONFLICT (user_id, word) DO NOTHING',
+                params
+            )
+
+    def rebuild(self, user):
+        """
+        Replace the vocabulary of the user by the words of their recipes,
+        dropping the words of renamed and deleted objects
+        """
+        with transaction.atomic(using=self.db):
+            self.filter(user=user).delete()
+            self.add_words(Recipe.objects.using(self.db).filter(user=user))
+
+    def correct(self, user, text):
+        """
+        Return the words of the text normalized by the search
+        configuration, each unknown word replaced by the most similar word
+        of the user's vocabulary by trigrams, or None when no word of the
+        vocabulary resembles it
+        """
+        table = connections[self.db].ops.quote_name(self.model._meta.db_table)
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                f'SELECT coalesce(('
+                f'SELECT word FROM {table} '
+                f'WHERE user_id = %s AND word = lexeme'
+                f'), ('
+                f'SELECT word FROM {table} '
+                f'WHERE user_id = %s AND word %% lexeme '
+                f'ORDER BY similarity(word, lexeme) DESC, word LIMIT 1'
+                f')) FROM unnest(tsvector_to_array('
+                f'to_tsvector(%s::regconfig, %s)'
+                f')) AS lexeme',
+                (user.pk, user.pk, SEARCH_CONFIG, text)
+            )
+            return [word for word, in cursor.fetchall()]
+
+
+class SearchWord(models.Model):
+    """Word of the search vectors of a user's recipes, to correct typos"""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    word = models.TextField()
+
+    objects = SearchWordQuerySet.as_manager()
+
+    class Meta:
+        unique_together = (('user', 'word'),)
+        indexes = (
+            GinIndex(
+                fields=('user', 'word'),
+                name='core_searchword_trgm_idx',
+                opclasses=('int4_ops', 'gin_trgm_ops')
+            ),
+        )
+
+
+class ImageBlobQuerySet(models.QuerySet):
+    """QuerySet for the files of the image storage"""
+
+    def acquire(self, name, size):
+        """Add a reference to the file, recording it when it is new"""
+        table = connections[self.db].ops.quote_name(self.model._meta.db_table)
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (name, size, refcount, updated_at) '
+                f'VALUES (%s, %s, 1, now()) ON CONFLICT (name) DO UPDATE '
+                f'SET refcount = {table}.refcount + 1, updated_at = now()',
+                (name, size)
+            )
+
+    def release(self, name):
+        """
+        Remove a reference to the file, returning whether the file is
+        recorded at all; references are never counted below zero
+        """
+        return bool(self.filter(name=name).update(
+            refcount=Greatest(F('refcount') - 1, 0),
+            updated_at=timezone.now()
+        ))
+
+    def unreferenced(self, before):
+        """Return the files without references since the given time"""
+        return self.filter(refcount__lte=0, updated_at__lt=before)
+
+
+class ImageBlob(models.Model):
+    """
+    File of the image storage, named by the hash of its content, with the
+    number of references to it
+    """
+    name = models.CharField(max_length=255, unique=True)
+    size = models.BigIntegerField()
+    refcount = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ImageBlobQuerySet.as_manager()
+
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('updated_at',),
+                name='core_imageblob_unref_idx',
+                condition=Q(refcount__lte=0)
+            ),
+        )
+        constraints = (
+            models.CheckConstraint(
+                check=Q(refcount__gte=0),
+                name='core_imageblob_refcount_check'
+            ),
+        )
+
+
+class OrderedJSONBAgg(OrderableAggMixin, JSONBAgg):
+    """JSONB_AGG accepting an ordering like ArrayAgg"""
+    template = '%(function)s(%(distinct)s%(expressions)s %(ordering)s)'
+
+
+class RecipeQuerySet(models.QuerySet):
+    """QuerySet for recipes with helpers to load their relations"""
+
+    def filter_related(self, relation, ids, match='any'):
+        """
+        Filter recipes related to any or all of the given IDs
+
+        Runs as a semi-join on the through table, so a recipe matching
+        several IDs is returned only once. Matching all IDs groups the
+        through rows by recipe and keeps the groups having every ID.
+        """
+        field = self.model._meta.get_field(relation)
+        column = f'{field.m2m_reverse_field_name()}_id'
+        ids = set(ids)
+        matches = field.remote_field.through.objects.filter(
+            **{f'{column}__in': ids}
+        )
+        if match == 'all':
+            matches = matches.values('recipe_id').annotate(
+                matched=models.Count(column)
+            ).filter(matched=len(ids))
+        return self.filter(id__in=matches.values('recipe_id'))
+
+    def facet_counts(self, relation):
+        """
+        Return the ID, name and number of recipes of each object related
+        to the recipes, most used first
+
+        Counts with a single grouped query on the through table.
+        """
+        field = self.model._meta.get_field(relation)
+        column = field.m2m_reverse_field_name()
+        counts = field.remote_field.through.objects.filter(
+            recipe_id__in=self.order_by().values('id')
+        ).values_list(f'{column}_id', f'{column}__name').annotate(
+            count=models.Count('*')
+        ).order_by('-count', f'{column}__name', f'{column}_id')
+        return [
+            {'id': pk, 'name': name, 'count': count}
+            for pk, name, count in counts
+        ]
+
+    def _related_values(self, relation, column):
+        """
+        Return a subquery aggregating a column of the related objects of
+        each recipe into an array, NULL when there are none
+        """
+        field = self.model._meta.get_field(relation)
+        target = f'{field.m2m_reverse_field_name()}__{column}'
+        values = field.remote_field.through.objects.filter(
+            recipe_id=OuterRef('pk')
+        ).order_by().values('recipe_id').annotate(
+            values=ArrayAgg(target, ordering=target)
+        ).values('values')
+        output_field = ArrayField(
+            field.related_model._meta.get_field(column)
+        )
+        return Subquery(values, output_field=output_field)
+
+    def _related_objects(self, relation, columns):
+        """
+        Return a subquery aggregating the columns of the related objects
+        of each recipe into a JSON array of objects ordered by ID, NULL
+        when there are none
+        """
+        field = self.model._meta.get_field(relation)
+        related = field.m2m_reverse_field_name()
+        pairs = []
+        for column in columns:
+            pairs += [Value(column), F(f'{related}__{column}')]
+        objects = field.remote_field.through.objects.filter(
+            recipe_id=OuterRef('pk')
+        ).order_by().values('recipe_id').annotate(objects=OrderedJSONBAgg(
+            Func(*pairs, function='jsonb_build_object'),
+            ordering=f'{related}__id'
+        )).values('objects')
+        return Subquery(objects, output_field=JSONField())
+
+    def values_with_related(self, columns, ids=(), details=()):
+        """
+        Return dicts of the columns of the recipes, adding the sorted IDs
+        of the related objects of the relations in ids, or their ID and
+        name for the relations in details, under <related>_values keys
+        like tag_values
+
+        Builds rows for read only lists without creating model instances.
+        """
+        related = {}
+        for relation in ids:
+            related[relation] = self._related_values(relation, 'id')
+        for relation in details:
+            related[relation] = self._related_objects(
+                relation, ('id', 'name')
+            )
+        annotations = {
+            f'{self.model._meta.get_field(relation).m2m_reverse_field_name()}'
+            f'_values': expression
+            for relation, expression in related.items()
+        }
+        return self.annotate(**annotations).values(*columns, *annotations)
+
+    def with_related_names(self):
+        """Annotate the sorted names of the tags and ingredients"""
+        return self.annotate(
+            tag_names=self._related_values('tags', 'name'),
+            ingredient_names=self._related_values('ingredients', 'name')
+        )
+
+    def _related_names(self, relation):
+        """Return a subquery joining the names of the related objects"""
+        field = self.model._meta.get_field(relation)
+        names = field.remote_field.through.objects.filter(
+            recipe_id=OuterRef('pk')
+        ).order_by().values('recipe_id').annotate(
+            names=StringAgg(f'{field.m2m_reverse_field_name()}__name', ' ')
+        ).values('names')
+        return Subquery(names, output_field=models.TextField())
+
+    def search_vector(self):
+        """
+        Return the expression of the search vector of each recipe, from
+        the title and, with a lower weight, the tag and ingredient names
+        """
+        return SearchVector(
+            'title',
+            config=SEARCH_CONFIG,
+            weight='A'
+        ) + SearchVector(
+            self._related_names('tags'),
+            self._related_names('ingredients'),
+            config=SEARCH_CONFIG,
+            weight='B'
+        )
+
+    def update_search_vectors(self, **fields):
+        """
+        Recompute the search vectors of the recipes, updating the other
+        fields given at the same time, and record their words
+        """
+        count = self.update(search_vector=self.search_vector(), **fields)
+        SearchWord.objects.add_words(self)
+        return count
+
+    def search(self, text, user):
+        """
+        Filter recipes matching the text, annotating their rank and the
+        window of IDs they are ranked in
+
+        Unknown words of the text are replaced by the closest words of the
+        user's recipes to tolerate typos; a word nothing resembles matches
+        no recipe. Matches are ranked within windows of SEARCH_WINDOW IDs
+        so the first page of SEARCH_ORDERING only ranks the newest windows
+        instead of every match. The rank is rounded to a decimal so
+        pagination cursors can seek on its exact value.
+        """
+        rank_field = models.DecimalField(max_digits=12, decimal_places=6)
+        words = SearchWord.objects.correct(user, text)
+        if not words or None in words:
+            return self.none().annotate(
+                search_window=Value(None, output_field=models.IntegerField()),
+                rank=Value(None, output_field=rank_field)
+            )
+        # The words are already normalized by the search configuration
+        query = SearchQuery(
+            ' & '.join("'{}'".format(word.replace("'", "''"))
+                       for word in words),
+            config='simple',
+            search_type='raw'
+        )
+        return self.filter(search_vector=query).annotate(
+            search_window=ExpressionWrapper(
+                F('id') / SEARCH_WINDOW,
+                output_field=models.IntegerField()
+            ),
+            rank=Cast(SearchRank(F('search_vector'), query), rank_field)
+        )
+
+    def prefetch_related_ids(self, relations=('tags', 'ingredients')):
+        """Prefetch only the IDs of the tags and ingredients"""
+        return self.prefetch_related(*(
+            models.Prefetch(
+                relation,
+                queryset=self.model._meta.get_field(
+                    relation
+                ).related_model.objects.only('id').order_by('id')
+            )
+            for relation in relations
+        ))
+
+    def prefetch_related_details(self, relations=('tags', 'ingredients')):
+        """Prefetch tags and ingredients with the fields shown on detail"""
+        return self.prefetch_related(*(
+            models.Prefetch(
+                relation,
+                queryset=self.model._meta.get_field(
+                    relation
+                ).related_model.objects.only('id', 'name').order_by('id')
+            )
+            for relation in relations
+        ))
+
+
+class Recipe(ChangeTrackedModel):
     """Recipe object"""
+    IMAGE_PENDING = 'pending'
+    IMAGE_READY = 'ready'
+    IMAGE_FAILED = 'failed'
+    IMAGE_STATUSES = (
+        (IMAGE_PENDING, 'Pending'),
+        (IMAGE_READY, 'Ready'),
+        (IMAGE_FAILED, 'Failed'),
+    )
+
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
@@ -96,7 +661,54 @@ class Recipe(models.Model):
     link = models.CharField(max_length=255, blank=True)
     ingredients = models.ManyToManyField('Ingredient')
     tags = models.ManyToManyField('Tag')
-    image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    image = models.ImageField(
+        null=True,
+        upload_to=recipe_image_file_path,
+        storage=image_storage
+    )
+    image_status = models.CharField(
+        max_length=10,
+        blank=True,
+        choices=IMAGE_STATUSES
+    )
+    image_renditions = JSONField(default=dict, blank=True)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = RecipeQuerySet.as_manager()
+
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('user', 'id'),
+                name='core_recipe_user_id_idx'
+            ),
+            models.Index(
+                fields=('user', 'change_seq'),
+                name='core_recipe_user_seq_idx'
+            ),
+            models.Index(
+                fields=('user', 'price', 'id'),
+                name='core_recipe_user_price_idx'
+            ),
+            models.Index(
+                fields=('user', 'time_minutes', 'id'),
+                name='core_recipe_user_time_idx'
+            ),
+            GinIndex(
+                fields=('search_vector',),
+                name='core_recipe_search_idx'
+            ),
+            # Find the recipes using a stored file
+            models.Index(
+                fields=('image',),
+                name='core_recipe_image_idx'
+            ),
+            GinIndex(
+                fields=('image_renditions',),
+                name='core_recipe_renditions_idx',
+                opclasses=('jsonb_path_ops',)
+            ),
+        )
 
     def __str__(self):
         return self.title
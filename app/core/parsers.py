@@ -0,0 +1,40 @@
+import codecs
+import io
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Maps every digit to 0 to look for runs of digits faster than a regex
+DIGITS_TO_ZERO = bytes.maketrans(b'123456789', b'000000000')
+# Integers this long may not fit in 64 bits, which orjson parses as floats
+LONG_DIGITS = b'0' * 20
+
+
+class FastJSONParser(JSONParser):
+    """
+    JSON parser decoding UTF-8 bodies with orjson when it is installed
+
+    Bodies orjson rejects or may contain integers beyond 64 bits go
+    through JSONParser, so errors and numbers are the same as before.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+        content = stream.read()
+        if LONG_DIGITS in content.translate(DIGITS_TO_ZERO):
+            return super().parse(
+                io.BytesIO(content), media_type, parser_context
+            )
+        try:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
+            return super().parse(
+                io.BytesIO(content), media_type, parser_context
+            )
@@ -0,0 +1,58 @@
+import math
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSON renderer encoding with orjson when it is installed, producing the
+    same bytes as JSONRenderer
+
+    Types orjson doesn't handle the same way, like Decimal and datetimes,
+    go through the encoder of JSONRenderer. Indented and ASCII output are
+    left to JSONRenderer, as is data orjson can't encode like JSONRenderer:
+    integers beyond 64 bits and non-finite floats, which orjson writes as
+    null.
+    """
+    options = (
+        orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if orjson is not None else 0
+    )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.ensure_ascii or \
+                not self.compact or self.get_indent(
+                    accepted_media_type, renderer_context or {}
+                ) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=self.options
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        if b'null' in ret and has_non_finite_float(data):
+            return super().render(data, accepted_media_type, renderer_context)
+        # Escaped by JSONRenderer so the output is valid JavaScript
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(
+                b'\xe2\x80\xa9', b'\\u2029'
+            )
+        return ret
+
+
+def has_non_finite_float(data):
+    """Return whether the data holds NaN or infinite floats"""
+    if isinstance(data, float):
+        return not math.isfinite(data)
+    if isinstance(data, dict):
+        data = data.values()
+    elif not isinstance(data, (list, tuple)):
+        return False
+    return any(has_non_finite_float(item) for item in data)
@@ -0,0 +1,190 @@
+import threading
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import pre_delete, post_save, post_delete, \
+    m2m_changed
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from core.authentication import get_token_cache
+from core.cache import get_response_cache
+from core.images import lock_recipe_image, recipe_image_names
+from core.models import Tag, Ingredient, Recipe, ChangeSequence, Tombstone
+
+
+# Users being deleted by the current thread, whose objects don't need
+# tombstones or sequence values
+_deleting = threading.local()
+
+
+def _is_deleting(user_id):
+    return user_id in getattr(_deleting, 'users', ())
+
+
+def changed_recipes(sender, instance, action, reverse, pk_set):
+    """
+    Return the recipes whose relations are changed by an m2m action, or
+    None for the actions which don't need to touch them
+    """
+    if not reverse and action in ('post_add', 'post_remove', 'post_clear'):
+        return Recipe.objects.filter(pk=instance.pk)
+    elif reverse and action in ('post_add', 'post_remove'):
+        return Recipe.objects.filter(pk__in=pk_set)
+    elif reverse and action == 'pre_clear':
+        return Recipe.objects.filter(id__in=sender.objects.filter(
+            **{instance._meta.model_name: instance}
+        ).values('recipe_id'))
+    return None
+
+
+def touch_recipes(recipes, user_id):
+    """
+    Record a change to the recipes in the user's sequence and refresh
+    their search vectors
+    """
+    recipes.update_search_vectors(
+        updated_at=timezone.now(),
+        change_seq=ChangeSequence.next_value(user_id)
+    )
+
+
+def invalidate_user_responses(sender, instance, **kwargs):
+    """Invalidate the cached responses of the owner of the instance"""
+    get_response_cache().invalidate(instance.user_id)
+
+
+def invalidate_user_profile(sender, instance, **kwargs):
+    """Invalidate the cached responses of a user saving the profile"""
+    get_response_cache().invalidate(instance.pk)
+
+
+def forget_tokens(keys):
+    """
+    Drop token keys from the token cache once the transaction commits,
+    so concurrent requests can't cache them again from the old rows
+    """
+    def forget():
+        cache = get_token_cache()
+        for key in keys:
+            cache.delete(key)
+    transaction.on_commit(forget)
+
+
+def forget_token(sender, instance, **kwargs):
+    """Drop a deleted token from the token cache"""
+    forget_tokens([instance.key])
+
+
+def forget_user_tokens(sender, instance, created=False, raw=False,
+                       **kwargs):
+    """Drop the cached tokens of a saved user, which may be deactivated"""
+    if not created and not raw:
+        forget_tokens(list(Token.objects.filter(
+            user_id=instance.pk
+        ).values_list('key', flat=True)))
+
+
+def recipe_relations_changed(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    """Touch recipes and invalidate cached responses on relation changes"""
+    recipes = changed_recipes(sender, instance, action, reverse, pk_set)
+    if recipes is not None:
+        touch_recipes(recipes, instance.user_id)
+    if action.startswith('post_'):
+        get_response_cache().invalidate(instance.user_id)
+
+
+def update_search_vector(sender, instance, raw=False, **kwargs):
+    """Refresh the search vector of a saved recipe"""
+    if not raw:
+        Recipe.objects.filter(pk=instance.pk).update_search_vectors()
+
+
+def update_attr_search_vectors(sender, instance, created=False, raw=False,
+                               **kwargs):
+    """Refresh the search vectors of the recipes of a renamed object"""
+    if not created and not raw:
+        instance.recipe_set.all().update_search_vectors()
+
+
+def remember_attr_recipes(sender, instance, **kwargs):
+    """Remember the recipes of a tag or ingredient being deleted"""
+    if not _is_deleting(instance.user_id):
+        instance._deleted_recipe_ids = list(
+            instance.recipe_set.values_list('id', flat=True)
+        )
+
+
+def touch_attr_recipes(sender, instance, **kwargs):
+    """Touch the recipes which lost a deleted tag or ingredient"""
+    recipe_ids = getattr(instance, '_deleted_recipe_ids', None)
+    # The pre_delete signal of the objects of a deleted user is sent
+    # before the user's, so it can't tell the user is being deleted
+    if recipe_ids and not _is_deleting(instance.user_id):
+        touch_recipes(
+            Recipe.objects.filter(id__in=recipe_ids),
+            instance.user_id
+        )
+
+
+def record_deletion(sender, instance, **kwargs):
+    """Leave a tombstone for clients syncing changes"""
+    if not _is_deleting(instance.user_id):
+        Tombstone.objects.create(
+            user_id=instance.user_id,
+            kind=instance._meta.model_name,
+            object_id=instance.pk,
+            change_seq=ChangeSequence.next_value(instance.user_id)
+        )
+
+
+def lock_recipe_image_names(sender, instance, **kwargs):
+    """
+    Reload the image of a recipe being deleted from its locked row, in
+    case it was replaced or processed since the recipe was loaded
+    """
+    if instance.image or instance.image_renditions:
+        locked = lock_recipe_image(instance.pk)
+        instance.image = locked.image
+        instance.image_renditions = locked.image_renditions
+
+
+def release_recipe_image(sender, instance, **kwargs):
+    """Remove the references of a deleted recipe to its image files"""
+    for name in recipe_image_names(instance):
+        instance.image.storage.delete(name)
+
+
+def user_deleting(sender, instance, **kwargs):
+    """Remember the user is being deleted along with their objects"""
+    if not hasattr(_deleting, 'users'):
+        _deleting.users = set()
+    _deleting.users.add(instance.pk)
+
+
+def user_deleted(sender, instance, **kwargs):
+    """Forget about a deleted user"""
+    _deleting.users.discard(instance.pk)
+
+
+for model in (Tag, Ingredient, Recipe):
+    post_save.connect(invalidate_user_responses, sender=model)
+    post_delete.connect(invalidate_user_responses, sender=model)
+    post_delete.connect(record_deletion, sender=model)
+
+for model in (Tag, Ingredient):
+    post_save.connect(update_attr_search_vectors, sender=model)
+    pre_delete.connect(remember_attr_recipes, sender=model)
+    post_delete.connect(touch_attr_recipes, sender=model)
+
+post_save.connect(update_search_vector, sender=Recipe)
+pre_delete.connect(lock_recipe_image_names, sender=Recipe)
+post_delete.connect(release_recipe_image, sender=Recipe)
+
+post_save.connect(invalidate_user_profile, sender=get_user_model())
+post_save.connect(forget_user_tokens, sender=get_user_model())
+post_delete.connect(forget_token, sender=Token)
+pre_delete.connect(user_deleting, sender=get_user_model())
+post_delete.connect(user_deleted, sender=get_user_model())
+
+for through in (Recipe.tags.through, Recipe.ingredients.through):
+    m2m_changed.connect(recipe_relations_changed, sender=through)
@@ -0,0 +1,53 @@
+import hashlib
+import os
+import uuid
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage naming files by the hash of their content, so a
+    file saved many times is written once, and counting their references
+
+    Saving a file adds a reference to it and deleting it removes one; the
+    files left without references are removed by the gc_images command.
+    Files saved before, which aren't counted, are removed on deletion.
+    """
+
+    def _save(self, name, content):
+        from core.models import ImageBlob
+
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        name = os.path.join(
+            os.path.dirname(name),
+            digest[:2],
+            digest + os.path.splitext(name)[1].lower()
+        ).replace('\\', '/')
+        # Referenced first, so the collector can't remove an existing file
+        # being saved again
+        ImageBlob.objects.acquire(name, content.size)
+        if not self.exists(name):
+            # Written aside and renamed so the file never appears partial
+            temporary = super()._save(f'{name}.{uuid.uuid4().hex}.tmp',
+                                      content)
+            os.replace(self.path(temporary), self.path(name))
+        return name
+
+    def delete(self, name):
+        """Remove a reference to the file"""
+        from core.models import ImageBlob
+
+        if not ImageBlob.objects.release(name):
+            self.remove(name)
+
+    def remove(self, name):
+        """Remove the file itself"""
+        super().delete(name)
+
+
+image_storage = ContentAddressedStorage()
@@ -1,6 +1,8 @@
+from unittest.mock import patch
 from django.test import TestCase, Client
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from core.executors import Overloaded
 
 
 class AdminSiteTests(TestCase):
@@ -44,3 +46,16 @@ class AdminSiteTests(TestCase):
         res = self.client.get(url)
 
         self.assertEqual(res.status_code, 200)
+
+    def test_login_overloaded(self):
+        """Test admin logins get 503 while the password hashing is busy"""
+        client = Client()
+        with patch('core.executors.BoundedExecutor.submit',
+                   side_effect=Overloaded(wait=1)):
+            res = client.post(reverse('admin:login'), {
+                'username': 'admin@test.com',
+                'password': 'pass1234567'
+            })
+
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res['Retry-After'], '1')
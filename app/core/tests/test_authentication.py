@@ -0,0 +1,133 @@
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from core.authentication import get_token_cache
+from core.checks import check_token_cache
+
+
+ME_URL = reverse('users:me')
+
+
+class TokenCacheTestMixin:
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'testpass'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.cache = get_token_cache()
+        self.cache.local.clear()
+        self.cache.cache.clear()
+
+
+class CachedTokenAuthenticationTests(TokenCacheTestMixin, TestCase):
+
+    def test_token_cached(self):
+        """Test the token isn't looked up again once authenticated"""
+        self.client.get(ME_URL)
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()['email'], self.user.email)
+        self.assertFalse([
+            query for query in context.captured_queries
+            if 'authtoken_token' in query['sql']
+        ])
+
+    def test_shared_cache(self):
+        """Test the shared cache is used when the local one misses"""
+        self.client.get(ME_URL)
+        self.cache.local.clear()
+
+        self.assertEqual(self.cache.get(self.token.key)[0], self.user)
+
+    def test_password_not_cached(self):
+        """Test only the pk and is_active of the user are cached"""
+        self.client.get(ME_URL)
+        entry = self.cache.cache.get(self.cache.make_key(self.token.key))
+        user, token = self.cache.get(self.token.key)
+
+        self.assertEqual(entry, (self.user.pk, True))
+        self.assertIn('password', user.get_deferred_fields())
+        self.assertEqual(token.key, self.token.key)
+        self.assertEqual(token.user_id, self.user.pk)
+
+    def test_invalid_token(self):
+        """Test invalid tokens are rejected and not cached"""
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIsNone(self.cache.get('invalid'))
+
+
+class TokenInvalidationTests(TokenCacheTestMixin, TransactionTestCase):
+
+    def test_deleted_token(self):
+        """Test deleting a token invalidates it"""
+        self.client.get(ME_URL)
+        self.token.delete()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user(self):
+        """Test deactivating a user invalidates their token"""
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change(self):
+        """Test changing the password drops the cached user"""
+        self.client.get(ME_URL)
+        self.user.set_password('newpass123')
+        self.user.save()
+
+        self.assertIsNone(self.cache.get(self.token.key))
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_invalidated_after_commit(self):
+        """Test the token is only dropped once the transaction commits"""
+        key = self.token.key
+        self.client.get(ME_URL)
+        with transaction.atomic():
+            self.token.delete()
+            self.assertIsNotNone(self.cache.get(key))
+
+        self.assertIsNone(self.cache.get(key))
+
+
+class TokenCacheCheckTests(TestCase):
+
+    def test_shared_cache(self):
+        """Test no error is reported for a shared cache"""
+        self.assertEqual(check_token_cache(None), [])
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }})
+    def test_process_local_cache(self):
+        """Test an error is reported for a per-process cache"""
+        errors = check_token_cache(None)
+
+        self.assertEqual([error.id for error in errors], ['core.E001'])
+
+    @override_settings(TOKEN_CACHE={'CACHE_ALIAS': 'missing'})
+    def test_undefined_cache(self):
+        """Test an error is reported for an undefined cache"""
+        errors = check_token_cache(None)
+
+        self.assertEqual([error.id for error in errors], ['core.E001'])
@@ -0,0 +1,104 @@
+from unittest.mock import patch
+from django.core.cache import caches
+from django.http import QueryDict
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from core.cache import LRUCacheBackend, ResponseCache
+from core.checks import check_response_cache
+
+
+class LRUCacheBackendTests(TestCase):
+
+    def test_evicts_least_recently_used(self):
+        """Test the oldest entries are evicted beyond the size bound"""
+        cache = LRUCacheBackend(max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(
+            cache.stats.as_dict(),
+            {'hits': 3, 'misses': 1, 'evictions': 1}
+        )
+
+    @patch('time.monotonic')
+    def test_entries_expire(self, monotonic):
+        """Test entries aren't returned after their TTL"""
+        cache = LRUCacheBackend(ttl=10)
+        monotonic.return_value = 100
+        cache.set('a', 1)
+        monotonic.return_value = 111
+
+        self.assertIsNone(cache.get('a'))
+
+
+class ResponseCacheTests(TestCase):
+
+    def setUp(self):
+        self.cache = ResponseCache(LRUCacheBackend(), caches['default'])
+
+    def test_key_normalises_query_params(self):
+        """Test the order of the query parameters doesn't change the key"""
+        key1 = self.cache.make_key(1, '/a', QueryDict('x=1&y=2'))
+        key2 = self.cache.make_key(1, '/a', QueryDict('y=2&x=1'))
+        key3 = self.cache.make_key(2, '/a', QueryDict('y=2&x=1'))
+
+        self.assertEqual(key1, key2)
+        self.assertNotEqual(key1, key3)
+
+    def test_bump_generation_changes_key(self):
+        """Test bumping the generation invalidates the user's keys"""
+        key = self.cache.make_key(1, '/a', QueryDict())
+        self.cache.set(key, 'cached')
+        self.cache.bump_generation(1)
+
+        self.assertNotEqual(self.cache.make_key(1, '/a', QueryDict()), key)
+
+    @patch('time.time', return_value=1600000000.5)
+    def test_bump_generation_moves_last_modified(self, time):
+        """Test every change moves the last modified time forward"""
+        self.cache.generation_cache.delete('response-modified:1')
+        modified = self.cache.get_last_modified(1)
+        self.cache.bump_generation(1)
+        self.cache.bump_generation(1)
+
+        self.assertEqual(self.cache.get_last_modified(1), modified + 2)
+        time.return_value += 10
+        self.cache.bump_generation(1)
+        self.assertEqual(self.cache.get_last_modified(1), 1600000010)
+
+
+class ResponseCacheInvalidationTests(TransactionTestCase):
+
+    def setUp(self):
+        self.cache = ResponseCache(LRUCacheBackend(), caches['default'])
+
+    def test_invalidated_again_after_commit(self):
+        """Test responses cached during the transaction are invalidated"""
+        with transaction.atomic():
+            self.cache.invalidate(1)
+            # Cached by a concurrent request from the data before commit
+            key = self.cache.make_key(1, '/a', QueryDict())
+            self.cache.set(key, 'stale')
+
+        self.assertNotEqual(self.cache.make_key(1, '/a', QueryDict()), key)
+
+
+class ResponseCacheCheckTests(TestCase):
+
+    def test_shared_cache(self):
+        """Test no error is reported for a shared generation cache"""
+        self.assertEqual(check_response_cache(None), [])
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }})
+    def test_process_local_cache(self):
+        """Test an error is reported for a per-process generation cache"""
+        errors = check_response_cache(None)
+
+        self.assertEqual([error.id for error in errors], ['core.E002'])
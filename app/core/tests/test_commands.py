@@ -1,7 +1,9 @@
 from unittest.mock import patch
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
 from django.db.utils import OperationalError
 from django.test import TestCase
+from core.models import Recipe, SearchWord, Tag
 
 
 class CommandTests(TestCase):
@@ -20,3 +22,22 @@ class CommandTests(TestCase):
             gi.side_effect = [OperationalError] * 5 + [True]
             call_command('wait_for_db')
             self.assertEqual(gi.call_count, 6)
+
+    def test_rebuild_search_words(self):
+        """Test rebuilding drops the words of renamed objects"""
+        user = get_user_model().objects.create_user('test@test.com', 'pass')
+        recipe = Recipe.objects.create(
+            user=user, title='Pasta', time_minutes=10, price=5
+        )
+        tag = Tag.objects.create(user=user, name='Italian')
+        recipe.tags.add(tag)
+        tag.name = 'Dinner'
+        tag.save()
+        words = SearchWord.objects.filter(user=user).order_by('word')
+        self.assertIn('italian', words.values_list('word', flat=True))
+
+        call_command('rebuild_search_words', '--user', str(user.id))
+        self.assertEqual(
+            list(words.values_list('word', flat=True)),
+            ['dinner', 'pasta']
+        )
@@ -0,0 +1,109 @@
+import gzip
+from unittest import skipUnless
+from unittest.mock import patch
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from core.compression import CompressionMiddleware, accepted_encoding
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+BODY = b'{"title": "Sample recipe", "price": "5.00"}' * 100
+
+
+def json_response(content=BODY, **headers):
+    response = HttpResponse(content, content_type='application/json')
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+
+class CompressionMiddlewareTests(TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def process(self, response, accept_encoding='gzip, deflate, br'):
+        request = self.factory.get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    @skipUnless(brotli, 'brotli is not installed')
+    def test_accepted_encoding(self):
+        """Test negotiating the encoding from the Accept-Encoding header"""
+        for header, encoding in (
+            ('gzip, deflate, br', 'br'),
+            ('gzip;q=1.0, br;q=0', 'gzip'),
+            ('*', 'br'),
+            ('br;q=0, *;q=0.5', 'gzip'),
+            ('identity', None),
+            ('', None),
+        ):
+            request = self.factory.get('/', HTTP_ACCEPT_ENCODING=header)
+
+            self.assertEqual(accepted_encoding(request), encoding)
+
+    @skipUnless(brotli, 'brotli is not installed')
+    def test_compresses_with_brotli(self):
+        """Test brotli is preferred when accepted"""
+        response = self.process(json_response(ETag='"abc"'))
+
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), BODY)
+        self.assertEqual(response['Content-Length'],
+                         str(len(response.content)))
+        self.assertEqual(response['ETag'], 'W/"abc"')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    @patch('core.compression.brotli', None)
+    def test_compresses_with_gzip(self):
+        """Test gzip is used without brotli installed"""
+        response = self.process(json_response())
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), BODY)
+
+    @patch('core.compression.brotli', None)
+    def test_accepted_encoding_without_brotli(self):
+        """Test br isn't negotiated without brotli installed"""
+        for header, encoding in (
+            ('gzip, deflate, br', 'gzip'),
+            ('*', 'gzip'),
+            ('br', None),
+        ):
+            request = self.factory.get('/', HTTP_ACCEPT_ENCODING=header)
+
+            self.assertEqual(accepted_encoding(request), encoding)
+
+    @override_settings(COMPRESSION={'MIN_SIZE': 10000})
+    def test_small_responses_not_compressed(self):
+        """Test responses below the size threshold are left alone"""
+        response = self.process(json_response())
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, BODY)
+
+    def test_skipped_responses(self):
+        """Test encoded, binary and not negotiated responses are skipped"""
+        encoded = self.process(json_response(**{'Content-Encoding': 'gzip'}))
+        image = HttpResponse(BODY, content_type='image/jpeg')
+
+        self.assertEqual(encoded.content, BODY)
+        self.assertEqual(self.process(image).content, BODY)
+        self.assertEqual(self.process(json_response(), '').content, BODY)
+
+    def test_compresses_streaming_responses(self):
+        """Test streaming responses are compressed as they stream"""
+        response = StreamingHttpResponse(
+            (line + b'\n' for line in [BODY] * 10),
+            content_type='application/x-ndjson'
+        )
+        response = self.process(response, 'gzip')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(
+            gzip.decompress(b''.join(response.streaming_content)),
+            (BODY + b'\n') * 10
+        )
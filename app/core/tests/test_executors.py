@@ -0,0 +1,34 @@
+import threading
+from django.test import TestCase
+from core.executors import BoundedExecutor, Overloaded
+
+
+class BoundedExecutorTests(TestCase):
+
+    def test_run(self):
+        """Test calls are run on the pool and their results returned"""
+        executor = BoundedExecutor(max_workers=2, max_queue=2)
+
+        self.assertEqual(executor.run(sum, (1, 2)), 3)
+        self.assertNotEqual(
+            executor.run(threading.get_ident),
+            threading.get_ident()
+        )
+
+    def test_rejects_beyond_queue(self):
+        """Test calls are rejected once the workers and queue are full"""
+        executor = BoundedExecutor(max_workers=1, max_queue=1,
+                                   retry_after=5)
+        release = threading.Event()
+        futures = [executor.submit(release.wait) for _ in range(2)]
+
+        with self.assertRaises(Overloaded) as context:
+            executor.submit(release.wait)
+        self.assertEqual(context.exception.wait, 5)
+        with self.assertRaises(Overloaded):
+            executor.check_capacity()
+        release.set()
+        for future in futures:
+            future.result()
+        self.assertTrue(executor.run(release.wait))
+        executor.check_capacity()
@@ -0,0 +1,164 @@
+import datetime
+import io
+import shutil
+import tempfile
+from unittest.mock import patch
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+from PIL import Image
+from core.executors import Overloaded
+from core.images import encode, make_renditions, process_recipe_image, \
+    submit_recipe_image
+from core.models import ImageBlob, Recipe
+from core.storage import image_storage
+
+
+# EXIF orientation tag, rotating the image 90 degrees clockwise
+ORIENTATION = 0x0112
+
+
+def sample_image(size=(300, 100), image_format='JPEG', **params):
+    """Return the content of a sample image"""
+    content = io.BytesIO()
+    Image.new('RGB', size, 'red').save(content, image_format, **params)
+    return content.getvalue()
+
+
+class ImageTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.media_settings = self.settings(MEDIA_ROOT=self.media_root)
+        self.media_settings.enable()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'testpass'
+        )
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Curry',
+            time_minutes=10,
+            price=5,
+            image_status=Recipe.IMAGE_PENDING
+        )
+
+    def tearDown(self):
+        self.media_settings.disable()
+        shutil.rmtree(self.media_root)
+
+    def save_image(self, content):
+        self.recipe.image.save('test.jpg', ContentFile(content))
+
+    def test_make_renditions(self):
+        """Test renditions are scaled down and stripped of metadata"""
+        exif = Image.Exif()
+        exif[ORIENTATION] = 6
+        self.save_image(sample_image(size=(3000, 1000), exif=exif.tobytes()))
+        renditions = make_renditions(self.recipe.image)
+
+        # Rotated to portrait, the long edge is the height
+        sizes = {'full': 2048, 'medium': 800, 'thumb': 200}
+        self.assertEqual(set(renditions), set(sizes))
+        for name, size in sizes.items():
+            width = renditions[name]['width']
+            height = renditions[name]['height']
+            self.assertEqual(height, size)
+            self.assertAlmostEqual(width, size * 1000 / 3000, delta=1)
+        self.assertRegex(
+            renditions['thumb']['jpeg'],
+            r'^uploads/recipes/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$'
+        )
+        with image_storage.open(renditions['medium']['webp']) as f:
+            image = Image.open(f)
+            self.assertEqual(image.format, 'WEBP')
+            self.assertEqual(
+                image.size,
+                (renditions['medium']['width'], renditions['medium']['height'])
+            )
+        with image_storage.open(renditions['thumb']['jpeg']) as f:
+            image = Image.open(f)
+            self.assertEqual(image.format, 'JPEG')
+            self.assertNotIn('exif', image.info)
+
+    def test_failed_renditions_released(self):
+        """Test the renditions saved before a failure are released"""
+        self.save_image(sample_image())
+        encoded = []
+
+        def fail_after_first(image, image_format):
+            if encoded:
+                raise OSError('encoder failed')
+            encoded.append(encode(image, image_format))
+            return encoded[0]
+
+        with patch('core.images.encode', side_effect=fail_after_first):
+            with self.assertRaises(OSError):
+                make_renditions(self.recipe.image)
+
+        self.assertEqual(
+            list(ImageBlob.objects.exclude(
+                name=self.recipe.image.name
+            ).values_list('refcount', flat=True)),
+            [0]
+        )
+
+    def test_process_recipe_image(self):
+        """Test the upload is replaced by its renditions"""
+        self.save_image(sample_image())
+        upload = self.recipe.image.name
+        process_recipe_image(self.recipe.id)
+        self.recipe.refresh_from_db()
+
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_READY)
+        self.assertEqual(
+            self.recipe.image.name,
+            self.recipe.image_renditions['full']['jpeg']
+        )
+        self.assertEqual(ImageBlob.objects.get(name=upload).refcount, 0)
+
+    def test_process_invalid_image(self):
+        """Test images which can't be decoded are marked as failed"""
+        self.save_image(b'not an image')
+        with self.assertLogs('core.images', 'ERROR'):
+            process_recipe_image(self.recipe.id)
+        self.recipe.refresh_from_db()
+
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_FAILED)
+        self.assertEqual(self.recipe.image_renditions, {})
+
+    def test_overloaded_image_left_pending(self):
+        """Test images which can't be queued are left pending"""
+        self.save_image(sample_image())
+        with patch('core.executors.BoundedExecutor.submit',
+                   side_effect=Overloaded(wait=5)):
+            with self.assertLogs('core.images', 'WARNING'):
+                submit_recipe_image(self.recipe.id)
+        self.recipe.refresh_from_db()
+
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_PENDING)
+
+    def test_process_pending_images(self):
+        """Test the command processes the images pending for too long"""
+        self.save_image(sample_image())
+        recent = Recipe.objects.create(
+            user=self.user,
+            title='Dal',
+            time_minutes=10,
+            price=5,
+            image=self.recipe.image.name,
+            image_status=Recipe.IMAGE_PENDING
+        )
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            updated_at=timezone.now() - datetime.timedelta(minutes=10)
+        )
+        out = io.StringIO()
+        call_command('process_pending_images', stdout=out)
+        self.recipe.refresh_from_db()
+        recent.refresh_from_db()
+
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_READY)
+        self.assertEqual(recent.image_status, Recipe.IMAGE_PENDING)
+        self.assertIn('Processed 1 pending images', out.getvalue())
@@ -0,0 +1,127 @@
+import datetime
+import io
+import uuid
+from collections import OrderedDict
+from decimal import Decimal
+from unittest.mock import patch
+from django.test import TestCase
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnList
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer
+
+
+PAYLOAD = OrderedDict((
+    ('id', 1),
+    ('title', 'Crème brûlée     "quoted"'),
+    ('price', Decimal('12.50')),
+    ('rank', Decimal('0.0607927')),
+    ('ratio', 0.1),
+    ('created', datetime.datetime(
+        2020, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.utc
+    )),
+    ('day', datetime.date(2020, 1, 2)),
+    ('uuid', uuid.UUID('12345678-1234-5678-1234-567812345678')),
+    ('message', _('Invalid cursor')),
+    ('counts', {1: 'one'}),
+    ('tags', ReturnList([1, 2], serializer=None)),
+    ('link', None),
+))
+
+
+class FastJSONRendererTests(TestCase):
+
+    def test_same_output_as_json_renderer(self):
+        """Test rendering the same bytes as the default renderer"""
+        self.assertEqual(
+            FastJSONRenderer().render(PAYLOAD),
+            JSONRenderer().render(PAYLOAD)
+        )
+
+    def test_indented_output(self):
+        """Test indented output is left to the default renderer"""
+        media_type = 'application/json; indent=4'
+
+        self.assertEqual(
+            FastJSONRenderer().render(PAYLOAD, media_type),
+            JSONRenderer().render(PAYLOAD, media_type)
+        )
+
+    def test_big_integer(self):
+        """Test integers beyond 64 bits are rendered as by default"""
+        data = {'id': 123456789012345678901234567890, 'ids': [-2 ** 64]}
+
+        self.assertEqual(
+            FastJSONRenderer().render(data),
+            JSONRenderer().render(data)
+        )
+
+    def test_non_finite_float(self):
+        """Test NaN and infinity are refused as by the default renderer"""
+        for value in (float('nan'), float('inf'), float('-inf')):
+            data = {'link': None, 'values': [{'ratio': value}]}
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    JSONRenderer().render(data)
+                with self.assertRaises(ValueError):
+                    FastJSONRenderer().render(data)
+
+    def test_non_finite_float_not_strict(self):
+        """Test NaN is written as by the default renderer when allowed"""
+        data = [float('nan'), float('inf')]
+        with patch.object(JSONRenderer, 'strict', False):
+            self.assertEqual(
+                FastJSONRenderer().render(data),
+                JSONRenderer().render(data)
+            )
+
+    @patch('core.renderers.orjson', None)
+    def test_fallback(self):
+        """Test rendering without orjson installed"""
+        self.assertEqual(
+            FastJSONRenderer().render(PAYLOAD),
+            JSONRenderer().render(PAYLOAD)
+        )
+
+
+class FastJSONParserTests(TestCase):
+
+    def parse(self, content, encoding='utf-8'):
+        return FastJSONParser().parse(
+            io.BytesIO(content),
+            parser_context={'encoding': encoding}
+        )
+
+    def test_parse(self):
+        """Test parsing JSON bodies"""
+        self.assertEqual(
+            self.parse('{"title": "Crème", "price": 1.5, "tags": [1]}'
+                       .encode()),
+            {'title': 'Crème', 'price': 1.5, 'tags': [1]}
+        )
+
+    def test_parse_big_integer(self):
+        """Test integers beyond 64 bits are still parsed"""
+        self.assertEqual(self.parse(b'[123456789012345678901234567890]'),
+                         [123456789012345678901234567890])
+
+    def test_parse_errors(self):
+        """Test invalid JSON and non finite numbers are rejected"""
+        for content in (b'{"title": ', b'[NaN]'):
+            with self.assertRaises(ParseError):
+                self.parse(content)
+
+    def test_parse_other_encoding(self):
+        """Test bodies in other encodings are decoded first"""
+        self.assertEqual(
+            self.parse('["Crème"]'.encode('latin-1'), 'latin-1'),
+            ['Crème']
+        )
+
+    @patch('core.parsers.orjson', None)
+    def test_fallback(self):
+        """Test parsing without orjson installed"""
+        self.assertEqual(self.parse(b'{"id": 1}'), {'id': 1})
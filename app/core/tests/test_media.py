@@ -0,0 +1,165 @@
+import os
+import shutil
+import tempfile
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from core.models import Recipe
+from core.storage import image_storage
+
+
+CONTENT = b'0123456789' * 10
+
+
+def media_url(path):
+    """Return the URL of a media file"""
+    return reverse('media', args=(path,))
+
+
+class ServeMediaTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.media_settings = self.settings(MEDIA_ROOT=self.media_root)
+        self.media_settings.enable()
+        self.name = image_storage.save('images/a.jpg', ContentFile(CONTENT))
+        self.url = media_url(self.name)
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'testpass'
+        )
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Curry',
+            time_minutes=10,
+            price=5,
+            image=self.name
+        )
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user)}'
+        )
+
+    def tearDown(self):
+        self.media_settings.disable()
+        shutil.rmtree(self.media_root)
+
+    def test_serve_file(self):
+        """Test files are served with validators and cache headers"""
+        res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(b''.join(res.streaming_content), CONTENT)
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        self.assertEqual(res['Content-Length'], '100')
+        self.assertEqual(res['Accept-Ranges'], 'bytes')
+        self.assertIn('max-age=', res['Cache-Control'])
+        self.assertIn('private', res['Cache-Control'])
+        self.assertTrue(res['ETag'])
+        self.assertTrue(res['Last-Modified'])
+
+    def test_not_modified(self):
+        """Test conditional requests of unchanged files get a 304"""
+        res = self.client.get(self.url)
+        res = self.client.get(self.url, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, 304)
+        self.assertFalse(res.content)
+
+    def test_ranges(self):
+        """Test byte ranges are served as partial content"""
+        for header, body, content_range in (
+            ('bytes=10-19', CONTENT[10:20], 'bytes 10-19/100'),
+            ('bytes=95-', CONTENT[95:], 'bytes 95-99/100'),
+            ('bytes=-5', CONTENT[95:], 'bytes 95-99/100'),
+            ('bytes=90-200', CONTENT[90:], 'bytes 90-99/100'),
+        ):
+            res = self.client.get(self.url, HTTP_RANGE=header)
+
+            self.assertEqual(res.status_code, 206)
+            self.assertEqual(b''.join(res.streaming_content), body)
+            self.assertEqual(res['Content-Length'], str(len(body)))
+            self.assertEqual(res['Content-Range'], content_range)
+
+    def test_unsatisfiable_range(self):
+        """Test ranges beyond the end of the file are refused"""
+        res = self.client.get(self.url, HTTP_RANGE='bytes=100-')
+
+        self.assertEqual(res.status_code, 416)
+        self.assertEqual(res['Content-Range'], 'bytes */100')
+
+    def test_if_range(self):
+        """Test ranges of changed files are ignored"""
+        res = self.client.get(self.url, HTTP_RANGE='bytes=0-9',
+                              HTTP_IF_RANGE='"changed"')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(b''.join(res.streaming_content), CONTENT)
+
+    def test_files_not_served(self):
+        """Test released, partial and outside files aren't served"""
+        with open(os.path.join(self.media_root, 'images/b.jpg.x.tmp'),
+                  'wb') as f:
+            f.write(CONTENT)
+        released = image_storage.save('images/c.jpg', ContentFile(b'c'))
+        image_storage.delete(released)
+
+        for path in ('images/b.jpg.x.tmp', released, 'images/missing.jpg',
+                     '../etc/passwd', 'images'):
+            res = self.client.get(media_url(path))
+            self.assertEqual(res.status_code, 404, path)
+
+    def test_authentication_required(self):
+        """Test files aren't served to anonymous or invalid tokens"""
+        self.client.credentials()
+        res = self.client.get(self.url)
+        self.assertEqual(res.status_code, 404)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+        res = self.client.get(self.url)
+        self.assertEqual(res.status_code, 404)
+
+    def test_files_of_other_users(self):
+        """Test files are only served to users who can see their recipes"""
+        other = get_user_model().objects.create_user(
+            'other@test.com',
+            'testpass'
+        )
+        self.client.force_authenticate(other)
+        res = self.client.get(self.url)
+        self.assertEqual(res.status_code, 404)
+
+        other.is_staff = True
+        other.save()
+        res = self.client.get(self.url)
+        self.assertEqual(res.status_code, 200)
+
+    def test_rendition_served(self):
+        """Test the renditions of the recipe image are served"""
+        rendition = image_storage.save('images/thumb.webp',
+                                       ContentFile(b'thumb'))
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            image_renditions={'thumb': {'webp': rendition}}
+        )
+        res = self.client.get(media_url(rendition))
+
+        self.assertEqual(res.status_code, 200)
+
+    def test_sendfile_headers(self):
+        """Test the transfer is left to the front proxy when configured"""
+        with self.settings(MEDIA_SERVING={
+            'SENDFILE_HEADER': 'X-Accel-Redirect',
+            'INTERNAL_URL': '/protected/',
+        }):
+            res = self.client.get(self.url)
+        self.assertEqual(res['X-Accel-Redirect'], f'/protected/{self.name}')
+        self.assertFalse(res.content)
+
+        with self.settings(MEDIA_SERVING={'SENDFILE_HEADER': 'X-Sendfile'}):
+            res = self.client.get(self.url)
+        self.assertEqual(res['X-Sendfile'],
+                         os.path.join(self.media_root, self.name))
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
@@ -1,5 +1,6 @@
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
 from core import models
 from unittest.mock import patch
 
@@ -22,6 +23,32 @@ class ModelTests(TestCase):
         self.assertEqual(user.email, email)
         self.assertTrue(user.check_password(password))
 
+    def test_password_hashed_with_argon2(self):
+        """Test passwords are hashed with the configured Argon2 costs"""
+        with self.settings(PASSWORD_HASHING={'ARGON2_TIME_COST': 3}):
+            user = get_user_model().objects.create_user(
+                'test@test.com', 'test1234567'
+            )
+
+        self.assertTrue(user.password.startswith('argon2$'))
+        self.assertIn('t=3', user.password)
+
+    def test_password_rehashed_on_check(self):
+        """Test outdated password hashes are replaced on a valid check"""
+        user = get_user_model().objects.create_user('test@test.com')
+        user.password = make_password('test1234567', hasher='pbkdf2_sha256')
+        user.save()
+
+        self.assertFalse(user.check_password('wrong'))
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$'))
+        self.assertTrue(user.check_password('test1234567'))
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('argon2$'))
+        with self.settings(PASSWORD_HASHING={'ARGON2_TIME_COST': 3}):
+            self.assertTrue(user.check_password('test1234567'))
+        user.refresh_from_db()
+        self.assertIn('t=3', user.password)
+
     def test_new_user_email_normalised(self):
         """
         Test the email for a new user is normalised
@@ -87,3 +114,47 @@ class ModelTests(TestCase):
         exp_path = f'uploads/recipes/{uuid}.jpg'
 
         self.assertEqual(file_path, exp_path)
+
+    def test_recipe_updated_on_relation_change(self):
+        """Test changing the tags of a recipe updates its timestamp"""
+        user = get_sample_user()
+        recipe = models.Recipe.objects.create(
+            user=user,
+            title='Steak',
+            time_minutes=10,
+            price=15.00
+        )
+        tag = models.Tag.objects.create(user=user, name='Meat')
+        updated_at = recipe.updated_at
+        tag.recipe_set.add(recipe)
+        recipe.refresh_from_db()
+
+        self.assertGreater(recipe.updated_at, updated_at)
+
+    def test_change_sequence_is_monotonic(self):
+        """Test every change takes the next value of the user's sequence"""
+        user = get_sample_user()
+        tag = models.Tag.objects.create(user=user, name='Meat')
+        first = tag.change_seq
+        tag.save()
+
+        self.assertGreater(tag.change_seq, first)
+        self.assertEqual(
+            models.ChangeSequence.next_value(user.id, count=3),
+            tag.change_seq + 3
+        )
+
+    def test_get_or_create_names(self):
+        """Test getting objects by name ignoring case, creating the rest"""
+        user = get_sample_user()
+        tag = models.Tag.objects.create(user=user, name='Vegan')
+
+        tags = models.Tag.objects.get_or_create_names(
+            user, ['vegan', 'Dinner', 'dinner']
+        )
+
+        self.assertEqual(len(tags), 2)
+        self.assertEqual(tags[0], tag)
+        self.assertEqual(tags[1].name, 'Dinner')
+        self.assertGreater(tags[1].change_seq, tag.change_seq)
+        self.assertEqual(models.Tag.objects.filter(user=user).count(), 2)
@@ -0,0 +1,125 @@
+import datetime
+import io
+import os
+import shutil
+import tempfile
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from core.models import ImageBlob, Recipe
+from core.storage import image_storage
+
+
+class ContentAddressedStorageTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.media_settings = self.settings(MEDIA_ROOT=self.media_root)
+        self.media_settings.enable()
+
+    def tearDown(self):
+        self.media_settings.disable()
+        shutil.rmtree(self.media_root)
+
+    def test_identical_files_stored_once(self):
+        """Test files are named by their content and written once"""
+        name = image_storage.save('images/a.JPG', ContentFile(b'content'))
+        name2 = image_storage.save('images/b.jpg', ContentFile(b'content'))
+        name3 = image_storage.save('images/c.jpg', ContentFile(b'other'))
+
+        self.assertEqual(name, name2)
+        self.assertNotEqual(name, name3)
+        self.assertRegex(name, r'^images/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+        self.assertEqual(
+            os.listdir(os.path.dirname(image_storage.path(name))),
+            [os.path.basename(name)]
+        )
+        blob = ImageBlob.objects.get(name=name)
+        self.assertEqual((blob.size, blob.refcount), (7, 2))
+
+    def test_delete_releases_reference(self):
+        """Test deleting a file only removes a reference to it"""
+        name = image_storage.save('images/a.jpg', ContentFile(b'content'))
+        image_storage.delete(name)
+
+        self.assertTrue(image_storage.exists(name))
+        self.assertEqual(ImageBlob.objects.get(name=name).refcount, 0)
+
+    def test_release_never_below_zero(self):
+        """Test releasing a file too many times keeps it at no references"""
+        name = image_storage.save('images/a.jpg', ContentFile(b'content'))
+        image_storage.delete(name)
+        image_storage.delete(name)
+
+        self.assertTrue(image_storage.exists(name))
+        self.assertEqual(ImageBlob.objects.get(name=name).refcount, 0)
+
+    def test_delete_uncounted_file(self):
+        """Test files saved before counting references are removed"""
+        path = os.path.join(self.media_root, 'old.jpg')
+        with open(path, 'wb') as f:
+            f.write(b'content')
+        image_storage.delete('old.jpg')
+
+        self.assertFalse(os.path.exists(path))
+
+    def test_recipe_deletion_releases_image(self):
+        """Test deleting a recipe releases its image"""
+        user = get_user_model().objects.create_user('test@test.com', 'pass')
+        recipe = Recipe.objects.create(
+            user=user, title='Curry', time_minutes=10, price=5
+        )
+        recipe.image.save('curry.jpg', ContentFile(b'content'))
+        recipe.delete()
+
+        self.assertEqual(
+            ImageBlob.objects.get(name=recipe.image.name).refcount, 0
+        )
+
+    def test_stale_recipe_deletion_releases_renditions(self):
+        """Test deleting a recipe processed since it was loaded"""
+        user = get_user_model().objects.create_user('test@test.com', 'pass')
+        recipe = Recipe.objects.create(
+            user=user, title='Curry', time_minutes=10, price=5
+        )
+        recipe.image.save('curry.jpg', ContentFile(b'content'))
+        upload = recipe.image.name
+        rendition = image_storage.save('images/full.jpg',
+                                       ContentFile(b'full'))
+        Recipe.objects.filter(pk=recipe.pk).update(
+            image=rendition,
+            image_renditions={'full': {'jpeg': rendition}}
+        )
+        image_storage.delete(upload)
+        recipe.delete()
+
+        self.assertEqual(ImageBlob.objects.get(name=upload).refcount, 0)
+        self.assertEqual(ImageBlob.objects.get(name=rendition).refcount, 0)
+
+    def test_gc_images(self):
+        """Test unreferenced files are removed after the grace period"""
+        old = image_storage.save('images/a.jpg', ContentFile(b'old'))
+        recent = image_storage.save('images/b.jpg', ContentFile(b'recent'))
+        kept = image_storage.save('images/c.jpg', ContentFile(b'kept'))
+        image_storage.save('images/c.jpg', ContentFile(b'kept'))
+        image_storage.delete(old)
+        image_storage.delete(recent)
+        ImageBlob.objects.filter(name=old).update(
+            updated_at=timezone.now() - datetime.timedelta(hours=2)
+        )
+
+        out = io.StringIO()
+        call_command('gc_images', '--dry-run', stdout=out)
+        self.assertIn('Would remove 1 files', out.getvalue())
+        self.assertTrue(image_storage.exists(old))
+
+        out = io.StringIO()
+        call_command('gc_images', stdout=out)
+        self.assertFalse(image_storage.exists(old))
+        self.assertTrue(image_storage.exists(recent))
+        self.assertFalse(ImageBlob.objects.filter(name=old).exists())
+        self.assertTrue(image_storage.exists(kept))
+        self.assertIn('Removed 1 files', out.getvalue())
+        self.assertIn('1 files with 2 references', out.getvalue())
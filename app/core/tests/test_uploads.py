@@ -0,0 +1,58 @@
+import io
+import struct
+import zlib
+from django.test import TestCase
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+from core.uploads import read_image_header
+
+
+def sample_image(image_format, size=(10, 10)):
+    """Return the content of a sample image"""
+    content = io.BytesIO()
+    Image.new('RGB', size).save(content, image_format)
+    return content.getvalue()
+
+
+def png_header(width, height):
+    """Return the header of a PNG image of the size, up to its pixels"""
+    ihdr = b'IHDR' + struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + ihdr + \
+        struct.pack('>I', zlib.crc32(ihdr)) + struct.pack('>I', 0) + b'IDAT'
+
+
+class ReadImageHeaderTests(TestCase):
+
+    def test_supported_formats(self):
+        """Test the format and size are read from supported images"""
+        for image_format in ('JPEG', 'PNG', 'GIF', 'WEBP'):
+            self.assertEqual(
+                read_image_header(sample_image(image_format, (30, 20))),
+                (image_format, (30, 20))
+            )
+
+    def test_partial_header(self):
+        """Test more bytes are asked for until the size is found"""
+        content = sample_image('JPEG')
+
+        self.assertIsNone(read_image_header(content[:8]))
+        self.assertIsNone(read_image_header(content[:100]))
+        with self.assertRaises(ValidationError):
+            read_image_header(content[:100], complete=True)
+
+    def test_unsupported_files(self):
+        """Test files without the magic bytes of an image are rejected"""
+        for content in (b'not an image', sample_image('BMP'),
+                        b'\xff\xd8\xff' + b'\x00' * 300000):
+            with self.assertRaises(ValidationError):
+                read_image_header(content)
+
+    def test_too_many_pixels(self):
+        """Test images are rejected from their header when too large"""
+        with self.settings(IMAGE_UPLOADS={'MAX_PIXELS': 1000}):
+            with self.assertRaises(ValidationError):
+                read_image_header(sample_image('PNG', (40, 30)))
+        for size in ((10000, 10000), (100000, 100000)):
+            with self.assertRaises(ValidationError) as context:
+                read_image_header(png_header(*size))
+            self.assertIn('pixels', str(context.exception.detail['image']))
@@ -0,0 +1,156 @@
+import io
+import warnings
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.utils.translation import gettext_lazy as _
+from PIL import Image
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.parsers import MultiPartParser
+
+
+DEFAULT_IMAGE_UPLOADS = {
+    'MAX_BYTES': 25 * 2 ** 20,
+    'MAX_PIXELS': 50000000,
+    # Bytes read at most to find the dimensions of an image
+    'MAX_HEADER_BYTES': 256 * 2 ** 10,
+}
+# Allowance for the multipart boundaries and the other fields
+MULTIPART_OVERHEAD = 64 * 2 ** 10
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'JPEG'),
+    (b'\x89PNG\r\n\x1a\n', 'PNG'),
+    (b'GIF87a', 'GIF'),
+    (b'GIF89a', 'GIF'),
+)
+
+
+def get_image_upload_settings():
+    """Return the IMAGE_UPLOADS settings with the defaults"""
+    return dict(
+        DEFAULT_IMAGE_UPLOADS,
+        **getattr(settings, 'IMAGE_UPLOADS', {})
+    )
+
+
+class UploadTooLarge(APIException):
+    """Raised when an upload exceeds the MAX_BYTES setting"""
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = _('The upload is larger than %(max_size)s bytes.')
+    default_code = 'too_large'
+
+    def __init__(self, detail=None, code=None):
+        if detail is None:
+            detail = self.default_detail % {
+                'max_size': get_image_upload_settings()['MAX_BYTES']
+            }
+        super().__init__(detail, code)
+
+
+def image_signature_format(header):
+    """Return the format given by the magic bytes of an image, if known"""
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'WEBP'
+    for signature, image_format in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return image_format
+    return None
+
+
+def too_many_pixels():
+    """Return the validation error of images with too many pixels"""
+    return ValidationError({'image': [
+        _('Images can have %(max_pixels)s pixels at most.') % {
+            'max_pixels': get_image_upload_settings()['MAX_PIXELS']
+        }
+    ]})
+
+
+def check_image_pixels(size):
+    """Raise a validation error when an image has too many pixels"""
+    if size[0] * size[1] > get_image_upload_settings()['MAX_PIXELS']:
+        raise too_many_pixels()
+
+
+def read_image_header(header, complete=False):
+    """
+    Return the format and size of the image starting with the header
+    bytes, or None when more bytes are needed; raise a validation error
+    for files which aren't supported images or have too many pixels
+    """
+    config = get_image_upload_settings()
+    invalid = ValidationError({'image': [
+        _('Upload a valid JPEG, PNG, GIF or WebP image.')
+    ]})
+    if len(header) < 12 and not complete:
+        return None
+    image_format = image_signature_format(header)
+    if image_format is None:
+        raise invalid
+    try:
+        # The pixels are limited below, whatever Pillow's own limit
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+            image = Image.open(io.BytesIO(header))
+    except Image.DecompressionBombError:
+        raise too_many_pixels()
+    except Exception:
+        # The dimensions may be further than the header read so far
+        if complete or len(header) >= config['MAX_HEADER_BYTES']:
+            raise invalid
+        return None
+    if image.format != image_format:
+        raise invalid
+    check_image_pixels(image.size)
+    return image_format, image.size
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+    """
+    Upload handler streaming files to temporary files in chunks, rejecting
+    them as soon as they exceed the byte limit or their first bytes aren't
+    those of a supported image with a bounded number of pixels
+
+    The files received are given the image_format and image_size read from
+    their header.
+    """
+
+    def handle_raw_input(self, input_data, META, content_length, boundary,
+                         encoding=None):
+        """Reject the request before reading it when it is too large"""
+        max_bytes = get_image_upload_settings()['MAX_BYTES']
+        if content_length > max_bytes + MULTIPART_OVERHEAD:
+            raise UploadTooLarge()
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.header = b''
+        self.image_info = None
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > get_image_upload_settings()['MAX_BYTES']:
+            raise UploadTooLarge()
+        if self.image_info is None:
+            self.header += raw_data
+            self.image_info = read_image_header(self.header)
+            if self.image_info is not None:
+                self.header = None
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        if self.image_info is None:
+            self.image_info = read_image_header(self.header, complete=True)
+        image_file = super().file_complete(file_size)
+        image_file.image_format, image_file.image_size = self.image_info
+        return image_file
+
+
+class ImageUploadParser(MultiPartParser):
+    """Multipart parser receiving the files with ImageUploadHandler"""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = parser_context['request']
+        request.upload_handlers = [ImageUploadHandler(request)]
+        return super().parse(stream, media_type, parser_context)
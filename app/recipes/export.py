@@ -0,0 +1,64 @@
+import csv
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from core.models import Recipe
+
+
+EXPORT_FIELDS = ('id', 'title', 'time_minutes', 'price', 'link', 'tags',
+                 'ingredients')
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+NAMES_SEPARATOR = '|'
+
+
+def export_rows(user, chunk_size=2000):
+    """
+    Yield the recipes of the user with their tag and ingredient names
+
+    Rows are read from a server-side cursor chunk_size at a time, inside
+    a transaction so the database doesn't materialize the whole result.
+    """
+    recipes = Recipe.objects.filter(user=user).with_related_names().order_by(
+        'id'
+    ).values_list('id', 'title', 'time_minutes', 'price', 'link',
+                  'tag_names', 'ingredient_names')
+    with transaction.atomic():
+        for row in recipes.iterator(chunk_size=chunk_size):
+            yield dict(zip(EXPORT_FIELDS, row[:5] + (
+                row[5] or [],
+                row[6] or []
+            )))
+
+
+def ndjson_lines(rows):
+    """Yield each row as a line of JSON"""
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+class _LineBuffer:
+    """File-like object returning what is written to it"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    """Yield a CSV header and a line per row, joining the names lists"""
+    writer = csv.writer(_LineBuffer())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        row['tags'] = NAMES_SEPARATOR.join(row['tags'])
+        row['ingredients'] = NAMES_SEPARATOR.join(row['ingredients'])
+        yield writer.writerow(row[field] for field in EXPORT_FIELDS)
+
+
+def export_lines(user, export_format, chunk_size=2000):
+    """Yield the lines of the export of the user's recipes"""
+    rows = export_rows(user, chunk_size=chunk_size)
+    if export_format == 'csv':
+        return csv_lines(rows)
+    return ndjson_lines(rows)
@@ -0,0 +1,89 @@
+from decimal import Decimal, InvalidOperation
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import ValidationError
+
+
+MATCH_MODES = ('any', 'all')
+ORDERING_FIELDS = ('price', 'time_minutes', 'id')
+
+
+def params_to_ints(value, param):
+    """Convert a comma separated list of IDs to a list of integers"""
+    if not value:
+        return []
+    try:
+        return [int(id_str) for id_str in value.split(',')]
+    except ValueError:
+        raise ValidationError({param: _('Expected a list of IDs')})
+
+
+def param_to_number(value, param, convert):
+    """Convert a query parameter to a finite number"""
+    try:
+        number = convert(value)
+    except (ValueError, InvalidOperation):
+        raise ValidationError({param: _('Expected a number')})
+    if isinstance(number, Decimal) and not number.is_finite():
+        raise ValidationError({param: _('Expected a number')})
+    return number
+
+
+class RecipeFilter:
+    """Apply the query parameters of the recipe list to a queryset"""
+    related_params = ('tags', 'ingredients')
+    range_params = (
+        ('price_min', 'price__gte', Decimal),
+        ('price_max', 'price__lte', Decimal),
+        ('time_max', 'time_minutes__lte', int),
+    )
+
+    def __init__(self, query_params, user):
+        self.query_params = query_params
+        self.user = user
+
+    @property
+    def search_text(self):
+        """Return the text recipes are searched for, if any"""
+        return self.query_params.get('search', '').strip()
+
+    def get_match_mode(self, param):
+        """Return whether recipes must match any or all of the IDs"""
+        mode_param = f'{param}_mode'
+        mode = self.query_params.get(mode_param, 'any')
+        if mode not in MATCH_MODES:
+            raise ValidationError({
+                mode_param: _('Expected one of: any, all')
+            })
+        return mode
+
+    def get_ordering(self):
+        """Return the ordering requested with ?ordering=, if any"""
+        value = self.query_params.get('ordering')
+        if not value:
+            return None
+        ordering = tuple(value.split(','))
+        fields = [field.lstrip('-') for field in ordering]
+        if len(set(fields)) != len(fields) or \
+                not set(fields) <= set(ORDERING_FIELDS):
+            raise ValidationError({
+                'ordering': _('Expected a list of: price, time_minutes, id')
+            })
+        return ordering
+
+    def filter_queryset(self, queryset):
+        """Return the recipes matching the query parameters"""
+        if self.search_text:
+            queryset = queryset.search(self.search_text, self.user)
+        for param in self.related_params:
+            ids = params_to_ints(self.query_params.get(param), param)
+            if ids:
+                queryset = queryset.filter_related(
+                    param, ids, self.get_match_mode(param)
+                )
+        for param, lookup, convert in self.range_params:
+            value = self.query_params.get(param)
+            if value:
+                queryset = queryset.filter(**{
+                    lookup: param_to_number(value, param, convert)
+                })
+        return queryset
@@ -0,0 +1,246 @@
+import json
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import serializers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from core.cache import get_response_cache
+from core.models import Tag, Ingredient, Recipe, ChangeSequence
+
+
+RELATED_MODELS = (
+    ('tags', Tag),
+    ('ingredients', Ingredient),
+)
+
+
+def parse_ndjson(lines):
+    """Return the objects of lines of JSON, skipping blank lines"""
+    rows = []
+    for number, line in enumerate(lines, 1):
+        try:
+            if isinstance(line, bytes):
+                line = line.decode()
+            if not line.strip():
+                continue
+            rows.append(json.loads(line))
+        except UnicodeDecodeError:
+            raise ParseError(_('Invalid UTF-8 on line %d') % number)
+        except ValueError:
+            raise ParseError(_('Invalid JSON on line %d') % number)
+    return rows
+
+
+def read_upload(upload):
+    """Return the rows of an uploaded JSON array or NDJSON file"""
+    content = upload.read().lstrip()
+    if content.startswith(b'['):
+        try:
+            return json.loads(content.decode())
+        except ValueError:
+            raise ParseError(_('Invalid JSON file'))
+    return parse_ndjson(content.splitlines())
+
+
+class NDJSONParser(BaseParser):
+    """Parse newline delimited JSON into a list of objects"""
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return parse_ndjson(stream)
+
+
+class RelatedIdsField(serializers.ListField):
+    """
+    List of IDs checked against the user's objects looked up beforehand,
+    which the root serializer provides in its known_ids context
+    """
+    child = serializers.IntegerField()
+    default_error_messages = {
+        'does_not_exist': _('Invalid pk "{pk_value}" - object does not '
+                            'exist.'),
+    }
+
+    def to_internal_value(self, data):
+        ids = super().to_internal_value(data)
+        known_ids = self.context['known_ids'][self.field_name]
+        for pk in ids:
+            if pk not in known_ids:
+                self.fail('does_not_exist', pk_value=pk)
+        return list(dict.fromkeys(ids))
+
+
+class RecipeImportSerializer(serializers.ModelSerializer):
+    """Serializer validating the rows of a recipe import"""
+    tags = RelatedIdsField(default=list)
+    ingredients = RelatedIdsField(default=list)
+
+    class Meta:
+        model = Recipe
+        fields = ('title', 'ingredients', 'tags', 'time_minutes', 'price',
+                  'link')
+
+
+def _submitted_ids(rows, relation):
+    """Return the integer IDs of a relation found in the raw rows"""
+    ids = set()
+    for row in rows:
+        values = row.get(relation) if isinstance(row, dict) else None
+        if not isinstance(values, list):
+            continue
+        for value in values:
+            try:
+                ids.add(int(value))
+            except (TypeError, ValueError):
+                pass
+    return ids
+
+
+def validate_rows(user, rows):
+    """
+    Return the validated rows and the errors of the invalid ones
+
+    The IDs of each relation referenced by all the rows are looked up
+    with a single query.
+    """
+    if not isinstance(rows, list):
+        raise ParseError(_('Expected a list of recipes'))
+    known_ids = {
+        relation: set(model.objects.filter(
+            user=user,
+            id__in=_submitted_ids(rows, relation)
+        ).values_list('id', flat=True))
+        for relation, model in RELATED_MODELS
+    }
+    serializer = RecipeImportSerializer(
+        data=rows,
+        many=True,
+        context={'known_ids': known_ids}
+    )
+    if serializer.is_valid():
+        return serializer.validated_data, []
+    return [], [
+        {'row': row, 'errors': errors}
+        for row, errors in enumerate(serializer.errors) if errors
+    ]
+
+
+def _field_default(field):
+    """Return the value of a field left out of an insert"""
+    if getattr(field, 'auto_now', False) or \
+            getattr(field, 'auto_now_add', False):
+        return timezone.now()
+    return field.get_default()
+
+
+def _insert_columns(model, columns, constants):
+    """
+    Insert rows into the table of a model passing each column as an array
+    or a constant, the other fields taking their defaults, which saves
+    building and compiling an ORM instance per row; return the new
+    primary keys in the order of the rows
+    """
+    quote = connection.ops.quote_name
+    meta = model._meta
+    constants = {
+        **{
+            field.name: _field_default(field)
+            for field in meta.concrete_fields
+            if not field.primary_key and field.name not in columns
+        },
+        **constants,
+    }
+    fields = [meta.get_field(name) for name in columns]
+    constant_fields = [meta.get_field(name) for name in constants]
+    names = ', '.join(
+        quote(field.column)
+        for field in [meta.pk] + fields + constant_fields
+    )
+    aliases = [f'c{index}' for index in range(len(fields))]
+    arrays = ', '.join(
+        f'%s::{field.db_type(connection)}[]' for field in fields
+    )
+    table = quote(meta.db_table)
+    with connection.cursor() as cursor:
+        # The keys are taken from the sequence with the position of each
+        # row, as the order of the rows returned by INSERT isn't defined
+        cursor.execute(
+            f'WITH data AS ('
+            f'SELECT nextval(pg_get_serial_sequence(%s, %s)) AS pk, '
+            f'position, {", ".join(aliases)} '
+            f'FROM unnest({arrays}) WITH ORDINALITY '
+            f'AS data ({", ".join(aliases)}, position) ORDER BY position'
+            f'), inserted AS ('
+            f'INSERT INTO {table} ({names}) '
+            f'SELECT {", ".join(["pk"] + aliases + ["%s"] * len(constants))} '
+            f'FROM data'
+            f') SELECT pk FROM data ORDER BY position',
+            [meta.db_table, meta.pk.column] +
+            [list(values) for values in columns.values()] +
+            [
+                field.get_db_prep_save(value, connection)
+                for field, value in zip(constant_fields, constants.values())
+            ]
+        )
+        return [pk for pk, in cursor.fetchall()]
+
+
+def create_recipes(user, rows, batch_size=1000):
+    """
+    Create the recipes of validated rows with bulk inserts of recipes and
+    relations, batch_size recipes per query, in a single transaction
+
+    Signals aren't sent, so the change sequence values are reserved, the
+    search vectors computed and the user's cached responses invalidated
+    here.
+    """
+    if not rows:
+        return []
+    fields = [
+        Recipe._meta.get_field(name)
+        for name in RecipeImportSerializer.Meta.fields
+        if name not in dict(RELATED_MODELS)
+    ]
+    with transaction.atomic():
+        first_seq = ChangeSequence.next_value(user.pk, len(rows)) - \
+            len(rows) + 1
+        recipe_ids = []
+        for offset in range(0, len(rows), batch_size):
+            batch = rows[offset:offset + batch_size]
+            columns = {
+                field.name: [
+                    row.get(field.name, field.get_default())
+                    for row in batch
+                ]
+                for field in fields
+            }
+            columns['change_seq'] = range(
+                first_seq + offset, first_seq + offset + len(batch)
+            )
+            recipe_ids += _insert_columns(Recipe, columns, {
+                'user': user.pk,
+            })
+        for relation, model in RELATED_MODELS:
+            field = Recipe._meta.get_field(relation)
+            column = field.m2m_reverse_field_name()
+            for offset in range(0, len(rows), batch_size):
+                links = [
+                    (recipe_id, pk)
+                    for recipe_id, row in zip(
+                        recipe_ids[offset:offset + batch_size],
+                        rows[offset:offset + batch_size]
+                    )
+                    for pk in row[relation]
+                ]
+                if links:
+                    _insert_columns(field.remote_field.through, {
+                        'recipe': [link[0] for link in links],
+                        column: [link[1] for link in links],
+                    }, {})
+        for offset in range(0, len(recipe_ids), batch_size):
+            Recipe.objects.filter(
+                id__in=recipe_ids[offset:offset + batch_size]
+            ).update_search_vectors()
+    get_response_cache().invalidate(user.pk)
+    return recipe_ids
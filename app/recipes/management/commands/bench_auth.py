@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory
+from core.authentication import CachedTokenAuthentication
+from core.benchmarks import get_bench_user, summarize, time_calls
+from users.views import ManageUserView
+
+
+class Command(BaseCommand):
+    """
+    Django command to compare authenticated requests with and without the
+    token cache
+    """
+    help = 'Measure the throughput of authenticated GET requests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        user = get_bench_user()
+        token, _ = Token.objects.get_or_create(user=user)
+        request = APIRequestFactory().get(
+            '/api/user/me/',
+            SERVER_NAME='localhost',
+            HTTP_AUTHORIZATION=f'Token {token.key}'
+        )
+        for authentication in (TokenAuthentication,
+                               CachedTokenAuthentication):
+            view = ManageUserView.as_view(
+                authentication_classes=(authentication,)
+            )
+            samples = time_calls(lambda: view(request),
+                                 options['iterations'])
+            self.stdout.write(
+                f'{authentication.__name__}: '
+                f'{len(samples) / sum(samples) * 1000:.0f} requests/sec, '
+                f'{summarize(samples)}'
+            )
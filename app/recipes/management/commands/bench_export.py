@@ -0,0 +1,76 @@
+import resource
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection
+from core.benchmarks import get_bench_user, seed_recipes
+from core.models import Recipe
+from recipes import serializers
+from recipes.export import EXPORT_FORMATS, export_lines
+
+
+class Command(BaseCommand):
+    """
+    Django command to measure the throughput and peak memory of exports
+    """
+    help = 'Measure the rows per second and peak RSS of recipe exports'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=200000)
+        parser.add_argument(
+            '--output-format',
+            choices=sorted(EXPORT_FORMATS),
+            default='ndjson'
+        )
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument(
+            '--mode',
+            choices=('stream', 'serializer'),
+            default='stream',
+            help='Stream the export or serialize the list in memory; run '
+                 'each mode in its own process to compare peak RSS'
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the benchmark data for the next run'
+        )
+
+    def handle(self, *args, **options):
+        user = get_bench_user()
+        if not Recipe.objects.filter(user=user).exists():
+            self.stdout.write('Seeding benchmark data...')
+            seed_recipes(user, options['recipes'])
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        start_rss = self.peak_rss()
+        start = time.perf_counter()
+        if options['mode'] == 'stream':
+            rows = sum(1 for _ in export_lines(
+                user,
+                options['output_format'],
+                chunk_size=options['chunk_size']
+            ))
+            if options['output_format'] == 'csv':
+                rows -= 1
+        else:
+            rows = len(serializers.RecipeSerializer(
+                Recipe.objects.filter(user=user).prefetch_related_ids(),
+                many=True
+            ).data)
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(
+            f'{options["mode"]}: {rows} rows in {elapsed:.2f}s '
+            f'({rows / elapsed:.0f} rows/sec), peak RSS '
+            f'{self.peak_rss() / 1024:.1f}MB '
+            f'(+{(self.peak_rss() - start_rss) / 1024:.1f}MB)'
+        )
+
+        if not options['keep']:
+            user.delete()
+
+    @staticmethod
+    def peak_rss():
+        """Return the peak resident set size of the process in KB"""
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
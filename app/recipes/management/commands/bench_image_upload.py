@@ -0,0 +1,92 @@
+import io
+import random
+from unittest.mock import patch
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image, ImageFilter
+from rest_framework.test import APIRequestFactory, force_authenticate
+from core.benchmarks import get_bench_user, summarize, time_calls
+from core.images import EXTENSIONS, process_recipe_image, \
+    recipe_image_names
+from core.models import Recipe
+from recipes.views import RecipeViewSet
+
+
+def sample_photo(width, height):
+    """Return a JPEG with noise and gradients like a camera photo"""
+    random.seed(0)
+    noise = Image.frombytes(
+        'RGB', (width // 4, height // 4),
+        bytes(random.getrandbits(8) for _ in range(width * height * 3 // 16))
+    ).filter(ImageFilter.GaussianBlur(2)).resize((width, height))
+    content = io.BytesIO()
+    noise.save(content, 'JPEG', quality=92)
+    return content.getvalue()
+
+
+class Command(BaseCommand):
+    """
+    Django command to measure uploading recipe images and making their
+    renditions
+    """
+    help = 'Measure image upload requests and rendition processing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--width', type=int, default=4032)
+        parser.add_argument('--height', type=int, default=3024)
+        parser.add_argument('--iterations', type=int, default=10)
+
+    def handle(self, *args, **options):
+        user = get_bench_user()
+        recipe = Recipe.objects.create(
+            user=user, title='Image benchmark', time_minutes=1, price=1
+        )
+        photo = sample_photo(options['width'], options['height'])
+        factory = APIRequestFactory()
+        view = RecipeViewSet.as_view({'post': 'upload_image'})
+
+        def upload():
+            request = factory.post(
+                f'/api/recipe/recipes/{recipe.pk}/upload-image/',
+                {'image': SimpleUploadedFile('photo.jpg', photo)},
+                format='multipart',
+                SERVER_NAME='localhost'
+            )
+            force_authenticate(request, user)
+            response = view(request, pk=recipe.pk)
+            if response.status_code != 202:
+                raise CommandError(response.data)
+
+        try:
+            # Upload requests with the processing left to the executor,
+            # and done inline like a synchronous pipeline would
+            with patch('recipes.views.schedule_recipe_image'):
+                samples = time_calls(upload, options['iterations'])
+            self.stdout.write(
+                f'upload {len(photo) / 1024:.0f}KB, background '
+                f'processing: {summarize(samples)}'
+            )
+            with patch('recipes.views.schedule_recipe_image',
+                       process_recipe_image):
+                samples = time_calls(upload, options['iterations'])
+            self.stdout.write(
+                f'upload {len(photo) / 1024:.0f}KB, inline processing: '
+                f'{summarize(samples)}'
+            )
+
+            recipe.refresh_from_db()
+            for rendition, values in recipe.image_renditions.items():
+                sizes = ', '.join(
+                    f'{key} {default_storage.size(name) / 1024:.0f}KB'
+                    for key, name in values.items() if key in EXTENSIONS
+                )
+                self.stdout.write(
+                    f'  {rendition} {values["width"]}x{values["height"]}: '
+                    f'{sizes}'
+                )
+        finally:
+            recipe.refresh_from_db()
+            for name in recipe_image_names(recipe):
+                default_storage.delete(name)
+            recipe.delete()
@@ -0,0 +1,62 @@
+import random
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core.benchmarks import get_bench_user, seed_recipes
+from recipes.imports import validate_rows, create_recipes
+
+
+class Command(BaseCommand):
+    """Django command to measure the duration of bulk recipe imports"""
+    help = 'Measure the duration of validating and importing recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument('--tags-per-recipe', type=int, default=5)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=5)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the imported recipes instead of rolling back'
+        )
+
+    def handle(self, *args, **options):
+        user = get_bench_user()
+        tag_ids = list(user.tag_set.values_list('id', flat=True))
+        ingredient_ids = list(
+            user.ingredient_set.values_list('id', flat=True)
+        )
+        if not tag_ids or not ingredient_ids:
+            tag_ids, ingredient_ids = seed_recipes(user, 0)
+
+        rng = random.Random(0)
+        rows = [
+            {
+                'title': f'Imported recipe {i}',
+                'time_minutes': rng.randint(5, 240),
+                'price': str(rng.randint(100, 99999) / 100),
+                'tags': rng.sample(tag_ids, options['tags_per_recipe']),
+                'ingredients': rng.sample(
+                    ingredient_ids, options['ingredients_per_recipe']
+                ),
+            }
+            for i in range(options['recipes'])
+        ]
+
+        with transaction.atomic():
+            start = time.perf_counter()
+            validated, errors = validate_rows(user, rows)
+            validated_at = time.perf_counter()
+            create_recipes(user, validated, options['batch_size'])
+            created_at = time.perf_counter()
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+        self.stdout.write(
+            f'{len(rows)} recipes ({len(errors)} invalid): validation '
+            f'{validated_at - start:.2f}s, inserts '
+            f'{created_at - validated_at:.2f}s, total '
+            f'{created_at - start:.2f}s '
+            f'({len(rows) / (created_at - start):.0f} rows/sec)'
+        )
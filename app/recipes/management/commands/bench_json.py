@@ -0,0 +1,74 @@
+import io
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from core.benchmarks import get_bench_user, seed_recipes, summarize, \
+    time_calls
+from core.models import Recipe
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer
+from recipes import serializers
+
+
+class Command(BaseCommand):
+    """Django command to compare the JSON renderers and parsers"""
+    help = 'Measure rendering and parsing recipe pages as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--page-size', type=int, default=1000)
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the benchmark data for the next run'
+        )
+
+    def handle(self, *args, **options):
+        user = get_bench_user()
+        if not Recipe.objects.filter(user=user).exists():
+            self.stdout.write('Seeding benchmark data...')
+            seed_recipes(user, options['recipes'])
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        recipes = Recipe.objects.filter(user=user).order_by('-id')
+        columns = ('id', 'title', 'time_minutes', 'price', 'link')
+        payloads = {
+            'list': serializers.RecipeSerializer(list(
+                recipes.values_with_related(
+                    columns, ids=('ingredients', 'tags')
+                )[:options['page_size']]
+            ), many=True).data,
+            'expanded': serializers.RecipeDetailSerializer(list(
+                recipes.values_with_related(
+                    columns, details=('ingredients', 'tags')
+                )[:options['page_size']]
+            ), many=True).data,
+        }
+        for name, data in payloads.items():
+            content = JSONRenderer().render(data)
+            if FastJSONRenderer().render(data) != content:
+                self.stderr.write(f'{name}: the rendered bytes differ')
+            self.stdout.write(f'{name}: {len(content)} bytes')
+            for renderer in (JSONRenderer(), FastJSONRenderer()):
+                samples = time_calls(
+                    lambda: renderer.render(data),
+                    options['iterations']
+                )
+                self.stdout.write(
+                    f'  render {type(renderer).__name__}: '
+                    f'{summarize(samples)}'
+                )
+            for parser in (JSONParser(), FastJSONParser()):
+                samples = time_calls(
+                    lambda: parser.parse(io.BytesIO(content)),
+                    options['iterations']
+                )
+                self.stdout.write(
+                    f'  parse {type(parser).__name__}: {summarize(samples)}'
+                )
+
+        if not options['keep']:
+            user.delete()
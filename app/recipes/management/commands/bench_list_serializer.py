@@ -0,0 +1,79 @@
+import time
+import tracemalloc
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.renderers import JSONRenderer
+from core.benchmarks import get_bench_user, seed_recipes
+from core.models import Recipe
+from recipes import serializers
+
+
+class Command(BaseCommand):
+    """
+    Django command to compare serializing recipe lists from model
+    instances and from values rows
+    """
+    help = 'Measure the rows per second and allocations of list serializers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=200000)
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--iterations', type=int, default=5)
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the benchmark data for the next run'
+        )
+
+    def handle(self, *args, **options):
+        user = get_bench_user()
+        if not Recipe.objects.filter(user=user).exists():
+            self.stdout.write('Seeding benchmark data...')
+            seed_recipes(user, options['recipes'])
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        recipes = Recipe.objects.filter(user=user).order_by('-id')
+        columns = ('id', 'title', 'time_minutes', 'price', 'link')
+        paths = {
+            'instances': lambda: recipes.prefetch_related_ids()[
+                :options['rows']
+            ],
+            'values': lambda: recipes.values_with_related(
+                columns, ids=('ingredients', 'tags')
+            )[:options['rows']],
+        }
+        rendered = {}
+        for name, load in paths.items():
+            # Load the rows first to measure the serializers alone
+            rows = list(load())
+            rendered[name] = JSONRenderer().render(
+                serializers.RecipeSerializer(rows, many=True).data
+            )
+            elapsed = 0
+            for _ in range(options['iterations']):
+                rows = list(load())
+                start = time.perf_counter()
+                serializers.RecipeSerializer(rows, many=True).data
+                elapsed += time.perf_counter() - start
+            total = time.perf_counter()
+            list(serializers.RecipeSerializer(list(load()), many=True).data)
+            total = time.perf_counter() - total
+
+            tracemalloc.start()
+            rows = list(load())
+            serializers.RecipeSerializer(rows, many=True).data
+            size, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            rows_per_sec = options['rows'] * options['iterations'] / elapsed
+            self.stdout.write(
+                f'{name}: serializer {rows_per_sec:.0f} rows/sec, '
+                f'with query {options["rows"] / total:.0f} rows/sec, '
+                f'peak allocations {peak / 1024 / 1024:.1f}MB'
+            )
+        if rendered['instances'] != rendered['values']:
+            self.stderr.write('The outputs differ')
+
+        if not options['keep']:
+            user.delete()
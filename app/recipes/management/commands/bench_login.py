@@ -0,0 +1,94 @@
+import threading
+import time
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory
+from core.benchmarks import get_bench_user, summarize
+from core.executors import BoundedExecutor, get_password_executor
+from users.views import CreateTokenView, ManageUserView
+
+
+LOGIN_EMAIL = 'login@bench.local'
+LOGIN_PASSWORD = 'benchpass123'
+
+
+class Command(BaseCommand):
+    """
+    Django command to measure a storm of logins hashing passwords on the
+    request threads and on the bounded password executor
+    """
+    help = 'Measure logins and concurrent reads during a login storm'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--duration', type=float, default=10)
+
+    def handle(self, *args, **options):
+        get_user_model().objects.filter(email=LOGIN_EMAIL).delete()
+        get_user_model().objects.create_user(LOGIN_EMAIL, LOGIN_PASSWORD)
+        reader = get_bench_user()
+        token, _ = Token.objects.get_or_create(user=reader)
+        threads = options['threads']
+        executors = {
+            # As many hashing threads as requests, like hashing inline
+            'unbounded': BoundedExecutor(threads, threads),
+            'bounded': get_password_executor(),
+        }
+        try:
+            for name, executor in executors.items():
+                with patch('core.models.get_password_executor',
+                           lambda: executor):
+                    self.storm(name, token, options)
+        finally:
+            get_user_model().objects.filter(email=LOGIN_EMAIL).delete()
+
+    def storm(self, name, token, options):
+        factory = APIRequestFactory()
+        login_view = CreateTokenView.as_view()
+        me_view = ManageUserView.as_view()
+        deadline = time.perf_counter() + options['duration']
+        statuses = {}
+        reads = []
+        lock = threading.Lock()
+
+        def login():
+            while time.perf_counter() < deadline:
+                request = factory.post(
+                    '/api/user/token/',
+                    {'email': LOGIN_EMAIL, 'password': LOGIN_PASSWORD},
+                    format='json'
+                )
+                status_code = login_view(request).status_code
+                with lock:
+                    statuses[status_code] = statuses.get(status_code, 0) + 1
+            connection.close()
+
+        def read():
+            while time.perf_counter() < deadline:
+                request = factory.get(
+                    '/api/user/me/',
+                    SERVER_NAME='localhost',
+                    HTTP_AUTHORIZATION=f'Token {token.key}'
+                )
+                start = time.perf_counter()
+                me_view(request)
+                reads.append((time.perf_counter() - start) * 1000)
+            connection.close()
+
+        workers = [threading.Thread(target=login)
+                   for _ in range(options['threads'])]
+        workers.append(threading.Thread(target=read))
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.stdout.write(
+            f'{name}: {statuses.get(200, 0) / options["duration"]:.1f} '
+            f'logins/sec, responses {dict(sorted(statuses.items()))}, '
+            f'{len(reads) / options["duration"]:.0f} reads/sec '
+            f'{summarize(reads)}'
+        )
@@ -0,0 +1,84 @@
+import os
+import tempfile
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from django.views.static import serve
+from rest_framework.authtoken.models import Token
+from core.benchmarks import get_bench_user, summarize, time_calls
+from core.media import serve_media
+from core.models import Recipe
+
+
+class Command(BaseCommand):
+    """
+    Django command to compare Django's static file view with the media
+    view for whole files, ranges, conditional requests and sendfile
+    """
+    help = 'Measure serving media files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=20 * 2 ** 20)
+        parser.add_argument('--iterations', type=int, default=20)
+
+    def handle(self, *args, **options):
+        path = 'bench/file.jpg'
+        user = get_bench_user()
+        token, _ = Token.objects.get_or_create(user=user)
+        recipe = Recipe.objects.create(user=user, title='Media',
+                                       time_minutes=1, price=1, image=path)
+        factory = RequestFactory(HTTP_AUTHORIZATION=f'Token {token.key}')
+        try:
+            self.compare(factory, path, options)
+        finally:
+            recipe.delete()
+
+    def compare(self, factory, path, options):
+        with tempfile.TemporaryDirectory() as media_root:
+            os.makedirs(os.path.join(media_root, 'bench'))
+            with open(os.path.join(media_root, path), 'wb') as f:
+                f.write(os.urandom(options['size']))
+
+            with override_settings(MEDIA_ROOT=media_root):
+                etag = serve_media(factory.get('/'), path)['ETag']
+                views = {
+                    'static serve': lambda request: serve(
+                        request, path, document_root=media_root
+                    ),
+                    'serve_media': lambda request: serve_media(
+                        request, path
+                    ),
+                }
+                requests = {
+                    'whole file': {},
+                    'range 64KB': {'HTTP_RANGE': 'bytes=0-65535'},
+                    'if-none-match': {'HTTP_IF_NONE_MATCH': etag},
+                }
+                for name, headers in requests.items():
+                    for label, view in views.items():
+                        self.measure(name, label, view,
+                                     factory.get('/', **headers),
+                                     options['iterations'])
+                with override_settings(MEDIA_SERVING={
+                    'SENDFILE_HEADER': 'X-Accel-Redirect'
+                }):
+                    self.measure('whole file', 'X-Accel-Redirect',
+                                 views['serve_media'], factory.get('/'),
+                                 options['iterations'])
+
+    def measure(self, name, label, view, request, iterations):
+        sent = []
+
+        def call():
+            response = view(request)
+            body = b''.join(response) if response.streaming \
+                else response.content
+            response.close()
+            sent.append((response.status_code, len(body)))
+
+        samples = time_calls(call, iterations)
+        status_code, size = sent[-1]
+        self.stdout.write(
+            f'{name}, {label}: status {status_code}, '
+            f'{size / 1024:.0f}KB sent, {summarize(samples)}'
+        )
@@ -0,0 +1,63 @@
+import random
+from django.core.management.base import BaseCommand
+from django.db import connection
+from core.benchmarks import get_bench_user, seed_recipes, summarize, \
+    time_calls
+from core.models import Recipe
+
+
+class Command(BaseCommand):
+    """
+    Django command to measure the latency of filtering recipes by tags
+    """
+    help = 'Measure the latency of filtering recipes by tags'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=200000)
+        parser.add_argument('--tags', type=int, default=100)
+        parser.add_argument('--tags-per-recipe', type=int, default=5)
+        parser.add_argument('--filter-tags', type=int, default=3)
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the benchmark data for the next run'
+        )
+
+    def handle(self, *args, **options):
+        user = get_bench_user()
+        tag_ids = list(user.tag_set.values_list('id', flat=True))
+        if not tag_ids:
+            self.stdout.write('Seeding benchmark data...')
+            tag_ids, _ = seed_recipes(
+                user,
+                options['recipes'],
+                tags=options['tags'],
+                tags_per_recipe=options['tags_per_recipe']
+            )
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        through_rows = Recipe.tags.through.objects.filter(
+            recipe__user=user
+        ).count()
+        self.stdout.write(f'{through_rows} recipe tag rows')
+
+        rng = random.Random(0)
+        recipes = Recipe.objects.filter(user=user)
+        queries = {
+            'join': lambda ids: recipes.filter(tags__id__in=ids),
+            'any': lambda ids: recipes.filter_related('tags', ids),
+            'all': lambda ids: recipes.filter_related('tags', ids, 'all'),
+        }
+        for name, query in queries.items():
+            samples = time_calls(
+                lambda: list(query(
+                    rng.sample(tag_ids, options['filter_tags'])
+                ).order_by('-id')[:options['page_size']]),
+                options['iterations']
+            )
+            self.stdout.write(f'{name}: {summarize(samples)}')
+
+        if not options['keep']:
+            user.delete()
@@ -0,0 +1,66 @@
+import random
+from django.core.management.base import BaseCommand
+from django.db import connection
+from core.benchmarks import get_bench_user, seed_recipes, summarize, \
+    time_calls, INGREDIENT_WORDS, TITLE_ADJECTIVES, TITLE_DISHES
+from core.models import Recipe, SEARCH_ORDERING
+
+
+class Command(BaseCommand):
+    """Django command to measure the latency of searching recipes"""
+    help = 'Measure the latency of the first page of recipe searches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1000000)
+        parser.add_argument('--tags-per-recipe', type=int, default=2)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=3)
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the benchmark data for the next run'
+        )
+
+    def handle(self, *args, **options):
+        user = get_bench_user()
+        if not Recipe.objects.filter(user=user).exists():
+            self.stdout.write('Seeding benchmark data...')
+            seed_recipes(
+                user,
+                options['recipes'],
+                tags_per_recipe=options['tags_per_recipe'],
+                ingredients_per_recipe=options['ingredients_per_recipe']
+            )
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        self.stdout.write(
+            f'{Recipe.objects.filter(user=user).count()} recipes'
+        )
+
+        rng = random.Random(0)
+        recipes = Recipe.objects.filter(user=user)
+        texts = {
+            'word': lambda: rng.choice(INGREDIENT_WORDS),
+            'words': lambda: ' '.join((
+                rng.choice(TITLE_ADJECTIVES),
+                rng.choice(TITLE_DISHES)
+            )),
+            # Drop a letter to search with a typo
+            'typo': lambda: ''.join(
+                letter for index, letter in enumerate(
+                    rng.choice(INGREDIENT_WORDS)
+                ) if index != 2
+            ),
+        }
+        for name, text in texts.items():
+            samples = time_calls(
+                lambda: list(recipes.search(text(), user).order_by(
+                    *SEARCH_ORDERING
+                )[:options['page_size']]),
+                options['iterations']
+            )
+            self.stdout.write(f'{name}: {summarize(samples)}')
+
+        if not options['keep']:
+            user.delete()
@@ -0,0 +1,141 @@
+import io
+import multiprocessing
+import os
+import resource
+import struct
+import tempfile
+import time
+import zlib
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.core.handlers.wsgi import WSGIRequest
+from django.core.management.base import BaseCommand
+from django.db import connections
+from PIL import Image
+from rest_framework.test import force_authenticate
+from core.benchmarks import get_bench_user
+from core.images import recipe_image_names
+from core.models import Recipe
+from core.uploads import ImageUploadParser
+from recipes.views import RecipeViewSet
+
+
+BOUNDARY = 'BenchBoundary'
+
+
+def sample_jpeg(size):
+    """Return a JPEG of noise of about the size in bytes"""
+    side = int((size / 2) ** 0.5)
+    image = Image.frombytes('RGB', (side, side), os.urandom(side * side * 3))
+    content = io.BytesIO()
+    image.save(content, 'JPEG', quality=100)
+    return content.getvalue()
+
+
+def sample_bomb(size, pixels=144000000):
+    """
+    Return a PNG header claiming more pixels than Pillow warns about but
+    less than it refuses, padded to the size
+    """
+    side = int(pixels ** 0.5)
+    ihdr = b'IHDR' + struct.pack('>IIBBBBB', side, side, 8, 2, 0, 0, 0)
+    header = b'\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + ihdr + \
+        struct.pack('>I', zlib.crc32(ihdr)) + \
+        struct.pack('>I', size) + b'IDAT'
+    return header + bytes(size - len(header))
+
+
+def write_body(path, name, content):
+    """Write a multipart body uploading the content as the image field"""
+    with open(path, 'wb') as f:
+        f.write(
+            f'--{BOUNDARY}\r\nContent-Disposition: form-data; '
+            f'name="image"; filename="{name}"\r\n'
+            f'Content-Type: application/octet-stream\r\n\r\n'.encode()
+        )
+        f.write(content)
+        f.write(f'\r\n--{BOUNDARY}--\r\n'.encode())
+    return os.path.getsize(path)
+
+
+def upload(path, length, recipe_id, user_id, parser_classes, results):
+    """Post the body to the upload view, reporting the peak RSS growth"""
+    user = get_user_model().objects.get(pk=user_id)
+    view = RecipeViewSet.as_view(
+        {'post': 'upload_image'},
+        **({'parser_classes': parser_classes} if parser_classes else {})
+    )
+    with open(path, 'rb') as body:
+        request = WSGIRequest({
+            'REQUEST_METHOD': 'POST',
+            'PATH_INFO': f'/api/recipe/recipes/{recipe_id}/upload-image/',
+            'CONTENT_TYPE': f'multipart/form-data; boundary={BOUNDARY}',
+            'CONTENT_LENGTH': str(length),
+            'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80',
+            'wsgi.input': body,
+            'wsgi.url_scheme': 'http',
+        })
+        force_authenticate(request, user)
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        # The renditions would be made while measuring otherwise
+        with patch('recipes.views.schedule_recipe_image'):
+            response = view(request, pk=recipe_id)
+        elapsed = time.perf_counter() - start
+        after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        read = body.tell()
+    connections.close_all()
+    results.put((response.status_code, (after - before) / 1024,
+                 elapsed * 1000, read))
+
+
+class Command(BaseCommand):
+    """
+    Django command to compare the memory used by image uploads with the
+    default upload handling and the bounded image upload handler
+    """
+    help = 'Measure the peak RSS of 20MB image uploads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=20 * 2 ** 20)
+
+    def handle(self, *args, **options):
+        user = get_bench_user()
+        recipe = Recipe.objects.create(
+            user=user, title='Upload benchmark', time_minutes=1, price=1
+        )
+        files = {
+            'photo': ('photo.jpg', sample_jpeg(options['size'])),
+            'bomb': ('bomb.png', sample_bomb(options['size'])),
+        }
+        paths = ('default', None), ('bounded', (ImageUploadParser,))
+        context = multiprocessing.get_context('fork')
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                for sample, (name, content) in files.items():
+                    path = os.path.join(directory, name)
+                    length = write_body(path, name, content)
+                    del content
+                    for label, parser_classes in paths:
+                        # Each upload runs in its own process to measure
+                        # its peak alone, with its own connection
+                        connections.close_all()
+                        results = context.Queue()
+                        process = context.Process(target=upload, args=(
+                            path, length, recipe.pk, user.pk,
+                            parser_classes, results
+                        ))
+                        process.start()
+                        status_code, rss, elapsed, read = results.get()
+                        process.join()
+                        self.stdout.write(
+                            f'{sample} {length / 2 ** 20:.1f}MB {label}: '
+                            f'status {status_code}, peak RSS +{rss:.1f}MB, '
+                            f'{elapsed:.0f}ms, read {read / 2 ** 20:.1f}MB'
+                        )
+        finally:
+            recipe.refresh_from_db()
+            for name in recipe_image_names(recipe):
+                recipe.image.storage.delete(name)
+            recipe.delete()
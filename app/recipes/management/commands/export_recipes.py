@@ -0,0 +1,39 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from recipes.export import EXPORT_FORMATS, export_lines
+
+
+class Command(BaseCommand):
+    """Django command to export the recipes of a user"""
+    help = 'Export the recipes of a user as NDJSON or CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('email')
+        parser.add_argument(
+            '--output-format',
+            choices=sorted(EXPORT_FORMATS),
+            default='ndjson'
+        )
+        parser.add_argument(
+            '--output',
+            help='File to write the export to (default: stdout)'
+        )
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'User {options["email"]} does not exist')
+
+        lines = export_lines(
+            user,
+            options['output_format'],
+            chunk_size=options['chunk_size']
+        )
+        if options['output'] is None:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with open(options['output'], 'w', newline='') as output:
+            output.writelines(lines)
@@ -0,0 +1,189 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def parse_ordering(ordering):
+    """
+    Convert ordering strings like ('-name', 'id') to (field, descending)
+    pairs ending with the unique id column
+    """
+    fields = [
+        (field.lstrip('-'), field.startswith('-')) for field in ordering
+    ]
+    if 'id' not in (field for field, desc in fields):
+        fields.append(('id', fields[-1][1] if fields else True))
+    return fields
+
+
+def ordering_field(queryset, name):
+    """Return the model field or annotation output field of an ordering"""
+    annotation = queryset.query.annotations.get(name)
+    if annotation is not None:
+        return annotation.output_field
+    return queryset.model._meta.get_field(name)
+
+
+def seek_filter(ordering, position):
+    """
+    Return the filter selecting the rows after position in the ordering
+
+    The leading range condition on the first column lets the database
+    start the index scan at the position instead of filtering every
+    row before it.
+    """
+    condition = Q()
+    equal = {}
+    for (field, descending), value in zip(ordering, position):
+        lookup = 'lt' if descending else 'gt'
+        condition |= Q(**equal, **{f'{field}__{lookup}': value})
+        equal[field] = value
+    first_field, first_descending = ordering[0]
+    lookup = 'lte' if first_descending else 'gte'
+    return Q(**{f'{first_field}__{lookup}': position[0]}) & condition
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination seeking on the ordering columns instead of using
+    OFFSET, so deep pages cost the same as the first one.
+
+    Views can change the ordering with the pagination_ordering attribute
+    or a get_pagination_ordering method; the id column is always used to
+    break ties.
+    """
+    cursor_query_param = 'cursor'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    ordering = ('-id',)
+    invalid_cursor_message = _('Invalid cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Return the page of results for the cursor in the request"""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = parse_ordering(self.get_ordering(view))
+        position, reverse = self.decode_cursor(request)
+
+        ordering = self.ordering
+        if reverse:
+            ordering = [(field, not desc) for field, desc in ordering]
+        if position is not None:
+            position = self.coerce_position(queryset, position)
+            queryset = queryset.filter(seek_filter(ordering, position))
+        queryset = queryset.order_by(*(
+            f'-{field}' if desc else field for field, desc in ordering
+        ))
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        self.first_position = self.last_position = position
+        if results:
+            self.first_position = self.get_position(results[0])
+            self.last_position = self.get_position(results[-1])
+        return results
+
+    def get_paginated_response(self, data):
+        """Return the page wrapped with links to its neighbours"""
+        return Response(OrderedDict((
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        )))
+
+    def get_page_size(self, request):
+        """Return the page size requested by the client, if valid"""
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_ordering(self, view):
+        """Return the ordering used by the view"""
+        get_pagination_ordering = getattr(
+            view, 'get_pagination_ordering', None
+        )
+        if get_pagination_ordering is not None:
+            return get_pagination_ordering()
+        return getattr(view, 'pagination_ordering', self.ordering)
+
+    def get_position(self, item):
+        """Return the values of the ordering columns for a result"""
+        if isinstance(item, dict):
+            return [item[field] for field, desc in self.ordering]
+        return [getattr(item, field) for field, desc in self.ordering]
+
+    def get_next_link(self):
+        """Return the URL of the next page, if any"""
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.last_position, reverse=False)
+
+    def get_previous_link(self):
+        """Return the URL of the previous page, if any"""
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(self.first_position, reverse=True)
+
+    def decode_cursor(self, request):
+        """Return the position and direction encoded in the cursor"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            position, reverse = cursor['p'], bool(cursor['r'])
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or \
+                len(position) != len(self.ordering) or \
+                not all(isinstance(v, (str, int, float)) for v in position):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def coerce_position(self, queryset, position):
+        """
+        Convert the values of a cursor position to the types of the
+        ordering fields, raising NotFound for values they don't accept
+        """
+        try:
+            return [
+                ordering_field(queryset, field).to_python(value)
+                for (field, desc), value in zip(self.ordering, position)
+            ]
+        except (ValidationError, FieldDoesNotExist):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position, reverse):
+        """Return the URL pointing to the cursor"""
+        cursor = json.dumps(
+            {'p': position, 'r': int(reverse)},
+            cls=DjangoJSONEncoder,
+            separators=(',', ':')
+        )
+        encoded = base64.urlsafe_b64encode(cursor.encode()).decode()
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            encoded
+        )
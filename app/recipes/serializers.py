@@ -1,42 +1,310 @@
+from collections import OrderedDict
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import models, transaction
+from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS, ManyRelatedField
+from core.cache import get_response_cache
+from core.images import EXTENSIONS
 from core.models import Tag, Ingredient, Recipe
 
 
-class TagSerializer(serializers.ModelSerializer):
+class UserManyRelatedField(ManyRelatedField):
+    """Many related field validating the whole list with a single query"""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        child = self.child_relation
+        ids = []
+        for item in data:
+            if isinstance(item, bool):
+                child.fail('incorrect_type', data_type=type(item).__name__)
+            try:
+                ids.append(child.queryset.model._meta.pk.to_python(item))
+            except DjangoValidationError:
+                child.fail('incorrect_type', data_type=type(item).__name__)
+        objects = child.get_queryset().in_bulk(ids)
+        missing = [pk for pk in dict.fromkeys(ids) if pk not in objects]
+        if missing:
+            raise serializers.ValidationError([
+                child.error_messages['does_not_exist'].format(pk_value=pk)
+                for pk in missing
+            ])
+        return [objects[pk] for pk in dict.fromkeys(ids)]
+
+
+class UserPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Primary key field limited to the objects of the request user, checking
+    lists of keys at once with many=True
+    """
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return UserManyRelatedField(**list_kwargs)
+
+    def get_queryset(self):
+        return super().get_queryset().filter(
+            user=self.context['request'].user
+        )
+
+
+class ValuesListSerializer(serializers.ListSerializer):
+    """
+    List serializer also representing lists of values() dicts, converting
+    each value with its field only when the field changes it, so no model
+    instances or per-field attribute lookups are needed
+
+    Relations are read from the keys given by the values_keys of the
+    child serializer.
+    """
+    identity_fields = (
+        serializers.IntegerField,
+        serializers.CharField,
+        serializers.ReadOnlyField,
+    )
+
+    def to_representation(self, data):
+        if not isinstance(data, list) or not data or \
+                not isinstance(data[0], dict):
+            return super().to_representation(data)
+        names, converters = [], []
+        keys = getattr(self.child, 'values_keys', {})
+        for field in self.child._readable_fields:
+            names.append(field.field_name)
+            converters.append((
+                keys.get(field.field_name, field.source),
+                self._get_converter(field)
+            ))
+        return [
+            OrderedDict(zip(names, [
+                convert(row[key]) if convert else row[key]
+                for key, convert in converters
+            ]))
+            for row in data
+        ]
+
+    def _get_converter(self, field):
+        """Return the function converting a value of the field, if any"""
+        if isinstance(field, ManyRelatedField):
+            return lambda ids: ids or []
+        elif isinstance(field, serializers.ListSerializer):
+            return lambda rows: field.to_representation(rows or [])
+        elif isinstance(field, self.identity_fields):
+            return None
+        return lambda value: None if value is None else \
+            field.to_representation(value)
+
+
+class RecipeAttrSerializer(serializers.ModelSerializer):
+    """Base serializer for recipe user owned attributes"""
+
+    def validate_name(self, value):
+        """Check the user has no other object with the name in any case"""
+        objects = self.Meta.model.objects.filter(
+            user=self.context['request'].user
+        ).named([value])
+        if self.instance is not None:
+            objects = objects.exclude(pk=self.instance.pk)
+        if objects.exists():
+            raise serializers.ValidationError(
+                _('An object with this name already exists.')
+            )
+        return value
+
+
+class TagSerializer(RecipeAttrSerializer):
     """Serializer class for Tags"""
 
     class Meta:
         model = Tag
         fields = ('id', 'name')
         read_only_fields = ('id',)
+        list_serializer_class = ValuesListSerializer
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(RecipeAttrSerializer):
     """Serializer for Ingredients"""
 
     class Meta:
         model = Ingredient
         fields = ('id', 'name')
         read_only_fields = ('id',)
+        list_serializer_class = ValuesListSerializer
+
+
+class TagRecipeCountSerializer(TagSerializer):
+    """Serializer for Tags with the number of recipes using them"""
+    recipe_count = serializers.IntegerField(read_only=True)
+
+    class Meta(TagSerializer.Meta):
+        fields = TagSerializer.Meta.fields + ('recipe_count',)
+
+
+class IngredientRecipeCountSerializer(IngredientSerializer):
+    """Serializer for Ingredients with the number of recipes using them"""
+    recipe_count = serializers.IntegerField(read_only=True)
+
+    class Meta(IngredientSerializer.Meta):
+        fields = IngredientSerializer.Meta.fields + ('recipe_count',)
 
 
 class RecipeSerializer(serializers.ModelSerializer):
-    """Serializer for Recipes"""
+    """
+    Serializer for Recipes
+
+    Tags and ingredients can also be given by name with tag_names and
+    ingredient_names, creating the missing ones
+    """
 
-    ingredients = serializers.PrimaryKeyRelatedField(
+    ingredients = UserPrimaryKeyRelatedField(
         many=True,
-        queryset=Ingredient.objects.all()
+        queryset=Ingredient.objects.all(),
+        required=False
     )
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = UserPrimaryKeyRelatedField(
         many=True,
-        queryset=Tag.objects.all()
+        queryset=Tag.objects.all(),
+        required=False
+    )
+    ingredient_names = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        write_only=True,
+        required=False
+    )
+    tag_names = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        write_only=True,
+        required=False
     )
 
     class Meta:
         model = Recipe
         fields = ('id', 'title', 'ingredients', 'tags', 'time_minutes',
-                  'price', 'link')
+                  'price', 'link', 'ingredient_names', 'tag_names')
         read_only_fields = ('id',)
+        list_serializer_class = ValuesListSerializer
+
+    # Keys of the relations in RecipeQuerySet.values_with_related rows
+    values_keys = {
+        'ingredients': 'ingredient_values',
+        'tags': 'tag_values',
+    }
+    expanded_serializers = {
+        'ingredients': IngredientSerializer,
+        'tags': TagSerializer,
+    }
+
+    def get_fields(self):
+        """
+        Return the fields selected by the fields context, inlining the
+        relations of the expand context
+        """
+        fields = super().get_fields()
+        for relation in self.context.get('expand') or ():
+            fields[relation] = self.expanded_serializers[relation](
+                many=True,
+                read_only=True
+            )
+        selected = self.context.get('fields')
+        if selected:
+            fields = OrderedDict(
+                (name, field) for name, field in fields.items()
+                if name in selected
+            )
+        return fields
+
+    def _pop_names(self, validated_data):
+        """Remove and return the names given for each relation"""
+        return {
+            relation: validated_data.pop(f'{relation[:-1]}_names')
+            for relation in ('ingredients', 'tags')
+            if f'{relation[:-1]}_names' in validated_data
+        }
+
+    def _resolve_names(self, validated_data, names, user):
+        """Add the objects given by name to the related objects"""
+        for relation, relation_names in names.items():
+            model = Recipe._meta.get_field(relation).related_model
+            validated_data[relation] = list(dict.fromkeys(
+                validated_data.get(relation, []) +
+                model.objects.get_or_create_names(user, relation_names)
+            ))
+
+    def _update_related(self, instance, relation, objects, created=False):
+        """
+        Apply the difference between the current and the given related
+        objects, deleting and inserting only the changed links, without
+        the m2m_changed signals; return whether anything changed
+        """
+        field = Recipe._meta.get_field(relation)
+        through = field.remote_field.through
+        column = f'{field.m2m_reverse_field_name()}_id'
+        links = through.objects.filter(recipe_id=instance.pk)
+        ids = {obj.pk for obj in objects}
+        current = set() if created else set(
+            links.values_list(column, flat=True)
+        )
+        if current - ids:
+            links.filter(**{f'{column}__in': current - ids}).delete()
+        if ids - current:
+            through.objects.bulk_create(
+                through(recipe_id=instance.pk, **{column: pk})
+                for pk in ids - current
+            )
+        return ids != current
+
+    def _pop_related(self, validated_data):
+        """Remove and return the related objects given for each relation"""
+        return {
+            relation: validated_data.pop(relation)
+            for relation in ('ingredients', 'tags')
+            if relation in validated_data
+        }
+
+    def create(self, validated_data):
+        names = self._pop_names(validated_data)
+        if names:
+            self._resolve_names(validated_data, names, validated_data['user'])
+        related = self._pop_related(validated_data)
+        with transaction.atomic():
+            instance = super().create(validated_data)
+            changed = [
+                self._update_related(instance, relation, objects, True)
+                for relation, objects in related.items()
+            ]
+            if any(changed):
+                Recipe.objects.filter(
+                    pk=instance.pk
+                ).update_search_vectors()
+        if any(changed):
+            # The relations are added after the post_save invalidation
+            get_response_cache().invalidate(instance.user_id)
+        return instance
+
+    def update(self, instance, validated_data):
+        """
+        Update the recipe, applying relation changes before saving it so
+        the save records them in the change sequence and response cache
+        """
+        names = self._pop_names(validated_data)
+        if names:
+            self._resolve_names(validated_data, names, instance.user)
+        related = self._pop_related(validated_data)
+        if not related:
+            return super().update(instance, validated_data)
+        with transaction.atomic():
+            for relation, objects in related.items():
+                self._update_related(instance, relation, objects)
+            return super().update(instance, validated_data)
 
 
 class RecipeDetailSerializer(RecipeSerializer):
@@ -45,10 +313,47 @@ class RecipeDetailSerializer(RecipeSerializer):
     tags = TagSerializer(many=True, read_only=True)
 
 
+class UploadedImageField(serializers.ImageField):
+    """
+    Image field accepting the files already checked by ImageUploadHandler
+    without decoding them again, fully verifying the other ones
+    """
+
+    def to_internal_value(self, data):
+        if getattr(data, 'image_format', None) is None:
+            return super().to_internal_value(data)
+        return serializers.FileField.to_internal_value(self, data)
+
+
 class RecipeImageSerializer(serializers.ModelSerializer):
-    """Serializer for uploading images to recipes"""
+    """
+    Serializer for uploading images to recipes, showing the processing
+    status and renditions of the image
+    """
+    renditions = serializers.SerializerMethodField()
+    serializer_field_mapping = {
+        **serializers.ModelSerializer.serializer_field_mapping,
+        models.ImageField: UploadedImageField,
+    }
 
     class Meta:
         model = Recipe
-        fields = ('id', 'image')
-        read_only_fields = ('id',)
+        fields = ('id', 'image', 'image_status', 'renditions')
+        read_only_fields = ('id', 'image_status')
+        extra_kwargs = {'image': {'required': True}}
+
+    def get_renditions(self, recipe):
+        """Return the size and URL in each format of the renditions"""
+        request = self.context.get('request')
+
+        def url(name):
+            url = recipe.image.storage.url(name)
+            return request.build_absolute_uri(url) if request else url
+
+        return {
+            rendition: {
+                key: url(value) if key in EXTENSIONS else value
+                for key, value in values.items()
+            }
+            for rendition, values in recipe.image_renditions.items()
+        }
@@ -0,0 +1,52 @@
+from itertools import chain
+from core.models import Tag, Ingredient, Recipe, Tombstone
+
+
+SYNCED_MODELS = (
+    ('recipes', Recipe),
+    ('tags', Tag),
+    ('ingredients', Ingredient),
+)
+
+
+def collect_changes(user, since, limit):
+    """
+    Return the last change sequence value included, whether more changes
+    follow, the changed querysets and the IDs of deleted objects
+
+    Only the objects changed after since are looked up, through the
+    (user, change_seq) indexes; a page holds about limit changes, more
+    when several changes share the last sequence value.
+    """
+    changed = {
+        name: model.objects.filter(user=user, change_seq__gt=since)
+        for name, model in SYNCED_MODELS
+    }
+    tombstones = Tombstone.objects.filter(user=user, change_seq__gt=since)
+    pages = [
+        list(queryset.order_by('change_seq').values_list(
+            'change_seq', flat=True
+        )[:limit + 1])
+        for queryset in chain(changed.values(), (tombstones,))
+    ]
+    seqs = sorted(chain.from_iterable(pages))
+    if not seqs:
+        until, has_more = since, False
+    elif len(seqs) > limit:
+        until = seqs[limit - 1]
+        has_more = seqs[-1] > until or any(len(p) > limit for p in pages)
+    else:
+        until, has_more = seqs[-1], False
+
+    changed = {
+        name: queryset.filter(change_seq__lte=until).order_by('change_seq')
+        for name, queryset in changed.items()
+    }
+    changed['recipes'] = changed['recipes'].prefetch_related_ids()
+    deleted = {name: [] for name, model in SYNCED_MODELS}
+    kinds = {model._meta.model_name: name for name, model in SYNCED_MODELS}
+    for kind, object_id in tombstones.filter(
+        change_seq__lte=until
+    ).order_by('change_seq').values_list('kind', 'object_id'):
+        deleted[kinds[kind]].append(object_id)
+    return until, has_more, changed, deleted
@@ -0,0 +1,139 @@
+import csv
+import io
+import json
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+
+EXPORT_URL = reverse('recipes:recipe-export')
+
+
+def sample_recipe(user, **params):
+    """Create and return a sample recipe"""
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': 5.00
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+def read_ndjson(response):
+    """Return the objects of a streamed NDJSON response"""
+    content = b''.join(response.streaming_content).decode()
+    return [json.loads(line) for line in content.splitlines()]
+
+
+class PublicExportApiTests(TestCase):
+    """Test unauthenticated export access"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_auth_required(self):
+        """Test that authentication is required"""
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateExportApiTests(TestCase):
+    """Test exporting recipes"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_export_ndjson(self):
+        """Test exporting recipes with their tag and ingredient names"""
+        recipe = sample_recipe(user=self.user, title='Curry')
+        recipe.tags.add(
+            Tag.objects.create(user=self.user, name='Vegan'),
+            Tag.objects.create(user=self.user, name='Dinner')
+        )
+        recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Rice')
+        )
+        sample_recipe(user=self.user, title='Toast')
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        self.assertTrue(res.streaming)
+        rows = read_ndjson(res)
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0], {
+            'id': recipe.id,
+            'title': 'Curry',
+            'time_minutes': 10,
+            'price': '5.00',
+            'link': '',
+            'tags': ['Dinner', 'Vegan'],
+            'ingredients': ['Rice'],
+        })
+        self.assertEqual(rows[1]['tags'], [])
+        self.assertEqual(rows[1]['ingredients'], [])
+
+    def test_export_csv(self):
+        """Test exporting recipes as CSV joining the names"""
+        recipe = sample_recipe(user=self.user, title='Curry, hot')
+        recipe.tags.add(
+            Tag.objects.create(user=self.user, name='Vegan'),
+            Tag.objects.create(user=self.user, name='Dinner')
+        )
+
+        res = self.client.get(EXPORT_URL, {'output': 'csv'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'text/csv')
+        content = b''.join(res.streaming_content).decode()
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['title'], 'Curry, hot')
+        self.assertEqual(rows[0]['tags'], 'Dinner|Vegan')
+        self.assertEqual(rows[0]['ingredients'], '')
+
+    def test_export_limited_to_user(self):
+        """Test that only the user's recipes are exported"""
+        user2 = get_user_model().objects.create_user(
+            'other@test.com',
+            'testpass'
+        )
+        sample_recipe(user=user2)
+        recipe = sample_recipe(user=self.user)
+
+        res = self.client.get(EXPORT_URL)
+
+        rows = read_ndjson(res)
+        self.assertEqual([row['id'] for row in rows], [recipe.id])
+
+    def test_export_invalid_output(self):
+        """Test that unknown export formats are rejected"""
+        res = self.client.get(EXPORT_URL, {'output': 'xml'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_command(self):
+        """Test exporting recipes from the command line"""
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+        output = io.StringIO()
+
+        call_command('export_recipes', self.user.email, stdout=output)
+
+        rows = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['tags'], ['Vegan'])
@@ -0,0 +1,126 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+
+FACETS_URL = reverse('recipes:recipe-facets')
+
+
+def sample_recipe(user, **params):
+    """Create and return a sample recipe"""
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': 5.00
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class PublicFacetsApiTests(TestCase):
+    """Test unauthenticated facets access"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_auth_required(self):
+        """Test that authentication is required"""
+        res = self.client.get(FACETS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateFacetsApiTests(TestCase):
+    """Test counting recipes per tag and ingredient"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+        self.quick = Tag.objects.create(user=self.user, name='Quick')
+        self.rice = Ingredient.objects.create(user=self.user, name='Rice')
+        self.curry = sample_recipe(self.user, title='Curry')
+        self.curry.tags.add(self.vegan, self.quick)
+        self.curry.ingredients.add(self.rice)
+        self.salad = sample_recipe(self.user, title='Salad')
+        self.salad.tags.add(self.vegan)
+
+    def test_facet_counts(self):
+        """Test counting the recipes of each tag and ingredient"""
+        res = self.client.get(FACETS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {
+            'tags': [
+                {'id': self.vegan.id, 'name': 'Vegan', 'count': 2},
+                {'id': self.quick.id, 'name': 'Quick', 'count': 1},
+            ],
+            'ingredients': [
+                {'id': self.rice.id, 'name': 'Rice', 'count': 1},
+            ],
+        })
+
+    def test_facets_of_filtered_recipes(self):
+        """Test only the recipes matching the list filters are counted"""
+        res = self.client.get(FACETS_URL, {'tags': self.quick.id})
+
+        self.assertEqual(res.data['tags'], [
+            {'id': self.quick.id, 'name': 'Quick', 'count': 1},
+            {'id': self.vegan.id, 'name': 'Vegan', 'count': 1},
+        ])
+        res = self.client.get(FACETS_URL, {'search': 'salad'})
+        self.assertEqual(res.data['tags'], [
+            {'id': self.vegan.id, 'name': 'Vegan', 'count': 1},
+        ])
+        self.assertEqual(res.data['ingredients'], [])
+
+    def test_facets_limited_to_user(self):
+        """Test other users' recipes are not counted"""
+        user2 = get_user_model().objects.create_user(
+            'other@test.com',
+            'testpass'
+        )
+        tag = Tag.objects.create(user=user2, name='Other')
+        sample_recipe(user2).tags.add(tag)
+        res = self.client.get(FACETS_URL, {'facets': 'tags'})
+
+        self.assertEqual(list(res.data), ['tags'])
+        self.assertNotIn(tag.id, [facet['id'] for facet in res.data['tags']])
+
+    def test_invalid_facet(self):
+        """Test requesting an unknown facet fails"""
+        res = self.client.get(FACETS_URL, {'facets': 'tags,users'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_one_query_per_facet(self):
+        """Test each facet is counted with a single query"""
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(FACETS_URL, {'tags': self.vegan.id})
+
+        self.assertEqual(len(context.captured_queries), 2)
+
+    def test_facets_cached_until_change(self):
+        """Test facets are cached and invalidated when recipes change"""
+        self.client.get(FACETS_URL)
+        res = self.client.get(FACETS_URL)
+        self.assertEqual(res['X-Cache'], 'HIT')
+
+        self.salad.ingredients.add(self.rice)
+        res = self.client.get(FACETS_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.data['ingredients'], [
+            {'id': self.rice.id, 'name': 'Rice', 'count': 2},
+        ])
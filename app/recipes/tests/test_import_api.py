@@ -0,0 +1,183 @@
+import json
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+
+IMPORT_URL = reverse('recipes:recipe-import')
+
+
+class PublicImportApiTests(TestCase):
+    """Test unauthenticated import access"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_auth_required(self):
+        """Test that authentication is required"""
+        res = self.client.post(IMPORT_URL, [], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateImportApiTests(TestCase):
+    """Test importing recipes"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.ingredient = Ingredient.objects.create(
+            user=self.user,
+            name='Rice'
+        )
+
+    def sample_rows(self, count):
+        return [
+            {
+                'title': f'Recipe {i}',
+                'time_minutes': 10,
+                'price': '5.00',
+                'tags': [self.tag.id],
+                'ingredients': [self.ingredient.id],
+            }
+            for i in range(count)
+        ]
+
+    def test_import_json(self):
+        """Test importing a JSON array of recipes"""
+        res = self.client.post(IMPORT_URL, self.sample_rows(3),
+                               format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['created'], 3)
+        recipes = Recipe.objects.filter(user=self.user)
+        self.assertEqual(sorted(res.data['ids']),
+                         sorted(r.id for r in recipes))
+        for recipe in recipes:
+            self.assertEqual(list(recipe.tags.all()), [self.tag])
+            self.assertEqual(list(recipe.ingredients.all()),
+                             [self.ingredient])
+
+    def test_import_maps_rows_to_ids(self):
+        """Test the IDs and relations follow the order of the rows"""
+        tag2 = Tag.objects.create(user=self.user, name='Quick')
+        rows = self.sample_rows(4)
+        for row, tag in zip(rows, (self.tag, tag2, tag2, self.tag)):
+            row['tags'] = [tag.id]
+        res = self.client.post(IMPORT_URL, rows, format='json')
+
+        for recipe_id, row in zip(res.data['ids'], rows):
+            recipe = Recipe.objects.get(id=recipe_id)
+            self.assertEqual(recipe.title, row['title'])
+            self.assertEqual([tag.id for tag in recipe.tags.all()],
+                             row['tags'])
+
+    def test_import_model_defaults(self):
+        """Test the fields left out of the rows take their defaults"""
+        self.client.post(IMPORT_URL, self.sample_rows(1), format='json')
+        recipe = Recipe.objects.get(user=self.user)
+
+        self.assertEqual(recipe.image_status, '')
+        self.assertEqual(recipe.image_renditions, {})
+        self.assertIsNotNone(recipe.updated_at)
+
+    def test_import_search_vectors(self):
+        """Test that imported recipes can be searched"""
+        self.client.post(IMPORT_URL, self.sample_rows(1), format='json')
+
+        res = self.client.get(reverse('recipes:recipe-list'),
+                              {'search': 'rice'})
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_import_ndjson(self):
+        """Test importing newline delimited JSON"""
+        content = '\n'.join(json.dumps(row) for row in self.sample_rows(2))
+
+        res = self.client.post(IMPORT_URL, content,
+                               content_type='application/x-ndjson')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 2)
+
+    def test_import_file(self):
+        """Test importing an uploaded NDJSON file"""
+        content = '\n'.join(json.dumps(row) for row in self.sample_rows(2))
+        upload = SimpleUploadedFile('recipes.ndjson', content.encode())
+
+        res = self.client.post(IMPORT_URL, {'file': upload},
+                               format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 2)
+
+    def test_import_invalid_json_line(self):
+        """Test that malformed NDJSON is rejected"""
+        res = self.client.post(IMPORT_URL, '{"title": "a"}\n{',
+                               content_type='application/x-ndjson')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_import_invalid_utf8(self):
+        """Test that NDJSON bodies and files not in UTF-8 are rejected"""
+        content = '{"title": "Crème brûlée"}'.encode('latin-1')
+        upload = SimpleUploadedFile('recipes.ndjson', content)
+
+        res = self.client.post(IMPORT_URL, content,
+                               content_type='application/x-ndjson')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['detail'], 'Invalid UTF-8 on line 1')
+        res = self.client.post(IMPORT_URL, {'file': upload},
+                               format='multipart')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_import_reports_row_errors(self):
+        """Test that invalid rows are reported and nothing is created"""
+        user2 = get_user_model().objects.create_user(
+            'other@test.com',
+            'testpass'
+        )
+        other_tag = Tag.objects.create(user=user2, name='Other')
+        rows = self.sample_rows(3)
+        rows[1]['title'] = ''
+        rows[2]['tags'] = [other_tag.id]
+
+        res = self.client.post(IMPORT_URL, rows, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([e['row'] for e in res.data['errors']], [1, 2])
+        self.assertIn('title', res.data['errors'][0]['errors'])
+        self.assertIn('tags', res.data['errors'][1]['errors'])
+        self.assertFalse(Recipe.objects.filter(user=self.user).exists())
+
+    def test_import_query_count(self):
+        """Test that the queries don't grow with the number of rows"""
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(IMPORT_URL, self.sample_rows(2), format='json')
+        with CaptureQueriesContext(connection) as large:
+            self.client.post(IMPORT_URL, self.sample_rows(50),
+                             format='json')
+
+        self.assertEqual(len(small), len(large))
+
+    def test_import_change_sequence(self):
+        """Test that imported recipes are numbered in the user's sequence"""
+        self.client.post(IMPORT_URL, self.sample_rows(3), format='json')
+
+        seqs = list(Recipe.objects.filter(user=self.user).order_by(
+            'id'
+        ).values_list('change_seq', flat=True))
+        self.assertEqual(seqs, sorted(set(seqs)))
+        self.assertGreater(seqs[0], self.ingredient.change_seq)
@@ -4,7 +4,8 @@ from django.test import TestCase
 from rest_framework import status
 from rest_framework.test import APIClient
 from core.models import Ingredient, Recipe
-from recipes.serializers import IngredientSerializer
+from recipes.serializers import IngredientSerializer, \
+    IngredientRecipeCountSerializer
 
 
 INGREDIENTS_URL = reverse('recipes:ingredient-list')
@@ -42,7 +43,7 @@ class PrivateIngredientsApiTests(TestCase):
         ingredients = Ingredient.objects.all().order_by('-name')
         serializer = IngredientSerializer(ingredients, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_ingredients_limited_to_user(self):
         """Test that ingredients are limited to the user"""
@@ -55,8 +56,8 @@ class PrivateIngredientsApiTests(TestCase):
         res = self.client.get(INGREDIENTS_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], ingredient.name)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], ingredient.name)
 
     def test_create_ingredients_successful(self):
         """Test that ingredients can be created"""
@@ -98,8 +99,8 @@ class PrivateIngredientsApiTests(TestCase):
         serializer1 = IngredientSerializer(ingredient1)
         serializer2 = IngredientSerializer(ingredient2)
 
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer1.data, res.data)
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer1.data, res.data['results'])
 
     def test_retrieve_assigned_ingredients_unique(self):
         """Test filtering ingredients by assigned returns only unique items"""
@@ -123,4 +124,27 @@ class PrivateIngredientsApiTests(TestCase):
         recipe1.ingredients.add(ingredient)
         recipe2.ingredients.add(ingredient)
         res = self.client.get(INGREDIENTS_URL, {'assigned_only': 1})
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_retrieve_ingredients_recipe_count(self):
+        """Test including the number of recipes using each ingredient"""
+        ingredient = Ingredient.objects.create(user=self.user, name='Eggs')
+        Ingredient.objects.create(user=self.user, name='Cheese')
+        recipe = Recipe.objects.create(
+            user=self.user,
+            title='Eggs benedict',
+            time_minutes=30,
+            price=12.0
+        )
+        recipe.ingredients.add(ingredient)
+        res = self.client.get(
+            INGREDIENTS_URL,
+            {'assigned_only': 1, 'recipe_count': 1}
+        )
+        serializer = IngredientRecipeCountSerializer(
+            Ingredient.objects.with_recipe_count().filter(id=ingredient.id),
+            many=True
+        )
+
+        self.assertEqual(res.data['results'], serializer.data)
+        self.assertEqual(res.data['results'][0]['recipe_count'], 1)
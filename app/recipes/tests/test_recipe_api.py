@@ -1,11 +1,27 @@
+import base64
+import gzip
+import io
+import json
 import os
+import re
+import shutil
 import tempfile
 from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from unittest.mock import patch
 from django.urls import reverse
+from django.utils.http import http_date
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
-from core.models import Recipe, Ingredient, Tag
+from core.cache import get_response_cache
+from core.executors import Overloaded
+from core.images import process_recipe_image, recipe_image_names
+from core.models import ImageBlob, Recipe, Ingredient, Tag
+from recipes.pagination import KeysetPagination
 from recipes.serializers import RecipeSerializer, RecipeDetailSerializer
 from PIL import Image
 
@@ -77,7 +93,7 @@ class PrivateRecipeApiTests(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_recipes_limited_to_user(self):
         """Test that recipes are available only for their authors"""
@@ -92,8 +108,8 @@ class PrivateRecipeApiTests(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_view_recipe_detail(self):
         """Test view of recipe detail"""
@@ -158,6 +174,105 @@ class PrivateRecipeApiTests(TestCase):
         self.assertIn(ingredient1, ingredients)
         self.assertIn(ingredient2, ingredients)
 
+    def test_create_recipe_with_names(self):
+        """Test creating recipes with tags and ingredients by name"""
+        tag = sample_tag(user=self.user, name='Vegan')
+        payload = {
+            'title': 'Avocado toast',
+            'time_minutes': 5,
+            'price': 4.0,
+            'tag_names': ['vegan', 'Breakfast'],
+            'ingredient_names': ['Avocado', 'Bread'],
+        }
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertIn(tag, recipe.tags.all())
+        self.assertEqual(
+            sorted(recipe.tags.values_list('name', flat=True)),
+            ['Breakfast', 'Vegan']
+        )
+        self.assertEqual(
+            sorted(recipe.ingredients.values_list('name', flat=True)),
+            ['Avocado', 'Bread']
+        )
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+
+    def test_create_recipe_with_new_names_query_count(self):
+        """Test that new ingredients are created with a few queries"""
+        payload = {
+            'title': 'Stew',
+            'time_minutes': 60,
+            'price': 10.0,
+            'ingredient_names': [f'Ingredient {i}' for i in range(20)],
+        }
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            Ingredient.objects.filter(user=self.user).count(), 20
+        )
+        self.assertLess(len(queries), 20)
+
+    def test_update_recipe_with_names(self):
+        """Test replacing the tags of a recipe by name"""
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(sample_tag(user=self.user))
+
+        self.client.patch(
+            detail_url(recipe.id),
+            {'tag_names': ['Spicy']},
+            format='json'
+        )
+
+        recipe.refresh_from_db()
+        self.assertEqual(
+            list(recipe.tags.values_list('name', flat=True)),
+            ['Spicy']
+        )
+
+    def test_create_recipe_with_tags_single_query(self):
+        """Test that the tags of a recipe are validated with one query"""
+        tags = [sample_tag(user=self.user, name=f'Tag {i}') for i in range(50)]
+        payload = {
+            'title': 'Salad',
+            'time_minutes': 5,
+            'price': 3.0,
+            'tags': [tag.id for tag in tags],
+        }
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        lookups = [
+            query for query in context.captured_queries
+            if re.match(r'^SELECT [^(]* FROM "core_tag" WHERE', query['sql'])
+        ]
+        self.assertEqual(len(lookups), 1)
+
+    def test_create_recipe_with_other_users_tags(self):
+        """Test that tags of other users are rejected all at once"""
+        user2 = get_user_model().objects.create_user(
+            'other@test.com',
+            'testpass'
+        )
+        tag = sample_tag(user=self.user)
+        other_tag = sample_tag(user=user2)
+        payload = {
+            'title': 'Salad',
+            'time_minutes': 5,
+            'price': 3.0,
+            'tags': [tag.id, other_tag.id, 0],
+        }
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(res.data['tags']), 2)
+        self.assertIn(str(other_tag.id), res.data['tags'][0])
+        self.assertFalse(Recipe.objects.exists())
+
     def test_partial_update_recipe(self):
         """Test updating a recipe with PATCH"""
         recipe = sample_recipe(user=self.user)
@@ -207,9 +322,9 @@ class PrivateRecipeApiTests(TestCase):
         serializer1 = RecipeSerializer(recipe1)
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
 
     def test_filter_recipes_by_ingredients(self):
         """Test retrieving filtered list of recipes by ingredient"""
@@ -229,9 +344,710 @@ class PrivateRecipeApiTests(TestCase):
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
 
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
+
+    def test_filter_recipes_by_tags_unique(self):
+        """Test recipes matching several tags are returned once"""
+        recipe = sample_recipe(user=self.user)
+        tag1 = sample_tag(user=self.user, name='Vegan')
+        tag2 = sample_tag(user=self.user, name='Dessert')
+        recipe.tags.add(tag1, tag2)
+        res = self.client.get(RECIPES_URL, {'tags': f'{tag1.id},{tag2.id}'})
+
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_filter_recipes_by_all_tags(self):
+        """Test retrieving recipes having every tag"""
+        recipe1 = sample_recipe(user=self.user, title='Vegan cake')
+        recipe2 = sample_recipe(user=self.user, title='Vegan curry')
+        tag1 = sample_tag(user=self.user, name='Vegan')
+        tag2 = sample_tag(user=self.user, name='Dessert')
+        recipe1.tags.add(tag1, tag2)
+        recipe2.tags.add(tag1)
+        res = self.client.get(RECIPES_URL, {
+            'tags': f'{tag1.id},{tag2.id}',
+            'tags_mode': 'all'
+        })
+
+        self.assertEqual(
+            res.data['results'],
+            [RecipeSerializer(recipe1).data]
+        )
+
+    def test_filter_recipes_by_tags_and_ingredients(self):
+        """Test tag and ingredient filters are combined"""
+        recipe1 = sample_recipe(user=self.user, title='Vegan cake')
+        recipe2 = sample_recipe(user=self.user, title='Vegan curry')
+        tag = sample_tag(user=self.user, name='Vegan')
+        ingredient = sample_ingredient(user=self.user, name='Carrot')
+        recipe1.tags.add(tag)
+        recipe1.ingredients.add(ingredient)
+        recipe2.tags.add(tag)
+        res = self.client.get(RECIPES_URL, {
+            'tags': tag.id,
+            'ingredients': ingredient.id,
+            'ingredients_mode': 'all'
+        })
+
+        self.assertEqual(
+            res.data['results'],
+            [RecipeSerializer(recipe1).data]
+        )
+
+    def test_filter_recipes_by_ranges(self):
+        """Test filtering recipes by price and time ranges"""
+        sample_recipe(user=self.user, title='Cheap', price=2.00)
+        sample_recipe(user=self.user, title='Slow', price=8.00,
+                      time_minutes=120)
+        sample_recipe(user=self.user, title='Dear', price=30.00)
+
+        res = self.client.get(RECIPES_URL, {'price_min': '2.5',
+                                            'price_max': '30'})
+        self.assertEqual(
+            [recipe['title'] for recipe in res.data['results']],
+            ['Dear', 'Slow']
+        )
+        res = self.client.get(RECIPES_URL, {'price_min': '2.5',
+                                            'time_max': 60})
+        self.assertEqual(
+            [recipe['title'] for recipe in res.data['results']],
+            ['Dear']
+        )
+
+    def test_order_recipes(self):
+        """Test ordering recipes by price and time"""
+        medium = sample_recipe(user=self.user, price=5.00, time_minutes=30)
+        cheap = sample_recipe(user=self.user, price=2.00, time_minutes=10)
+        quick = sample_recipe(user=self.user, price=5.00, time_minutes=5)
+
+        res = self.client.get(RECIPES_URL, {'ordering': 'price,-time_minutes'})
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['results']],
+            [cheap.id, medium.id, quick.id]
+        )
+        res = self.client.get(RECIPES_URL, {'ordering': '-time_minutes'})
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['results']],
+            [medium.id, cheap.id, quick.id]
+        )
+
+    def test_filter_recipes_invalid_params(self):
+        """Test invalid filters are rejected"""
+        for params in ({'tags': 'a,b'}, {'tags': '1', 'tags_mode': 'some'},
+                       {'price_min': 'cheap'}, {'price_max': 'NaN'},
+                       {'time_max': '1.5'}, {'ordering': 'title'},
+                       {'ordering': 'price,-price'}):
+            res = self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecipeFieldsTests(TestCase):
+    """Test selecting and expanding the fields of recipe responses"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@test.com',
+            password='user12345678'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = sample_recipe(user=self.user, title='Curry')
+        self.tag = sample_tag(user=self.user, name='Vegan')
+        self.recipe.tags.add(self.tag)
+
+    def get_with_queries(self, url, params):
+        """Return the response and the SQL of the queries of a request"""
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res, [query['sql'] for query in context.captured_queries]
+
+    def test_list_selected_fields(self):
+        """Test only the selected fields are loaded and returned"""
+        res, queries = self.get_with_queries(
+            RECIPES_URL, {'fields': 'id,title', 'ordering': 'price'}
+        )
+
+        self.assertEqual(res.data['results'],
+                         [{'id': self.recipe.id, 'title': 'Curry'}])
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"link"', queries[0])
+
+    def test_list_expanded_relations(self):
+        """Test expanded relations are inlined with one prefetch each"""
+        _, queries = self.get_with_queries(RECIPES_URL, {})
+        res, expanded_queries = self.get_with_queries(
+            RECIPES_URL, {'expand': 'tags', 'page_size': 10}
+        )
+
+        recipe = res.data['results'][0]
+        self.assertEqual(recipe['tags'],
+                         [{'id': self.tag.id, 'name': 'Vegan'}])
+        self.assertEqual(recipe['ingredients'], [])
+        self.assertEqual(len(expanded_queries), len(queries))
+
+    def test_detail_selected_fields(self):
+        """Test selecting the fields of a recipe detail"""
+        res, queries = self.get_with_queries(
+            detail_url(self.recipe.id), {'fields': 'title,tags'}
+        )
+
+        self.assertEqual(res.data, {
+            'title': 'Curry',
+            'tags': [{'id': self.tag.id, 'name': 'Vegan'}],
+        })
+        self.assertEqual(len(queries), 2)
+
+    def test_list_renders_like_instances(self):
+        """Test list rows render the same bytes as recipe instances"""
+        ingredient = sample_ingredient(user=self.user, name='Rice')
+        other = sample_recipe(user=self.user, title='Pie', price=12.5,
+                              link='https://pie.test')
+        other.ingredients.add(ingredient)
+        other.tags.add(self.tag, sample_tag(user=self.user, name='Baked'))
+        recipes = Recipe.objects.order_by('-id').prefetch_related_ids()
+        expanded = Recipe.objects.order_by('-id').prefetch_related_details()
+
+        for params, serializer in (
+            ({}, RecipeSerializer(recipes, many=True)),
+            ({'expand': 'tags,ingredients'},
+             RecipeDetailSerializer(expanded, many=True)),
+        ):
+            res = self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(
+                JSONRenderer().render(res.data['results']),
+                JSONRenderer().render(serializer.data)
+            )
+
+    def test_invalid_fields(self):
+        """Test unknown fields and relations are rejected"""
+        for params in ({'fields': 'id,user'}, {'expand': 'user'}):
+            res = self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecipeQueryCountTests(TestCase):
+    """Test the number of queries doesn't grow with the number of rows"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@test.com',
+            password='user12345678'
+        )
+        self.client.force_authenticate(self.user)
+
+    def count_queries(self, url):
+        """Return the number of queries issued to GET the url"""
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries)
+
+    def through_statements(self, context, table):
+        """Return the kind of the captured statements on a through table"""
+        pattern = re.compile(
+            rf'^(SELECT [^(]* FROM|DELETE FROM|INSERT INTO) "{table}"'
+        )
+        return [
+            query['sql'].split()[0] for query in context.captured_queries
+            if pattern.match(query['sql'])
+        ]
+
+    def add_sample_recipe(self, name):
+        """Create a recipe with one tag and one ingredient"""
+        recipe = sample_recipe(user=self.user, title=name)
+        recipe.tags.add(sample_tag(user=self.user, name=name))
+        recipe.ingredients.add(sample_ingredient(user=self.user, name=name))
+        return recipe
+
+    def test_list_query_count_is_constant(self):
+        """Test listing recipes doesn't issue queries per recipe"""
+        self.add_sample_recipe('Recipe 0')
+        expected = self.count_queries(RECIPES_URL)
+        for i in range(1, 6):
+            self.add_sample_recipe(f'Recipe {i}')
+
+        self.assertEqual(self.count_queries(RECIPES_URL), expected)
+
+    def test_detail_query_count_is_constant(self):
+        """Test recipe detail doesn't issue queries per tag or ingredient"""
+        recipe = self.add_sample_recipe('Recipe')
+        expected = self.count_queries(detail_url(recipe.id))
+        for i in range(5):
+            recipe.tags.add(sample_tag(user=self.user, name=f'Tag {i}'))
+            recipe.ingredients.add(
+                sample_ingredient(user=self.user, name=f'Ingredient {i}')
+            )
+
+        self.assertEqual(self.count_queries(detail_url(recipe.id)), expected)
+
+    def test_patch_title_skips_relations(self):
+        """Test changing only the title doesn't touch tags or ingredients"""
+        recipe = self.add_sample_recipe('Recipe')
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.patch(detail_url(recipe.id), {'title': 'New'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        for query in context.captured_queries:
+            self.assertNotRegex(query['sql'], r'^(INSERT|DELETE).*recipe_')
+        # Recipe, sequence, update, search vector and words (in
+        # savepoints), tags and ingredients
+        self.assertEqual(len(context.captured_queries), 9)
+
+    def test_update_applies_relation_difference(self):
+        """Test updating relations only inserts and deletes the changes"""
+        recipe = self.add_sample_recipe('Recipe')
+        kept = recipe.tags.get()
+        added = sample_tag(user=self.user, name='Added')
+        removed = sample_tag(user=self.user, name='Removed')
+        recipe.tags.add(removed)
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.patch(
+                detail_url(recipe.id),
+                {'tags': [kept.id, added.id]},
+                format='json'
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(recipe.tags.all()), {kept, added})
+        # The removed links are read again by the delete collector
+        self.assertEqual(
+            self.through_statements(context, 'core_recipe_tags'),
+            ['SELECT', 'SELECT', 'DELETE', 'INSERT']
+        )
+
+    def test_update_same_relations_skips_writes(self):
+        """Test sending the current tags doesn't rewrite them"""
+        recipe = self.add_sample_recipe('Recipe')
+        with CaptureQueriesContext(connection) as context:
+            self.client.patch(
+                detail_url(recipe.id),
+                {'tags': [recipe.tags.get().id]},
+                format='json'
+            )
+
+        self.assertEqual(
+            self.through_statements(context, 'core_recipe_tags'),
+            ['SELECT']
+        )
+
+
+class RecipeSearchTests(TestCase):
+    """Test searching recipes"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@test.com',
+            password='user12345678'
+        )
+        self.client.force_authenticate(self.user)
+        # Ranked in a single window whatever the IDs of the recipes
+        patcher = patch('core.models.SEARCH_WINDOW', 2 ** 30)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def search(self, text, **params):
+        """Return the titles of the recipes found for the text"""
+        res = self.client.get(RECIPES_URL, {'search': text, **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [recipe['title'] for recipe in res.data['results']]
+
+    def test_search_title(self):
+        """Test searching the words of recipe titles"""
+        sample_recipe(user=self.user, title='Thai green curries')
+        sample_recipe(user=self.user, title='Carrot cake')
+
+        self.assertEqual(self.search('curry'), ['Thai green curries'])
+
+    def test_search_related_names(self):
+        """Test searching the names of tags and ingredients"""
+        recipe = sample_recipe(user=self.user, title='Red curry')
+        sample_recipe(user=self.user, title='Carrot cake')
+        recipe.ingredients.add(sample_ingredient(self.user, 'Coconut milk'))
+        recipe.tags.add(sample_tag(self.user, 'Spicy'))
+
+        self.assertEqual(self.search('coconut'), ['Red curry'])
+        self.assertEqual(self.search('spicy'), ['Red curry'])
+
+    def test_search_tolerates_typos(self):
+        """Test misspelt words are replaced by the closest known words"""
+        sample_recipe(user=self.user, title='Chicken curry')
+
+        self.assertEqual(self.search('chiken cury'), ['Chicken curry'])
+        self.assertEqual(self.search('xyzzy'), [])
+
+    def test_search_keeps_unknown_words(self):
+        """Test words nothing is similar to still have to match"""
+        sample_recipe(user=self.user, title='Chicken curry')
+
+        self.assertEqual(self.search('chicken xyzzy'), [])
+
+    def test_search_words_of_own_recipes(self):
+        """Test typos are only corrected to words of the user's recipes"""
+        other = get_user_model().objects.create_user(
+            'other@test.com',
+            'testpass'
+        )
+        sample_recipe(user=other, title='Chicken curry')
+        sample_recipe(user=self.user, title='Chicken soup')
+
+        self.assertEqual(self.search('chiken'), ['Chicken soup'])
+        self.assertEqual(self.search('cury'), [])
+
+    def test_search_ranks_title_first(self):
+        """Test recipes matching on the title come before the others"""
+        recipe = sample_recipe(user=self.user, title='Fried rice')
+        recipe.ingredients.add(sample_ingredient(self.user, 'Carrot'))
+        sample_recipe(user=self.user, title='Carrot cake')
+
+        self.assertEqual(self.search('carrot'), ['Carrot cake', 'Fried rice'])
+
+    def test_search_ranks_within_windows(self):
+        """Test newer windows of IDs come first, each ranked by itself"""
+        carrot = sample_ingredient(self.user, 'Carrot')
+        old_title = sample_recipe(user=self.user, title='Carrot cake')
+        old_ingredient = sample_recipe(user=self.user, title='Fried rice')
+        old_ingredient.ingredients.add(carrot)
+        new_ingredient = sample_recipe(user=self.user, title='Soup')
+        new_ingredient.ingredients.add(carrot)
+        window = new_ingredient.id
+
+        with patch('core.models.SEARCH_WINDOW', window):
+            self.assertEqual(old_title.id // window, 0)
+            self.assertEqual(old_ingredient.id // window, 0)
+            self.assertEqual(
+                self.search('carrot'),
+                ['Soup', 'Carrot cake', 'Fried rice']
+            )
+            titles = []
+            res = self.client.get(RECIPES_URL, {'search': 'carrot',
+                                                'page_size': 1})
+            while True:
+                titles += [recipe['title'] for recipe in res.data['results']]
+                if res.data['next'] is None:
+                    break
+                res = self.client.get(res.data['next'])
+            self.assertEqual(titles, ['Soup', 'Carrot cake', 'Fried rice'])
+
+    def test_search_follows_renames_and_deletions(self):
+        """Test renaming or deleting a tag updates the search"""
+        recipe = sample_recipe(user=self.user, title='Pasta')
+        tag = sample_tag(self.user, 'Italian')
+        recipe.tags.add(tag)
+        tag.name = 'Dinner'
+        tag.save()
+
+        self.assertEqual(self.search('italian'), [])
+        self.assertEqual(self.search('dinner'), ['Pasta'])
+        tag.delete()
+        self.assertEqual(self.search('dinner'), [])
+
+    def test_search_after_create(self):
+        """Test recipes created with ingredients can be searched"""
+        ingredient = sample_ingredient(self.user, 'Lentils')
+        self.client.post(RECIPES_URL, {
+            'title': 'Dal',
+            'time_minutes': 30,
+            'price': 4.0,
+            'ingredients': [ingredient.id],
+        }, format='json')
+
+        self.assertEqual(self.search('lentil'), ['Dal'])
+
+    def test_search_is_paginated(self):
+        """Test paginating search results by rank"""
+        for title in ('Curry', 'Green curry', 'Thai green curry paste'):
+            sample_recipe(user=self.user, title=title)
+        res = self.client.get(RECIPES_URL, {'search': 'curry',
+                                            'page_size': 2})
+        titles = [recipe['title'] for recipe in res.data['results']]
+        res = self.client.get(res.data['next'])
+        titles += [recipe['title'] for recipe in res.data['results']]
+
+        self.assertEqual(titles, self.search('curry'))
+        self.assertEqual(len(titles), 3)
+
+
+class RecipePaginationTests(TestCase):
+    """Test paginating the recipe list"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@test.com',
+            password='user12345678'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_recipes_are_paginated(self):
+        """Test walking the recipe list through the next links"""
+        recipes = [
+            sample_recipe(user=self.user, title=f'Recipe {i}')
+            for i in range(5)
+        ]
+        res = self.client.get(RECIPES_URL, {'page_size': 2})
+        ids = [recipe['id'] for recipe in res.data['results']]
+        self.assertIsNone(res.data['previous'])
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(res.data['results']), 2)
+            ids.extend(recipe['id'] for recipe in res.data['results'])
+
+        self.assertEqual(ids, [recipe.id for recipe in reversed(recipes)])
+
+    def test_previous_link(self):
+        """Test the previous link returns the previous page"""
+        for i in range(4):
+            sample_recipe(user=self.user, title=f'Recipe {i}')
+        first = self.client.get(RECIPES_URL, {'page_size': 2})
+        second = self.client.get(first.data['next'])
+        res = self.client.get(second.data['previous'])
+
+        self.assertEqual(res.data['results'], first.data['results'])
+        self.assertIsNone(res.data['previous'])
+        self.assertIsNotNone(res.data['next'])
+
+    @patch.object(KeysetPagination, 'max_page_size', 2)
+    def test_page_size_is_capped(self):
+        """Test the page size can't exceed the maximum"""
+        for i in range(3):
+            sample_recipe(user=self.user, title=f'Recipe {i}')
+        res = self.client.get(RECIPES_URL, {'page_size': 10})
+
+        self.assertEqual(len(res.data['results']), 2)
+
+    def test_invalid_cursor(self):
+        """Test an invalid cursor is rejected"""
+        res = self.client.get(RECIPES_URL, {'cursor': 'invalid'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_values_of_wrong_type(self):
+        """Test cursors with values the ordering fields reject"""
+        for params, position in (
+            ({}, ['abc']),
+            ({'ordering': 'price'}, ['cheap', 1]),
+            ({'search': 'curry'}, ['high', 1]),
+        ):
+            cursor = base64.urlsafe_b64encode(
+                json.dumps({'p': position, 'r': 0}).encode()
+            ).decode()
+            res = self.client.get(RECIPES_URL, {'cursor': cursor, **params})
+
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_filters_are_kept_across_pages(self):
+        """Test the next link keeps filtering the recipes"""
+        tag = sample_tag(user=self.user)
+        tagged = [sample_recipe(user=self.user) for i in range(3)]
+        sample_recipe(user=self.user, title='Untagged')
+        for recipe in tagged:
+            recipe.tags.add(tag)
+        res = self.client.get(RECIPES_URL, {'tags': tag.id, 'page_size': 2})
+        ids = [recipe['id'] for recipe in res.data['results']]
+        res = self.client.get(res.data['next'])
+        ids.extend(recipe['id'] for recipe in res.data['results'])
+
+        self.assertIsNone(res.data['next'])
+        self.assertEqual(sorted(ids), [recipe.id for recipe in tagged])
+
+    def test_ordered_recipes_are_paginated(self):
+        """Test walking recipes ordered by price with equal prices"""
+        for i in range(7):
+            sample_recipe(user=self.user, price=i % 3, time_minutes=i)
+        params = {'ordering': '-price,time_minutes', 'page_size': 2,
+                  'price_max': '1.00'}
+        res = self.client.get(RECIPES_URL, params)
+        results = res.data['results']
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            results.extend(res.data['results'])
+
+        expected = Recipe.objects.filter(price__lte=1).order_by(
+            '-price', 'time_minutes', 'id'
+        )
+        self.assertEqual(
+            [recipe['id'] for recipe in results],
+            [recipe.id for recipe in expected]
+        )
+        previous = self.client.get(res.data['previous'])
+        self.assertEqual(
+            [recipe['id'] for recipe in previous.data['results']],
+            [recipe.id for recipe in expected][2:4]
+        )
+
+
+class RecipeResponseCacheTests(TestCase):
+    """Test caching recipe responses"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@test.com',
+            password='user12345678'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_list_is_cached(self):
+        """Test repeating a list request is served from the cache"""
+        sample_recipe(user=self.user)
+        res1 = self.client.get(RECIPES_URL)
+        res2 = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res1['X-Cache'], 'MISS')
+        self.assertEqual(res2['X-Cache'], 'HIT')
+        self.assertEqual(res1.content, res2.content)
+
+    def test_hits_serve_compressed_bodies(self):
+        """Test cached bodies are compressed once and served as they are"""
+        for i in range(20):
+            sample_recipe(user=self.user, title=f'Recipe {i}')
+        res = self.client.get(RECIPES_URL, HTTP_ACCEPT_ENCODING='gzip')
+        plain = self.client.get(RECIPES_URL)
+
+        with patch('core.mixins.compress') as compress, \
+                CaptureQueriesContext(connection) as context:
+            hit = self.client.get(RECIPES_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(hit['X-Cache'], 'HIT')
+        self.assertEqual(hit['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', hit['Vary'])
+        self.assertEqual(gzip.decompress(hit.content), plain.content)
+        self.assertNotEqual(hit['ETag'], plain['ETag'])
+        compress.assert_not_called()
+        self.assertEqual(len(context.captured_queries), 0)
+
+    def test_list_invalidated_on_change(self):
+        """Test creating a recipe invalidates the cached list"""
+        self.client.get(RECIPES_URL)
+        recipe = sample_recipe(user=self.user)
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.data['results'][0]['id'], recipe.id)
+
+    def test_detail_invalidated_on_tag_change(self):
+        """Test renaming a tag invalidates the cached recipe detail"""
+        recipe = sample_recipe(user=self.user)
+        tag = sample_tag(user=self.user, name='Vegan')
+        recipe.tags.add(tag)
+        self.client.get(detail_url(recipe.id))
+        tag.name = 'Vegetarian'
+        tag.save()
+        res = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(res.data['tags'][0]['name'], 'Vegetarian')
+
+    def test_cache_is_per_user(self):
+        """Test users don't see each other's cached responses"""
+        sample_recipe(user=self.user)
+        self.client.get(RECIPES_URL)
+        user2 = get_user_model().objects.create_user(
+            email='other@test.com',
+            password='other12345678'
+        )
+        self.client.force_authenticate(user2)
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.data['results'], [])
+
+    def test_list_not_modified(self):
+        """Test polling an unchanged list returns 304 without queries"""
+        sample_recipe(user=self.user)
+        res = self.client.get(RECIPES_URL)
+        with self.assertNumQueries(0):
+            res = self.client.get(
+                RECIPES_URL,
+                HTTP_IF_NONE_MATCH=res['ETag']
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_modified(self):
+        """Test conditional requests get the list after a change"""
+        res = self.client.get(RECIPES_URL)
+        sample_recipe(user=self.user)
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_detail_not_modified_since(self):
+        """Test If-Modified-Since on the recipe detail"""
+        recipe = sample_recipe(user=self.user)
+        res = self.client.get(detail_url(recipe.id))
+        res = self.client.get(
+            detail_url(recipe.id),
+            HTTP_IF_MODIFIED_SINCE=res['Last-Modified']
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_modified_within_the_second(self):
+        """Test a change right after a request isn't hidden by a 304"""
+        recipe = sample_recipe(user=self.user)
+        with patch('time.time', return_value=1600000000.5):
+            res = self.client.get(detail_url(recipe.id))
+            recipe.title = 'Changed'
+            recipe.save()
+            res = self.client.get(
+                detail_url(recipe.id),
+                HTTP_IF_MODIFIED_SINCE=res['Last-Modified']
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['title'], 'Changed')
+
+    def test_detail_not_modified_after_cache_miss(self):
+        """Test a matching ETag gets 304 without running the handler"""
+        recipe = sample_recipe(user=self.user)
+        res = self.client.get(detail_url(recipe.id))
+        get_response_cache().backend.clear()
+        with self.assertNumQueries(0):
+            res = self.client.get(
+                detail_url(recipe.id),
+                HTTP_IF_NONE_MATCH=res['ETag']
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_missing_detail_not_answered_with_304(self):
+        """Test conditional requests for missing recipes get 404"""
+        for header in ({'HTTP_IF_NONE_MATCH': '*'},
+                       {'HTTP_IF_MODIFIED_SINCE': http_date()}):
+            res = self.client.get(detail_url(0), **header)
+
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_list_not_answered_with_304(self):
+        """Test conditional requests with an invalid cursor fail"""
+        res = self.client.get(
+            RECIPES_URL,
+            {'cursor': 'invalid'},
+            HTTP_IF_NONE_MATCH='*'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cache_stats_for_admins_only(self):
+        """Test only admins can see the response cache counters"""
+        url = reverse('recipes:cache-stats')
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(res.data), {'hits', 'misses', 'evictions'})
 
 
 class RecipeImageUploadTests(TestCase):
@@ -245,23 +1061,125 @@ class RecipeImageUploadTests(TestCase):
         )
         self.client.force_authenticate(self.user)
         self.recipe = sample_recipe(user=self.user)
+        self.media_root = tempfile.mkdtemp()
+        self.media_settings = self.settings(MEDIA_ROOT=self.media_root)
+        self.media_settings.enable()
 
     def tearDown(self):
-        self.recipe.image.delete()
+        self.media_settings.disable()
+        shutil.rmtree(self.media_root)
 
-    def test_upload_image_success(self):
-        """Test uploading image to recipe"""
-        url = image_upload_url(self.recipe.id)
+    def upload(self, size=(10, 10)):
         with tempfile.NamedTemporaryFile(suffix='.jpg') as f:
-            img = Image.new('RGB', (10, 10))
+            img = Image.new('RGB', size)
             img.save(f, format='JPEG')
             f.seek(0)
-            res = self.client.post(url, {'image': f}, format='multipart')
+            return self.client.post(image_upload_url(self.recipe.id),
+                                    {'image': f}, format='multipart')
+
+    @patch('recipes.views.schedule_recipe_image')
+    def test_upload_image_success(self, schedule_recipe_image):
+        """Test uploading image to recipe"""
+        res = self.upload()
         self.recipe.refresh_from_db()
 
-        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
         self.assertIn('image', res.data)
+        self.assertEqual(res.data['image_status'], 'pending')
         self.assertTrue(os.path.exists(self.recipe.image.path))
+        schedule_recipe_image.assert_called_once_with(self.recipe.id)
+
+    def test_upload_image_overloaded(self):
+        """Test uploads are refused before saving when images can't queue"""
+        with patch('core.executors.BoundedExecutor.check_capacity',
+                   side_effect=Overloaded(wait=5)):
+            res = self.upload()
+        self.recipe.refresh_from_db()
+
+        self.assertEqual(res.status_code,
+                         status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res['Retry-After'], '5')
+        self.assertFalse(self.recipe.image)
+
+    def test_image_renditions(self):
+        """Test the renditions of a processed image are shown"""
+        self.upload(size=(1000, 500))
+        process_recipe_image(self.recipe.id)
+        res = self.client.get(image_upload_url(self.recipe.id))
+
+        self.assertEqual(res.data['image_status'], 'ready')
+        self.assertEqual(
+            sorted(res.data['renditions']),
+            ['full', 'medium', 'thumb']
+        )
+        thumb = res.data['renditions']['thumb']
+        self.assertEqual((thumb['width'], thumb['height']), (200, 100))
+        self.assertTrue(thumb['webp'].startswith('http://testserver/'))
+        self.assertTrue(thumb['jpeg'].endswith('.jpg'))
+
+    def test_replaced_image_released(self):
+        """Test uploading a new image releases the previous files"""
+        self.upload()
+        process_recipe_image(self.recipe.id)
+        self.recipe.refresh_from_db()
+        names = recipe_image_names(self.recipe)
+        self.upload(size=(20, 20))
+
+        self.assertEqual(
+            set(ImageBlob.objects.filter(
+                name__in=names
+            ).values_list('refcount', flat=True)),
+            {0}
+        )
+
+    def test_identical_images_stored_once(self):
+        """Test the same image uploaded to two recipes is stored once"""
+        recipe2 = sample_recipe(user=self.user)
+        self.upload()
+        self.recipe, recipe = recipe2, self.recipe
+        self.upload()
+        recipe.refresh_from_db()
+        recipe2.refresh_from_db()
+
+        self.assertEqual(recipe.image.name, recipe2.image.name)
+        self.assertEqual(
+            ImageBlob.objects.get(name=recipe.image.name).refcount, 2
+        )
+
+    def post_file(self, content, name='upload.jpg'):
+        upload = SimpleUploadedFile(name, content)
+        return self.client.post(image_upload_url(self.recipe.id),
+                                {'image': upload}, format='multipart')
+
+    def test_upload_too_large(self):
+        """Test uploads are rejected once they exceed the byte limit"""
+        content = os.urandom(20000)
+        with self.settings(IMAGE_UPLOADS={'MAX_BYTES': 10000}):
+            res = self.post_file(b'\xff\xd8\xff' + content)
+        self.recipe.refresh_from_db()
+
+        self.assertEqual(res.status_code,
+                         status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertFalse(self.recipe.image)
+
+    def test_upload_too_many_pixels(self):
+        """Test images are rejected from their header when too large"""
+        content = io.BytesIO()
+        Image.new('RGB', (10, 10)).save(content, 'PNG')
+        with self.settings(IMAGE_UPLOADS={'MAX_PIXELS': 50}):
+            res = self.post_file(content.getvalue(), 'large.png')
+        self.recipe.refresh_from_db()
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('image', res.data)
+        self.assertFalse(self.recipe.image)
+
+    def test_upload_not_an_image(self):
+        """Test files which aren't images are rejected"""
+        res = self.post_file(b'not an image')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('image', res.data)
 
     def test_upload_image_failure(self):
         """Test uploading invalid image"""
@@ -0,0 +1,151 @@
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import ChangeSequence, Tag, Ingredient, Recipe
+
+
+SYNC_URL = reverse('recipes:sync')
+
+
+def sample_recipe(user, **kwargs):
+    """Create and return a sample Recipe"""
+    defaults = {
+        'title': 'Sample Recipe',
+        'time_minutes': 10,
+        'price': 5.0
+    }
+    defaults.update(kwargs)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class PublicSyncApiTests(TestCase):
+    """Test the publicly available sync API"""
+
+    def test_login_required(self):
+        """Test that login is required to sync"""
+        res = APIClient().get(SYNC_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateSyncApiTests(TestCase):
+    """Test syncing changes"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@test.com',
+            password='user12345678'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_initial_sync(self):
+        """Test the first sync returns every object"""
+        recipe = sample_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        Ingredient.objects.create(user=self.user, name='Tofu')
+        recipe.tags.add(tag)
+        res = self.client.get(SYNC_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertFalse(res.data['has_more'])
+        self.assertEqual(res.data['recipes'][0]['tags'], [tag.id])
+        self.assertEqual(len(res.data['tags']), 1)
+        self.assertEqual(len(res.data['ingredients']), 1)
+
+    def test_sync_since_token(self):
+        """Test syncing returns only the changes since the token"""
+        recipe1 = sample_recipe(user=self.user, title='Pancakes')
+        sample_recipe(user=self.user, title='Porridge')
+        token = self.client.get(SYNC_URL).data['token']
+        recipe1.title = 'Crepes'
+        recipe1.save()
+        res = self.client.get(SYNC_URL, {'since': token})
+
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['recipes']],
+            [recipe1.id]
+        )
+        self.assertNotEqual(res.data['token'], token)
+        res = self.client.get(SYNC_URL, {'since': res.data['token']})
+        self.assertEqual(res.data['recipes'], [])
+
+    def test_sync_relation_changes(self):
+        """Test recipes are synced when their tags change"""
+        recipe = sample_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        token = self.client.get(SYNC_URL).data['token']
+        tag.recipe_set.add(recipe)
+        res = self.client.get(SYNC_URL, {'since': token})
+
+        self.assertEqual(res.data['recipes'][0]['tags'], [tag.id])
+        self.assertEqual(res.data['tags'], [])
+
+    def test_sync_deletions(self):
+        """Test deleted objects are returned as tombstones"""
+        recipe = sample_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe.tags.add(tag)
+        token = self.client.get(SYNC_URL).data['token']
+        tag_id = tag.id
+        tag.delete()
+        res = self.client.get(SYNC_URL, {'since': token})
+
+        self.assertEqual(res.data['deleted']['tags'], [tag_id])
+        self.assertEqual(res.data['recipes'][0]['tags'], [])
+
+    def test_sync_limit(self):
+        """Test syncing many changes in several pages"""
+        recipes = [sample_recipe(user=self.user) for i in range(5)]
+        res = self.client.get(SYNC_URL, {'limit': 2})
+        ids = [recipe['id'] for recipe in res.data['recipes']]
+        while res.data['has_more']:
+            res = self.client.get(
+                SYNC_URL,
+                {'since': res.data['token'], 'limit': 2}
+            )
+            self.assertLessEqual(len(res.data['recipes']), 2)
+            ids.extend(recipe['id'] for recipe in res.data['recipes'])
+
+        self.assertEqual(ids, [recipe.id for recipe in recipes])
+
+    def test_sync_limited_to_user(self):
+        """Test users only sync their own changes"""
+        user2 = get_user_model().objects.create_user(
+            email='other@test.com',
+            password='other12345678'
+        )
+        sample_recipe(user=user2)
+        res = self.client.get(SYNC_URL)
+
+        self.assertEqual(res.data['recipes'], [])
+
+    def test_invalid_token(self):
+        """Test an invalid token is rejected"""
+        res = self.client.get(SYNC_URL, {'since': 'abc'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_delete_user(self):
+        """Test deleting a user doesn't leave tombstones behind"""
+        sample_recipe(user=self.user)
+        Tag.objects.create(user=self.user, name='Vegan')
+        self.user.delete()
+
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_delete_user_with_related_recipes(self):
+        """Test deleting a user doesn't number changes for them"""
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+        recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Salt')
+        )
+        user_id = self.user.id
+        self.user.delete()
+
+        self.assertFalse(
+            ChangeSequence.objects.filter(user_id=user_id).exists()
+        )
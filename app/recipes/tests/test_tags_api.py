@@ -1,10 +1,13 @@
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
 from core.models import Tag, Recipe
-from recipes.serializers import TagSerializer
+from recipes.serializers import TagSerializer, TagRecipeCountSerializer
 
 
 TAGS_URL = reverse('recipes:tag-list')
@@ -44,7 +47,7 @@ class PrivateTagsApiTests(TestCase):
         serializer = TagSerializer(tags, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_tags_limited_to_user(self):
         """Tests that tags returned belong to the authenticated user"""
@@ -57,8 +60,8 @@ class PrivateTagsApiTests(TestCase):
         res = self.client.get(TAGS_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], tag.name)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], tag.name)
 
     def test_create_tag_successful(self):
         """Test creating a new tag"""
@@ -77,6 +80,13 @@ class PrivateTagsApiTests(TestCase):
         res = self.client.post(TAGS_URL, payload)
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_create_tag_duplicate_name(self):
+        """Test creating a tag with an existing name in any case fails"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        res = self.client.post(TAGS_URL, {'name': 'VEGAN'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_retrieve_tags_assigned_to_recipes(self):
         """Test filtering tags by those assigned to recipes"""
         tag1 = Tag.objects.create(user=self.user, name='Breakfast')
@@ -91,8 +101,8 @@ class PrivateTagsApiTests(TestCase):
         res = self.client.get(TAGS_URL, {'assigned_only': 1})
         serializer1 = TagSerializer(tag1)
         serializer2 = TagSerializer(tag2)
-        self.assertIn(serializer1.data, res.data)
-        self.assertNotIn(serializer2.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertNotIn(serializer2.data, res.data['results'])
 
     def test_retrieve_tags_assigned_unique(self):
         """Test filtering assigned tags returns unique items"""
@@ -114,4 +124,78 @@ class PrivateTagsApiTests(TestCase):
         recipe2.tags.add(tag)
         res = self.client.get(TAGS_URL, {'assigned_only': 1})
 
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_retrieve_tags_without_distinct(self):
+        """Test listing tags doesn't sort the rows to remove duplicates"""
+        recipe = Recipe.objects.create(
+            title='Pancakes',
+            time_minutes=5,
+            price=3.0,
+            user=self.user
+        )
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Breakfast'))
+        for params in ({}, {'assigned_only': 1}):
+            with CaptureQueriesContext(connection) as context:
+                self.client.get(TAGS_URL, params)
+            sql = context.captured_queries[-1]['sql']
+
+            self.assertNotIn('DISTINCT', sql)
+
+    def test_retrieve_tags_invalid_flag(self):
+        """Test flags other than integers are rejected"""
+        for param in ('assigned_only', 'recipe_count'):
+            res = self.client.get(TAGS_URL, {param: 'yes'})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(param, res.data)
+
+    def test_retrieve_tags_recipe_count(self):
+        """Test including the number of recipes using each tag"""
+        tag1 = Tag.objects.create(user=self.user, name='Breakfast')
+        tag2 = Tag.objects.create(user=self.user, name='Lunch')
+        for title in ('Pancakes', 'Porridge'):
+            recipe = Recipe.objects.create(
+                title=title,
+                time_minutes=5,
+                price=3.0,
+                user=self.user
+            )
+            recipe.tags.add(tag1)
+        res = self.client.get(TAGS_URL, {'recipe_count': 1})
+        tags = Tag.objects.with_recipe_count().order_by('-name')
+        serializer = TagRecipeCountSerializer(tags, many=True)
+
+        self.assertEqual(res.data['results'], serializer.data)
+        self.assertEqual(res.data['results'][0]['recipe_count'], 0)
+        self.assertEqual(res.data['results'][0]['id'], tag2.id)
+        self.assertEqual(res.data['results'][1]['recipe_count'], 2)
+
+    def test_tag_values_serialized_like_instances(self):
+        """Test tag rows render the same bytes as tag instances"""
+        Tag.objects.create(user=self.user, name='Breakfast')
+        tags = Tag.objects.with_recipe_count().order_by('-name')
+        serializer = TagRecipeCountSerializer
+        from_values = serializer(
+            list(tags.values('id', 'name', 'recipe_count')), many=True
+        )
+
+        self.assertEqual(
+            JSONRenderer().render(from_values.data),
+            JSONRenderer().render(serializer(tags, many=True).data)
+        )
+
+    def test_tags_are_paginated_by_name(self):
+        """Test paginating tags ordered by name"""
+        tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ('Dinner', 'Breakfast', 'Supper', 'Lunch', 'Brunch')
+        ]
+        res = self.client.get(TAGS_URL, {'page_size': 2})
+        ids = [tag['id'] for tag in res.data['results']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            ids.extend(tag['id'] for tag in res.data['results'])
+        expected = sorted(tags, key=lambda tag: (tag.name, tag.id))
+
+        self.assertEqual(ids, [tag.id for tag in reversed(expected)])
@@ -11,5 +11,11 @@ router.register('recipes', views.RecipeViewSet)
 
 app_name = 'recipes'
 urlpatterns = [
-    path('', include(router.urls))
+    path('', include(router.urls)),
+    path('sync/', views.SyncView.as_view(), name='sync'),
+    path(
+        'cache-stats/',
+        views.ResponseCacheStatsView.as_view(),
+        name='cache-stats'
+    )
 ]
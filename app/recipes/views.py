@@ -1,31 +1,73 @@
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils.translation import gettext_lazy as _
 from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import _positive_int
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from core.models import Tag, Ingredient, Recipe
+from core.authentication import CachedTokenAuthentication
+from core.cache import get_response_cache
+from core.executors import get_image_executor
+from core.images import lock_recipe_image, recipe_image_names, \
+    schedule_recipe_image
+from core.mixins import CachedListModelMixin, CachedRetrieveModelMixin
+from core.models import Tag, Ingredient, Recipe, SEARCH_ORDERING
+from core.parsers import FastJSONParser
+from core.uploads import ImageUploadParser
 from recipes import serializers
+from recipes.export import EXPORT_FORMATS, export_lines
+from recipes.filters import RecipeFilter
+from recipes.imports import NDJSONParser, read_upload, validate_rows, \
+    create_recipes
+from recipes.pagination import KeysetPagination, parse_ordering
+from recipes.sync import collect_changes
 
 
-class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
+class BaseRecipeAttrViewSet(CachedListModelMixin,
+                            viewsets.GenericViewSet,
                             mixins.ListModelMixin,
                             mixins.CreateModelMixin):
     """Base ViewSet for recipe user owned attributes"""
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = KeysetPagination
+    pagination_ordering = ('-name', '-id')
+
+    def _flag(self, param):
+        """Return whether a 0/1 query parameter is set"""
+        try:
+            return bool(int(self.request.query_params.get(param, 0)))
+        except ValueError:
+            raise ValidationError({param: _('Expected 0 or 1')})
 
     def get_queryset(self):
-        """Return objects for the currently authenticated user only"""
-        assigned_only = bool(
-            int(self.request.query_params.get('assigned_only', 0))
-        )
-        queryset = self.queryset
-        if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
-        return queryset.filter(
-            user=self.request.user
-        ).order_by('-name').distinct()
+        """
+        Return objects for the currently authenticated user only
+
+        ?assigned_only=1: only objects attached to a recipe
+        ?recipe_count=1: include the number of recipes using each object
+        """
+        queryset = self.queryset.filter(user=self.request.user)
+        if self._flag('assigned_only'):
+            queryset = queryset.assigned()
+        if self._flag('recipe_count'):
+            queryset = queryset.with_recipe_count()
+        if self.action == 'list':
+            queryset = queryset.values(
+                *self.get_serializer_class().Meta.fields
+            )
+        return queryset.order_by('-name')
+
+    def get_serializer_class(self):
+        """Return the serializer including recipe counts when requested"""
+        if self.action == 'list' and self._flag('recipe_count'):
+            return self.recipe_count_serializer_class
+        return self.serializer_class
 
     def perform_create(self, serializer):
         """Create new object attaching the currently authenticated user"""
@@ -36,46 +78,126 @@ class TagViewSet(BaseRecipeAttrViewSet):
     """Manage Tags in the database"""
     queryset = Tag.objects.all()
     serializer_class = serializers.TagSerializer
+    recipe_count_serializer_class = serializers.TagRecipeCountSerializer
 
 
 class IngredientViewSet(BaseRecipeAttrViewSet):
     """Manage Ingredients in the database"""
     queryset = Ingredient.objects.all()
     serializer_class = serializers.IngredientSerializer
+    recipe_count_serializer_class = \
+        serializers.IngredientRecipeCountSerializer
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(CachedListModelMixin,
+                    CachedRetrieveModelMixin,
+                    viewsets.ModelViewSet):
     """Manage recipes in the database"""
     serializer_class = serializers.RecipeSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = KeysetPagination
+    pagination_ordering = ('-id',)
+    import_batch_size = 1000
+    import_max_batch_size = 10000
+    facet_relations = ('tags', 'ingredients')
+    selectable_fields = ('id', 'title', 'ingredients', 'tags',
+                         'time_minutes', 'price', 'link')
+    expandable_relations = ('tags', 'ingredients')
 
-    @staticmethod
-    def _params_to_ints(qs):
-        """Convert a list of string IDs to a list of integers"""
-        if not qs:
-            return []
-        return [int(id_str) for id_str in qs.split(',')]
+    def _list_param(self, param, choices):
+        """Return the values of a comma separated list parameter, if any"""
+        value = self.request.query_params.get(param)
+        if not value:
+            return None
+        values = tuple(dict.fromkeys(value.split(',')))
+        if not set(values) <= set(choices):
+            raise ValidationError({
+                param: _('Expected a list of: %(choices)s') % {
+                    'choices': ', '.join(choices)
+                }
+            })
+        return values
 
     def get_queryset(self):
         """
         Retrieve recipes only for authenticated user
 
-        tags__id__in: <field>__<foreign key field>__<apply function>
+        ?tags=1,2&tags_mode=all: recipes having every tag (default: any)
+        ?search=text: matching recipes, best first within windows of IDs
+        ?price_min=1.5&price_max=10&time_max=30: recipes in the ranges
+        ?ordering=price,-time_minutes: order of the recipes (default: -id)
+        ?fields=id,title: fields of the recipes returned
+        ?expand=tags,ingredients: relations returned with their details
+        """
+        queryset = RecipeFilter(
+            self.request.query_params,
+            self.request.user
+        ).filter_queryset(self.queryset.filter(user=self.request.user))
+        if self.action in ('list', 'retrieve'):
+            return self._select_fields(queryset)
+        return queryset
+
+    def _select_fields(self, queryset):
+        """
+        Load only the columns and relations of the requested fields, with
+        the details of the expanded relations; lists are loaded as values
+        rows without model instances
         """
-        tags = RecipeViewSet._params_to_ints(
-            self.request.query_params.get('tags')
+        fields = self.get_fields() or self.selectable_fields
+        relations = [
+            relation for relation in self.expandable_relations
+            if relation in fields
+        ]
+        concrete = {field.name for field in Recipe._meta.concrete_fields}
+        # The pagination reads the position of the last row from these
+        ordering = [
+            field for field, desc in
+            parse_ordering(self.get_pagination_ordering())
+        ]
+        if self.action == 'retrieve':
+            return queryset.only(*(
+                field for field in [*fields, *ordering] if field in concrete
+            )).prefetch_related_details(relations)
+        expand = self.get_expand() or ()
+        columns = dict.fromkeys([
+            *(field for field in fields if field in concrete), *ordering
+        ])
+        return queryset.values_with_related(
+            columns,
+            ids=[relation for relation in relations if relation not in expand],
+            details=[relation for relation in relations if relation in expand]
         )
-        ingredients = RecipeViewSet._params_to_ints(
-            self.request.query_params.get('ingredients')
+
+    def get_fields(self):
+        """Return the fields requested with ?fields=, if any"""
+        return self._list_param('fields', self.selectable_fields)
+
+    def get_expand(self):
+        """Return the relations requested inline with ?expand=, if any"""
+        return self._list_param('expand', self.expandable_relations)
+
+    def get_serializer_context(self):
+        """Pass the requested and expanded fields to the serializer"""
+        context = super().get_serializer_context()
+        if self.action in ('list', 'retrieve'):
+            context['fields'] = self.get_fields()
+            context['expand'] = self.get_expand()
+        return context
+
+    def get_pagination_ordering(self):
+        """Return the requested ordering, or search results by rank"""
+        recipe_filter = RecipeFilter(
+            self.request.query_params,
+            self.request.user
         )
-        queryset = self.queryset
-        if tags:
-            queryset = queryset.filter(tags__id__in=tags)
-        if ingredients:
-            queryset = queryset.filter(ingredients__id__in=ingredients)
-        return queryset.filter(user=self.request.user)
+        ordering = recipe_filter.get_ordering()
+        if ordering:
+            return ordering
+        if recipe_filter.search_text:
+            return SEARCH_ORDERING
+        return self.pagination_ordering
 
     def get_serializer_class(self):
         """Return appropriate serializer class"""
@@ -89,21 +211,160 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """Create a new recipe"""
         serializer.save(user=self.request.user)
 
-    @action(methods=('POST',), detail=True, url_path='upload-image')
+    @action(methods=('GET', 'POST'), detail=True, url_path='upload-image',
+            parser_classes=(ImageUploadParser,))
     def upload_image(self, request, pk=None):
-        """Upload an image to the recipe"""
+        """
+        Upload an image to the recipe, processed in the background, or
+        show the processing status and renditions of the current one
+        """
         recipe = self.get_object()
-        serializer = self.get_serializer(
-            recipe,
-            data=request.data
+        if request.method == 'GET':
+            return Response(self.get_serializer(recipe).data)
+        # Refused before reading the upload when it can't be queued
+        get_image_executor().check_capacity()
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        with transaction.atomic():
+            # Locked so the image processed meanwhile is released once
+            recipe = lock_recipe_image(recipe.pk)
+            replaced = recipe_image_names(recipe)
+            serializer.instance = recipe
+            serializer.save(
+                image_status=Recipe.IMAGE_PENDING,
+                image_renditions={}
+            )
+            schedule_recipe_image(recipe.pk)
+            for name in replaced:
+                recipe.image.storage.delete(name)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+    @action(methods=('GET',), detail=False, url_path='facets')
+    def facets(self, request):
+        """
+        Count the recipes matching the list filters for each tag and
+        ingredient
+
+        ?facets=tags,ingredients: relations to count (default: all)
+        """
+        return self.cached_response(self._count_facets, request)
+
+    def _count_facets(self, request):
+        """Return the counts of the requested facets"""
+        relations = self._list_param('facets', self.facet_relations) or \
+            self.facet_relations
+        queryset = self.get_queryset()
+        return Response({
+            relation: queryset.facet_counts(relation)
+            for relation in relations
+        })
+
+    @action(methods=('GET',), detail=False, url_path='export')
+    def export(self, request):
+        """
+        Stream all the recipes of the user with their tag and ingredient
+        names
+
+        ?output=ndjson|csv: format of the export (default: ndjson)
+        """
+        output = request.query_params.get('output', 'ndjson')
+        if output not in EXPORT_FORMATS:
+            raise ValidationError({'output': _('Invalid export format')})
+        response = StreamingHttpResponse(
+            export_lines(request.user, output),
+            content_type=EXPORT_FORMATS[output]
         )
-        if serializer.is_valid():
-            serializer.save()
+        response['Content-Disposition'] = \
+            f'attachment; filename="recipes.{output}"'
+        return response
+
+    @action(methods=('POST',), detail=False, url_path='import',
+            url_name='import',
+            parser_classes=(FastJSONParser, NDJSONParser, MultiPartParser))
+    def bulk_import(self, request):
+        """
+        Create recipes from a JSON array, NDJSON body or uploaded file;
+        nothing is created when any row is invalid
+
+        ?batch_size=<n>: number of rows inserted per query
+        """
+        try:
+            batch_size = _positive_int(
+                request.query_params['batch_size'],
+                strict=True,
+                cutoff=self.import_max_batch_size
+            )
+        except (KeyError, ValueError):
+            batch_size = self.import_batch_size
+        if 'file' in request.FILES:
+            rows = read_upload(request.FILES['file'])
+        else:
+            rows = request.data
+
+        rows, errors = validate_rows(request.user, rows)
+        if errors:
             return Response(
-                serializer.data,
-                status=status.HTTP_200_OK
+                {'errors': errors},
+                status=status.HTTP_400_BAD_REQUEST
             )
+        ids = create_recipes(request.user, rows, batch_size)
         return Response(
-            serializer.errors,
-            status=status.HTTP_400_BAD_REQUEST
+            {'created': len(ids), 'ids': ids},
+            status=status.HTTP_201_CREATED
+        )
+
+
+class ResponseCacheStatsView(APIView):
+    """Show the counters of the response cache of this process"""
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(get_response_cache().stats())
+
+
+class SyncView(APIView):
+    """Return the changes to the user's data since a sync token"""
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    limit = 500
+    max_limit = 5000
+    serializer_classes = {
+        'recipes': serializers.RecipeSerializer,
+        'tags': serializers.TagSerializer,
+        'ingredients': serializers.IngredientSerializer,
+    }
+
+    def get(self, request):
+        """
+        ?since=<token>: token returned by the previous sync, omitted for
+        the first one
+        ?limit=<n>: maximum number of changes to return
+        """
+        try:
+            since = _positive_int(request.query_params.get('since', 0))
+        except ValueError:
+            raise ValidationError({'since': _('Invalid sync token')})
+        try:
+            limit = _positive_int(
+                request.query_params['limit'],
+                strict=True,
+                cutoff=self.max_limit
+            )
+        except (KeyError, ValueError):
+            limit = self.limit
+
+        until, has_more, changed, deleted = collect_changes(
+            request.user, since, limit
         )
+        data = {'token': str(until), 'has_more': has_more}
+        for name, queryset in changed.items():
+            data[name] = self.serializer_classes[name](
+                queryset, many=True
+            ).data
+        data['deleted'] = deleted
+        return Response(data)
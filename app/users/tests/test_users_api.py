@@ -1,8 +1,10 @@
+from unittest.mock import patch
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
+from core.executors import Overloaded
 
 
 CREATE_USER_URL = reverse('users:create')
@@ -82,6 +84,20 @@ class PublicUserApiTests(TestCase):
         self.assertNotIn('token', res.data)
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_create_token_overloaded(self):
+        """Test logins are refused while the password hashing is busy"""
+        create_user(email='test@test.com', password='testpass')
+        with patch('core.executors.BoundedExecutor.submit',
+                   side_effect=Overloaded(wait=1)):
+            res = self.client.post(TOKEN_URL, {
+                'email': 'test@test.com',
+                'password': 'testpass'
+            })
+
+        self.assertEqual(res.status_code,
+                         status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res['Retry-After'], '1')
+
     def test_create_token_no_user(self):
         """Test token is not created without user"""
         payload = {
@@ -148,3 +164,19 @@ class PrivateUserApiTests(TestCase):
         self.assertEqual(self.user.name, payload['name'])
         self.assertTrue(self.user.check_password(payload['password']))
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_profile_not_modified(self):
+        """Test polling an unchanged profile returns 304"""
+        res = self.client.get(ME_URL)
+        res = self.client.get(ME_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_retrieve_profile_modified(self):
+        """Test the profile is returned again after being updated"""
+        res = self.client.get(ME_URL)
+        self.client.patch(ME_URL, {'name': 'New User Name'})
+        res = self.client.get(ME_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['name'], 'New User Name')
@@ -1,7 +1,9 @@
-from rest_framework import generics, authentication, permissions
+from rest_framework import generics, permissions
 from users.serializers import UserSerializer, AuthTokenSerializer
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
+from core.authentication import CachedTokenAuthentication
+from core.mixins import CachedRetrieveModelMixin
 
 
 class CreateUserView(generics.CreateAPIView):
@@ -15,10 +17,11 @@ class CreateTokenView(ObtainAuthToken):
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(CachedRetrieveModelMixin,
+                     generics.RetrieveUpdateAPIView):
     """Manage the authenticated user"""
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):